@@ -60,7 +60,8 @@ class DataAdmin(admin.ModelAdmin):
     list_display = ('html_visible_name', 'beam', 'name')
     ordering = ('beam', 'name',)
     #exclude = ('slug',)
-    fields = ('beam', 'data', 'interpolation_type', 'show_y_values', 'name',
+    fields = ('beam', 'data', 'interpolation_type', 'interpolation_method',
+              'show_y_values', 'name',
               'visible_name', 'description', 'data_source',)
 
     def get_readonly_fields(self, request, obj=None):
@@ -0,0 +1,258 @@
+import hashlib
+import json
+
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from pdbook.navigation import get_navigation
+from pdbook.search import search as search_data
+from pdbook.views import (
+    _data_file_hash, _get_beam_or_404, _get_beams, _get_data, _get_data_or_404,
+    _get_machines, _get_table, _read_data_file
+)
+
+
+@require_safe
+def machines(request):
+    """Return a JSON response with the available Machines
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The request
+
+    Returns
+    -------
+    response : HttpResponse
+    """
+    result = {'machines' : [_machine_summary(m) for m in _get_machines()]}
+
+    return _json_response(result)
+
+@require_safe
+def machine(request, machine_slug):
+    """Return a JSON response with the selected Machine and its Beams
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The request
+    machine_slug :str
+        The slug for the selected Machine object
+
+    Returns
+    -------
+    response : HttpResponse
+    """
+    m = get_navigation().get_machine(machine_slug)
+
+    result = _machine_summary(m)
+    result['beams'] = [_beam_summary(b, m) for b in _get_beams(m)]
+
+    return _json_response(result)
+
+@require_safe
+def beam(request, machine_slug, beam_slug):
+    """Return a JSON response with the selected Beam and its Data
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The request
+    machine_slug :str
+        The slug for the selected Machine object
+    beam_slug : str
+        The slug for the selected Beam object
+
+    Returns
+    -------
+    response : HttpResponse
+    """
+    b = _get_beam_or_404(machine_slug, beam_slug)
+    m = b.machine
+
+    result = _beam_summary(b, m)
+    result['data'] = [_data_summary(d, b, m) for d in _get_data(b)]
+
+    return _json_response(result)
+
+@require_safe
+def search(request):
+    """Return a JSON response with the Data matching the search query.
+
+    The query is taken from the 'q' query parameter and the number of
+    results from 'limit' (default 20, at most 100).
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The request
+
+    Returns
+    -------
+    response : HttpResponse
+        The JSON encoded 'query' and list of 'results', each with the Data's
+        summary as well as its 'machine', 'beam' and 'score'.
+
+    Notes
+    -----
+    Query budget: 1 (the matching search terms), plus 3 if the navigation
+    tree isn't cached. The data files aren't read.
+    """
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        return _json_response({'error' : 'The limit must be an integer'},
+                              status=400)
+
+    results = []
+    for d, score in search_data(query, limit):
+        b = d.beam
+        m = b.machine
+        result = _data_summary(d, b, m)
+        result['machine'] = _machine_summary(m)
+        result['beam'] = _beam_summary(b, m)
+        result['page_url'] = d.get_absolute_url()
+        result['score'] = score
+        results.append(result)
+
+    return _json_response({'query' : query, 'results' : results})
+
+@require_safe
+def data(request, machine_slug, beam_slug, data_slug):
+    """Return a JSON response with the table data for the selected Data.
+
+    The response has an ETag derived from the SHA-256 of the data file (and
+    the Data's fields) and a Last-Modified of when the table was stored so
+    that conditional requests get a 304 Not Modified response when the table
+    hasn't changed.
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The request
+    machine_slug :str
+        The slug for the selected Machine object
+    beam_slug : str
+        The slug for the selected Beam object
+    data_slug : str
+        The slug for the selected Data object
+
+    Returns
+    -------
+    response : HttpResponse
+        The JSON encoded table with keys 'x_values', 'y_values' and 'values'
+        for the numeric X, Y and table values (null if non-numeric) as well
+        as the titles, labels and formats used to display the table.
+    """
+    d = _get_data_or_404(machine_slug, beam_slug, data_slug)
+    b = d.beam
+    m = b.machine
+
+    try:
+        table = _read_data_file(d)
+        if isinstance(table, str):
+            raise ValueError(table)
+        table_obj = _get_table(d)
+    except Exception:
+        return _json_response({'error' : 'There was an error reading the data file'},
+                              status=500)
+
+    etag = quote_etag(_data_etag(d, _data_file_hash(d)))
+    last_modified = int(table_obj.modified.timestamp())
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        result = _data_summary(d, b, m)
+        result.update(_table_summary(table))
+        response = _json_response(result)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+
+    return response
+
+def _json_response(result, status=200):
+    """Return a HttpResponse with the JSON encoded `result`."""
+    return HttpResponse(json.dumps(result), content_type="application/json",
+                        status=status)
+
+def _machine_summary(m):
+    """Return a JSON serialisable dict for the Machine `m`."""
+    return {'name' : m.name,
+            'slug' : m.slug,
+            'visible_name' : m.visible_name,
+            'description' : m.description,
+            'machine_type' : m.machine_type,
+            'manufacturer' : m.manufacturer,
+            'model' : m.model,
+            'serial_number' : m.serial_number,
+            'url' : reverse('api_machine', args=[m.slug])}
+
+def _beam_summary(b, m):
+    """Return a JSON serialisable dict for the Beam `b` of Machine `m`."""
+    return {'name' : b.name,
+            'slug' : b.slug,
+            'visible_name' : b.visible_name,
+            'description' : b.description,
+            'energy' : b.energy,
+            'modality' : b.modality,
+            'url' : reverse('api_beam', args=[m.slug, b.slug])}
+
+def _data_summary(d, b, m):
+    """Return a JSON serialisable dict for the Data `d` of Beam `b`."""
+    return {'name' : d.name,
+            'slug' : d.slug,
+            'visible_name' : d.visible_name,
+            'interpolation_type' : d.interpolation_type,
+            'interpolation_method' : d.interpolation_method,
+            'url' : reverse('api_data', args=[m.slug, b.slug, d.slug])}
+
+def _table_summary(table):
+    """Return a JSON serialisable dict for the table dict `table`."""
+    values = None
+    if table['xy_array'] is not None:
+        values = table['xy_array'].tolist()
+
+    return {'description' : table['description'],
+            'source' : table['source'],
+            'x_title' : table['x_title'],
+            'y_title' : table['y_title'],
+            'column_labels' : table['column_labels'],
+            'row_labels' : table['row_labels'],
+            'x_format' : table['x_format'],
+            'y_format' : table['y_format'],
+            'xy_format' : table['xy_format'],
+            'x_values' : _to_floats(table['x_values']),
+            'y_values' : _to_floats(table['y_values']),
+            'values' : values}
+
+def _to_floats(values):
+    """Return `values` as a list of float, or None if not numeric."""
+    try:
+        return [float(val) for val in values]
+    except (TypeError, ValueError):
+        return None
+
+def _data_etag(data_obj, file_hash):
+    """Return an (unquoted) ETag for the Data `data_obj`.
+
+    Parameters
+    ----------
+    data_obj : pdbook.models.Data
+        The Data object.
+    file_hash : str
+        The SHA-256 hex digest of the data file.
+    """
+    # The response also includes values from the Data model
+    fields = [data_obj.name, data_obj.visible_name, data_obj.description,
+              data_obj.data_source, data_obj.interpolation_type,
+              data_obj.interpolation_method, str(data_obj.show_y_values)]
+    sha = hashlib.sha256(file_hash.encode('utf-8'))
+    sha.update('\x00'.join(fields).encode('utf-8'))
+
+    return sha.hexdigest()
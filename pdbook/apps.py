@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PDBookConfig(AppConfig):
     name = 'pdbook'
     verbose_name = 'Planning Data Book'
+
+    def ready(self):
+        # Register the signal handlers
+        import pdbook.signals
@@ -0,0 +1,278 @@
+import datetime
+import os
+import platform
+import statistics
+import tempfile
+import timeit
+import tracemalloc
+
+import django
+import numpy
+
+from pdbook.interpolation import Interpolator1D, Interpolator2D
+from pdbook.models import DataTable
+from pdbook.views import (
+    _do_interpolate_1d, _do_interpolate_2d, _format_table, _parse_csv_file
+)
+
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'samples')
+# The sizes of the generated N x N tables
+TABLE_SIZES = (10, 100, 1000)
+
+
+def run_benchmarks(samples_dir=SAMPLES_DIR, sizes=TABLE_SIZES, min_time=0.2):
+    """Return the benchmark results for the parsing and interpolation hot paths.
+
+    Each of the CSV files in `samples_dir` and a generated 1D (N x 1) and 2D
+    (N x N) table for each of `sizes` is benchmarked for:
+        'parse' : parsing the CSV file with `views._parse_csv_file`.
+        'read' : producing the table for display from the stored DataTable,
+            as `views._read_data_file` does on a table cache miss.
+        'build_interpolator_1d' / 'build_interpolator_2d' : building the
+            table's interpolator.
+        'interpolate_1d' / 'interpolate_2d' : interpolating the table with
+            `views._do_interpolate_1d` or `views._do_interpolate_2d`.
+
+    Parameters
+    ----------
+    samples_dir : str, optional
+        The directory containing the sample CSV files, default the samples
+        directory. None to skip the samples.
+    sizes : iterable of int, optional
+        The sizes of the generated tables, default (10, 100, 1000).
+    min_time : float, optional
+        The minimum total time to spend timing each function, in seconds.
+
+    Returns
+    -------
+    dict
+        The results as {'environment' : dict, 'results' : list of dict}, see
+        `benchmark` for the contents of each result.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        if samples_dir:
+            for root, dirs, files in sorted(os.walk(samples_dir)):
+                dirs.sort()
+                for fname in sorted(files):
+                    if fname.lower().endswith('.csv'):
+                        path = os.path.join(root, fname)
+                        paths.append((os.path.relpath(path, samples_dir), path))
+
+        for size in sizes:
+            for n_cols in (1, size):
+                name = 'generated_{}x{}.csv'.format(size, n_cols)
+                path = os.path.join(tmpdir, name)
+                write_table(path, size, n_cols)
+                paths.append((name, path))
+
+        for name, path in paths:
+            results.extend(benchmark_table(name, path, min_time))
+
+    return {'environment' : environment(), 'results' : results}
+
+def benchmark_table(name, path, min_time=0.2):
+    """Return the benchmark results for the CSV data file at `path`.
+
+    Parameters
+    ----------
+    name : str
+        The name to use for the table in the results.
+    path : str
+        The path to the CSV data file.
+    min_time : float, optional
+        The minimum total time to spend timing each function, in seconds.
+
+    Returns
+    -------
+    list of dict
+    """
+    parsed = _parse_csv_file(path)
+    if isinstance(parsed, str):
+        return []
+
+    table_obj = DataTable()
+    table_obj.set_parsed(parsed)
+    data = _format_table(table_obj.get_parsed())
+    if isinstance(data, str):
+        return []
+
+    results = [
+        benchmark('parse', name, lambda: _parse_csv_file(path), min_time),
+        benchmark('read', name,
+                  lambda: _format_table(table_obj.get_parsed()), min_time),
+    ]
+
+    xy_array = data['xy_array']
+    try:
+        y_values = numpy.asarray(data['y_values'], dtype=numpy.float64)
+    except ValueError:
+        return _with_shape(results, xy_array)
+
+    if xy_array is None or len(y_values) != xy_array.shape[0] or len(y_values) < 2:
+        return _with_shape(results, xy_array)
+
+    y = float(y_values[:2].mean())
+    interp_1d = Interpolator1D.from_table(data)
+    results.extend([
+        benchmark('build_interpolator_1d', name,
+                  lambda: Interpolator1D.from_table(data), min_time),
+        benchmark('interpolate_1d', name,
+                  lambda: _do_interpolate_1d(y, data, interp_1d), min_time),
+    ])
+
+    try:
+        x_values = numpy.asarray(data['x_values'], dtype=numpy.float64)
+    except ValueError:
+        return _with_shape(results, xy_array)
+
+    if len(x_values) == xy_array.shape[1] and len(x_values) >= 2:
+        x = float(x_values[:2].mean())
+        interp_2d = Interpolator2D.from_table(data)
+        results.extend([
+            benchmark('build_interpolator_2d', name,
+                      lambda: Interpolator2D.from_table(data), min_time),
+            benchmark('interpolate_2d', name,
+                      lambda: _do_interpolate_2d(x, y, data, interp_2d), min_time),
+        ])
+
+    return _with_shape(results, xy_array)
+
+def _with_shape(results, xy_array):
+    """Add the table shape to each of the `results` and return them."""
+    shape = list(xy_array.shape) if xy_array is not None else None
+    for result in results:
+        result['shape'] = shape
+
+    return results
+
+def benchmark(name, table, func, min_time=0.2, repeat=5):
+    """Return the per-call latency and memory use of `func`.
+
+    Parameters
+    ----------
+    name : str
+        The name of the benchmark.
+    table : str
+        The name of the table being benchmarked.
+    func : callable
+        The function to benchmark, called with no arguments.
+    min_time : float, optional
+        The minimum total time to spend timing `func`, in seconds.
+    repeat : int, optional
+        The number of timing runs, the best and median are reported.
+
+    Returns
+    -------
+    dict
+        A dict with keys:
+            'name', 'table' : the benchmark and table names
+            'calls' : the number of calls per timing run
+            'best', 'median' : the per-call latency, in seconds
+            'peak_bytes' : the peak memory allocated during a single call
+            'blocks' : the number of memory blocks still allocated after a
+                single call (a sign of memory being retained)
+    """
+    timer = timeit.Timer(func)
+    # Calibrate the number of calls so each run takes min_time / repeat
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time / repeat or number >= 10**6:
+            break
+        number *= 10 if elapsed < min_time / repeat / 10 else 2
+
+    times = [elapsed / number for elapsed in timer.repeat(repeat, number)]
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+
+    return {'name' : name,
+            'table' : table,
+            'calls' : number,
+            'best' : min(times),
+            'median' : statistics.median(times),
+            'peak_bytes' : peak,
+            'blocks' : blocks}
+
+def write_table(path, n_rows, n_cols):
+    """Write a generated NUMERIC CSV data file with random table values.
+
+    Parameters
+    ----------
+    path : str
+        The path to write the CSV data file to.
+    n_rows : int
+        The number of table rows.
+    n_cols : int
+        The number of table columns.
+    """
+    rng = numpy.random.RandomState(n_rows * n_cols)
+    values = rng.uniform(0, 100, (n_rows, n_cols))
+    x_values = numpy.arange(1, n_cols + 1, dtype=numpy.float64)
+    y_values = numpy.arange(1, n_rows + 1, dtype=numpy.float64) / 2
+
+    with open(path, 'w') as f:
+        f.write('# Generated {} x {} table\n'.format(n_rows, n_cols))
+        f.write('X_TITLE=X\n')
+        f.write('X_FORMAT={:.1f}\n')
+        if n_cols > 1:
+            f.write('X_VALUES={}\n'.format(','.join(str(x) for x in x_values)))
+        else:
+            f.write('X_HEADERS=Y,Value\n')
+        f.write('Y_TITLE=Y\n')
+        f.write('Y_HEADERS=\n')
+        f.write('Y_FORMAT={:.1f}\n')
+        f.write('Y_VALUES={}\n'.format(','.join(str(y) for y in y_values)))
+        f.write('XY_FORMAT={:.3f}\n')
+        f.write('XY_TYPE=NUMERIC\n')
+        for row in values:
+            f.write(','.join('{:.4f}'.format(val) for val in row) + '\n')
+
+def environment():
+    """Return a dict describing the environment the benchmarks were run in."""
+    return {'timestamp' : datetime.datetime.utcnow().isoformat() + 'Z',
+            'python' : platform.python_version(),
+            'implementation' : platform.python_implementation(),
+            'platform' : platform.platform(),
+            'machine' : platform.machine(),
+            'processor' : platform.processor(),
+            'django' : django.get_version(),
+            'numpy' : numpy.__version__}
+
+def compare(results, previous):
+    """Return the change in latency between two sets of benchmark results.
+
+    Parameters
+    ----------
+    results : dict
+        The current results, as from `run_benchmarks`.
+    previous : dict
+        The results to compare against.
+
+    Returns
+    -------
+    list of tuple
+        The (benchmark name, table name, current best, previous best, ratio)
+        for each benchmark in both sets of results. A ratio greater than 1
+        means the current results are slower.
+    """
+    before = {(res['name'], res['table']) : res['best'] for res in previous['results']}
+
+    changes = []
+    for res in results['results']:
+        key = (res['name'], res['table'])
+        if key in before and before[key] > 0:
+            changes.append(key + (res['best'], before[key], res['best'] / before[key]))
+
+    return changes
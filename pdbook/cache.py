@@ -0,0 +1,150 @@
+from collections import OrderedDict
+import threading
+
+from django.conf import settings
+
+
+class LRUCache(object):
+    """A thread-safe, size bounded, least recently used cache.
+
+    Entries are evicted least recently used first whenever the number of
+    entries exceeds `max_entries` or the total size of the entries exceeds
+    `max_bytes`.
+
+    Attributes
+    ----------
+    max_entries : int or None
+        The maximum number of entries to keep, None for no limit.
+    max_bytes : int or None
+        The maximum total size of the entries to keep (in bytes), None for no
+        limit.
+    hits : int
+        The number of successful lookups.
+    misses : int
+        The number of unsuccessful lookups.
+    evictions : int
+        The number of entries removed to keep within the budget.
+    """
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        """Remove all the entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def discard(self, key):
+        """Remove the entry for `key`, if present."""
+        with self._lock:
+            if key in self._entries:
+                _, size = self._entries.pop(key)
+                self._size -= size
+
+    def get(self, key, default=None):
+        """Return the value for `key`, or `default` if not present.
+
+        Parameters
+        ----------
+        key : hashable
+            The key to lookup.
+        default : object, optional
+            The value to return if `key` is not in the cache.
+        """
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=0):
+        """Add `value` to the cache for `key`.
+
+        Parameters
+        ----------
+        key : hashable
+            The key to store the value under.
+        value : object
+            The value to store.
+        size : int, optional
+            The (approximate) size of the value in bytes, used to enforce
+            `max_bytes`. Values larger than `max_bytes` aren't stored.
+        """
+        with self._lock:
+            if key in self._entries:
+                _, old_size = self._entries.pop(key)
+                self._size -= old_size
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self._size += size
+
+            while self._entries and self._over_budget():
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+
+    def stats(self):
+        """Return a dict containing the cache statistics."""
+        with self._lock:
+            return {'entries' : len(self._entries),
+                    'bytes' : self._size,
+                    'max_entries' : self.max_entries,
+                    'max_bytes' : self.max_bytes,
+                    'hits' : self.hits,
+                    'misses' : self.misses,
+                    'evictions' : self.evictions}
+
+    def _over_budget(self):
+        """Return True if the cache is over its entry or byte budget."""
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            return True
+
+        return False
+
+
+_TABLE_CACHE = None
+
+
+def table_cache():
+    """Return the process-wide cache of parsed data tables.
+
+    The cache budget is taken from the PDBOOK_TABLE_CACHE_ENTRIES and
+    PDBOOK_TABLE_CACHE_BYTES settings the first time the cache is used.
+    """
+    global _TABLE_CACHE
+    if _TABLE_CACHE is None:
+        _TABLE_CACHE = LRUCache(
+            max_entries=getattr(settings, 'PDBOOK_TABLE_CACHE_ENTRIES', 64),
+            max_bytes=getattr(settings, 'PDBOOK_TABLE_CACHE_BYTES', 16 * 1024 * 1024)
+        )
+
+    return _TABLE_CACHE
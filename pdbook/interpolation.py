@@ -0,0 +1,706 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+
+import numpy
+from scipy.interpolate import CubicSpline, PPoly, PchipInterpolator
+
+from pdbook.cache import LRUCache
+
+
+def bracket(axis, values):
+    """Return the indices of the axis intervals containing `values`.
+
+    Parameters
+    ----------
+    axis : numpy.ndarray
+        The increasing axis values, must contain at least two values.
+    values : array_like
+        The values to find the intervals for.
+
+    Returns
+    -------
+    numpy.ndarray
+        The index `ii` for each value such that axis[ii] <= value <=
+        axis[ii + 1]. Values outside the axis use the first or last interval.
+    """
+    indices = numpy.searchsorted(axis, values, side='right') - 1
+
+    return numpy.clip(indices, 0, len(axis) - 2)
+
+def neighbours(axis, value):
+    """Return the two axis values nearest to `value`, in increasing order.
+
+    Equivalent to ``sorted(heapq.nsmallest(2, axis, key=lambda k: abs(k -
+    value)))`` but only the values around the insertion point of `value` are
+    compared.
+
+    Parameters
+    ----------
+    axis : numpy.ndarray
+        The increasing axis values, must contain at least two values.
+    value : float
+        The value to find the neighbours of.
+
+    Returns
+    -------
+    list of float
+    """
+    index = int(numpy.searchsorted(axis, value))
+    candidates = range(max(index - 2, 0), min(index + 2, len(axis)))
+    nearest = sorted(candidates, key=lambda ii: abs(axis[ii] - value))[:2]
+
+    return sorted(axis[ii] for ii in nearest)
+
+def _lerp(x, x0, x1, f0, f1):
+    """Return the linear interpolation at `x` between (`x0`, `f0`) and (`x1`, `f1`)."""
+    return (f1 - f0) / (x1 - x0) * (x - x0) + f0
+
+def _linear_poly(axis, values):
+    """Return a scipy PPoly for the linear interpolation of `values` on `axis`."""
+    slopes = numpy.diff(values) / numpy.diff(axis)
+    return PPoly(numpy.vstack((slopes, values[:-1])), axis, extrapolate=False)
+
+
+class MonotoneSegments(object):
+    """The monotone segments of a piecewise polynomial, for inverse interpolation.
+
+    The polynomial is split at its breakpoints and turning points so that it's
+    monotone between each consecutive pair of points, then consecutive
+    intervals with the same direction are joined into segments. Each segment
+    contains at most one solution of f(t) = value (or a run of them if the
+    segment is flat at that value), found with a binary search followed by
+    solving the polynomial in the one interval that brackets it.
+
+    Attributes
+    ----------
+    poly : scipy.interpolate.PPoly
+        The piecewise polynomial.
+    t : numpy.ndarray
+        The increasing points the polynomial is monotone between.
+    values : numpy.ndarray
+        The polynomial's value at each of `t`.
+    segments : list of (int, int, int)
+        The (start, stop, direction) of each segment, as indices into `t`
+        with the direction 1 for increasing or -1 for decreasing.
+    """
+    def __init__(self, poly):
+        self.poly = poly
+        points = [poly.x]
+        if poly.c.shape[0] > 2:
+            turning = poly.derivative().roots(discontinuity=False, extrapolate=False)
+            points.append(turning[numpy.isfinite(turning)])
+
+        self.t = numpy.unique(numpy.concatenate(points))
+        self.values = poly(self.t)
+
+        self.segments = []
+        start, direction = 0, 0
+        for ii, step in enumerate(numpy.sign(numpy.diff(self.values)).tolist()):
+            if step and direction and step != direction:
+                self.segments.append((start, ii, direction))
+                start, direction = ii, 0
+
+            direction = direction or int(step)
+
+        self.segments.append((start, len(self.t) - 1, direction or 1))
+
+    def solve(self, value):
+        """Return the points where the polynomial is equal to `value`.
+
+        Parameters
+        ----------
+        value : float
+            The polynomial value to solve for.
+
+        Returns
+        -------
+        list of float
+            The solutions, in increasing order. Only solutions within the
+            polynomial's breakpoints are returned.
+        """
+        solutions = []
+        for start, stop, direction in self.segments:
+            values = self.values[start:stop + 1] * direction
+            target = value * direction
+            if not values[0] <= target <= values[-1]:
+                continue
+
+            ii = start + max(int(numpy.searchsorted(values, target)), 1) - 1
+            root = self._root(ii, value)
+            if not solutions or not numpy.isclose(root, solutions[-1], rtol=1e-12):
+                solutions.append(root)
+
+        return solutions
+
+    def _root(self, ii, value):
+        """Return the solution within the monotone interval t[ii] to t[ii + 1]."""
+        t0, t1 = self.t[ii], self.t[ii + 1]
+        if value == self.values[ii]:
+            return float(t0)
+        if value == self.values[ii + 1]:
+            return float(t1)
+
+        breaks = self.poly.x
+        piece = min(int(numpy.searchsorted(breaks, t0, side='right')) - 1,
+                    len(breaks) - 2)
+        coeffs = self.poly.c[:, piece].copy()
+        coeffs[-1] -= value
+        lower, upper = t0 - breaks[piece], t1 - breaks[piece]
+
+        roots = numpy.roots(coeffs)
+        roots = roots[numpy.abs(roots.imag) <= 1e-9 * max(1, abs(upper))].real
+        if not len(roots):
+            # Shouldn't happen, fall back to linear interpolation
+            return float(_lerp(value, self.values[ii], self.values[ii + 1], t0, t1))
+
+        # The root in the interval, allowing for rounding at the ends
+        root = roots[numpy.argmin(numpy.maximum(lower - roots, roots - upper))]
+
+        return float(breaks[piece] + numpy.clip(root, lower, upper))
+
+
+class Interpolator1D(object):
+    """Linear interpolation of 1D table data f(y).
+
+    Attributes
+    ----------
+    y : numpy.ndarray
+        The Y parameter values, increasing.
+    values : numpy.ndarray
+        The table values f(y).
+    """
+    def __init__(self, y, values):
+        self.y = numpy.asarray(y, dtype=numpy.float64)
+        self.values = numpy.asarray(values, dtype=numpy.float64)
+        self._segments = None
+
+    def __call__(self, y):
+        """Return the interpolated value(s) at `y`.
+
+        Values outside the table are linearly extrapolated from the nearest
+        interval.
+        """
+        y = numpy.asarray(y, dtype=numpy.float64)
+        iy = bracket(self.y, y)
+
+        return _lerp(y, self.y[iy], self.y[iy + 1],
+                     self.values[iy], self.values[iy + 1])
+
+    def in_range(self, y):
+        """Return a bool array, True where `y` is within the table."""
+        y = numpy.asarray(y, dtype=numpy.float64)
+        return (y >= self.y[0]) & (y <= self.y[-1])
+
+    def points(self, y):
+        """Return the interpolated values at each of `y`.
+
+        Parameters
+        ----------
+        y : array_like
+            The Y values to interpolate at.
+
+        Returns
+        -------
+        numpy.ndarray
+            The interpolated values, NaN where `y` is out of range.
+        """
+        y = numpy.asarray(y, dtype=numpy.float64)
+
+        return numpy.where(self.in_range(y), self(y), numpy.nan)
+
+    def as_poly(self):
+        """Return the interpolant as a scipy PPoly."""
+        return _linear_poly(self.y, self.values)
+
+    def solve(self, value):
+        """Return the Y values within the table where the interpolant is `value`.
+
+        The monotone segments of the interpolant are calculated the first
+        time and reused for later calls.
+
+        Returns
+        -------
+        list of float
+            The solutions, in increasing order.
+        """
+        if self._segments is None:
+            self._segments = MonotoneSegments(self.as_poly())
+
+        return self._segments.solve(value)
+
+    @classmethod
+    def from_table(cls, data, **kwargs):
+        """Return an Interpolator1D for the table dict `data`.
+
+        For 1D data the table values are taken from the last table column.
+        Any keyword arguments are passed to the class.
+        """
+        return cls(data['y_values'], data['xy_array'][:, -1], **kwargs)
+
+
+class Interpolator2D(object):
+    """Bilinear interpolation of 2D table data f(x, y).
+
+    Attributes
+    ----------
+    x : numpy.ndarray
+        The X parameter values, increasing.
+    y : numpy.ndarray
+        The Y parameter values, increasing.
+    values : numpy.ndarray
+        The table values f(x, y) with shape (len(y), len(x)).
+    """
+    def __init__(self, x, y, values):
+        self.x = numpy.asarray(x, dtype=numpy.float64)
+        self.y = numpy.asarray(y, dtype=numpy.float64)
+        self.values = numpy.asarray(values, dtype=numpy.float64)
+
+    def __call__(self, x, y):
+        """Return the interpolated value(s) at the point(s) (`x`, `y`).
+
+        `x` and `y` are broadcast against each other. Values outside the
+        table are linearly extrapolated from the nearest interval.
+        """
+        x, y = numpy.broadcast_arrays(numpy.asarray(x, dtype=numpy.float64),
+                                      numpy.asarray(y, dtype=numpy.float64))
+        ix = bracket(self.x, x)
+        iy = bracket(self.y, y)
+        x0, x1 = self.x[ix], self.x[ix + 1]
+        f = self.values
+
+        # Interpolate along the rows either side of y, then between them
+        lower = _lerp(x, x0, x1, f[iy, ix], f[iy, ix + 1])
+        upper = _lerp(x, x0, x1, f[iy + 1, ix], f[iy + 1, ix + 1])
+
+        return _lerp(y, self.y[iy], self.y[iy + 1], lower, upper)
+
+    def grid(self, x, y):
+        """Return the interpolated values on the grid formed by `x` and `y`.
+
+        Returns
+        -------
+        numpy.ndarray
+            The interpolated values with shape (len(y), len(x)).
+        """
+        x = numpy.asarray(x, dtype=numpy.float64)
+        y = numpy.asarray(y, dtype=numpy.float64)
+
+        return self(x[numpy.newaxis, :], y[:, numpy.newaxis])
+
+    def in_range(self, x, y):
+        """Return a bool array, True where (`x`, `y`) is within the table."""
+        x = numpy.asarray(x, dtype=numpy.float64)
+        y = numpy.asarray(y, dtype=numpy.float64)
+
+        return ((x >= self.x[0]) & (x <= self.x[-1])
+                & (y >= self.y[0]) & (y <= self.y[-1]))
+
+    def points(self, x, y):
+        """Return the interpolated values at each of the points (`x`, `y`).
+
+        Parameters
+        ----------
+        x : array_like
+            The X values to interpolate at.
+        y : array_like
+            The Y values to interpolate at, must be the same length as `x`.
+
+        Returns
+        -------
+        numpy.ndarray
+            The interpolated values, NaN where the point is out of range.
+        """
+        return numpy.where(self.in_range(x, y), self(x, y), numpy.nan)
+
+    def along_x(self, y):
+        """Return the interpolant f(x) for the fixed `y` as a scipy PPoly."""
+        return _linear_poly(self.x, self(self.x, y))
+
+    def along_y(self, x):
+        """Return the interpolant f(y) for the fixed `x` as a scipy PPoly."""
+        return _linear_poly(self.y, self(x, self.y))
+
+    def solve_x(self, y, value):
+        """Return the X values within the table where f(x, `y`) is `value`.
+
+        Returns an empty list if `y` is outside the table.
+        """
+        if not self.y[0] <= y <= self.y[-1]:
+            return []
+
+        return MonotoneSegments(self.along_x(y)).solve(value)
+
+    def solve_y(self, x, value):
+        """Return the Y values within the table where f(`x`, y) is `value`.
+
+        Returns an empty list if `x` is outside the table.
+        """
+        if not self.x[0] <= x <= self.x[-1]:
+            return []
+
+        return MonotoneSegments(self.along_y(x)).solve(value)
+
+    @classmethod
+    def from_table(cls, data, **kwargs):
+        """Return an Interpolator2D for the table dict `data`.
+
+        Any keyword arguments are passed to the class.
+        """
+        return cls(data['x_values'], data['y_values'], data['xy_array'], **kwargs)
+
+
+def knot_slopes(axis, values, method, along=0):
+    """Return the derivatives of the cubic interpolant at the table values.
+
+    Parameters
+    ----------
+    axis : numpy.ndarray
+        The increasing axis values.
+    values : numpy.ndarray
+        The table values.
+    method : str
+        'PCHIP' for the monotone piecewise cubic Hermite interpolant or
+        'CUBIC' for the (not-a-knot) cubic spline.
+    along : int, optional
+        The axis of `values` corresponding to `axis`.
+
+    Returns
+    -------
+    numpy.ndarray
+        The derivative along `axis` at each of the table values.
+    """
+    if method == 'PCHIP':
+        poly = PchipInterpolator(axis, values, axis=along)
+    else:
+        poly = CubicSpline(axis, values, axis=along)
+
+    return poly.derivative()(axis)
+
+
+class CubicInterpolator1D(Interpolator1D):
+    """Piecewise cubic interpolation of 1D table data f(y).
+
+    The polynomial coefficients are calculated once when the interpolator is
+    created so each interpolation only evaluates the polynomial.
+
+    Attributes
+    ----------
+    method : str
+        'PCHIP' for monotone piecewise cubic Hermite interpolation, which
+        doesn't overshoot the table values and so preserves the shape of
+        curves such as PDDs, or 'CUBIC' for cubic spline interpolation.
+    slopes : numpy.ndarray
+        The derivative of the interpolant at each of the table values, which
+        together with the values define the polynomial in each interval.
+    """
+    def __init__(self, y, values, method='PCHIP'):
+        super(CubicInterpolator1D, self).__init__(y, values)
+        self.method = method
+        if method == 'PCHIP':
+            self._poly = PchipInterpolator(self.y, self.values)
+        else:
+            self._poly = CubicSpline(self.y, self.values)
+
+        self.slopes = self._poly.derivative()(self.y)
+
+    def __call__(self, y):
+        """Return the interpolated value(s) at `y`.
+
+        Values outside the table are extrapolated from the end polynomials.
+        """
+        return self._poly(numpy.asarray(y, dtype=numpy.float64))
+
+    def as_poly(self):
+        """Return the interpolant as a scipy PPoly."""
+        return self._poly
+
+
+class CubicInterpolator2D(Interpolator2D):
+    """Piecewise bicubic interpolation of 2D table data f(x, y).
+
+    The derivatives at the table values are those of the 1D interpolant
+    along each axis, from which the 16 coefficients of the bicubic
+    polynomial for each table cell are calculated once when the interpolator
+    is created.
+
+    Attributes
+    ----------
+    method : str
+        'PCHIP' for monotone piecewise cubic Hermite interpolation along each
+        axis or 'CUBIC' for bicubic spline interpolation.
+    coefficients : numpy.ndarray
+        The coefficients a[i, j] of the polynomial sum(a[i, j] * t**i * s**j)
+        for each cell, with shape (len(y) - 1, len(x) - 1, 4, 4), where `t`
+        and `s` are the fractional positions of the point within the cell
+        along X and Y.
+    slopes : tuple of numpy.ndarray
+        The derivatives (df/dx, df/dy, d2f/dxdy) at each of the table values,
+        each with the same shape as `values`.
+    """
+    # Converts the values and derivatives at the cell corners to coefficients
+    _HERMITE = numpy.array([[1, 0, 0, 0],
+                            [0, 0, 1, 0],
+                            [-3, 3, -2, -1],
+                            [2, -2, 1, 1]], dtype=numpy.float64)
+
+    def __init__(self, x, y, values, method='PCHIP'):
+        super(CubicInterpolator2D, self).__init__(x, y, values)
+        self.method = method
+
+        f = self.values
+        fx = knot_slopes(self.x, f, method, along=1)
+        fy = knot_slopes(self.y, f, method, along=0)
+        fxy = knot_slopes(self.y, fx, method, along=0)
+        self.slopes = (fx, fy, fxy)
+
+        # Scale the derivatives to the size of each cell
+        hx = numpy.diff(self.x)[numpy.newaxis, :]
+        hy = numpy.diff(self.y)[:, numpy.newaxis]
+
+        def corners(g):
+            """Return `g` at the (x0, y0), (x0, y1), (x1, y0) and (x1, y1) corners"""
+            return g[:-1, :-1], g[1:, :-1], g[:-1, 1:], g[1:, 1:]
+
+        f00, f01, f10, f11 = corners(f)
+        fx00, fx01, fx10, fx11 = [g * hx for g in corners(fx)]
+        fy00, fy01, fy10, fy11 = [g * hy for g in corners(fy)]
+        fxy00, fxy01, fxy10, fxy11 = [g * hx * hy for g in corners(fxy)]
+
+        # The corner values for each cell, first index along X, second along Y
+        corner_values = numpy.stack([
+            numpy.stack([f00, f01, fy00, fy01], axis=-1),
+            numpy.stack([f10, f11, fy10, fy11], axis=-1),
+            numpy.stack([fx00, fx01, fxy00, fxy01], axis=-1),
+            numpy.stack([fx10, fx11, fxy10, fxy11], axis=-1),
+        ], axis=-2)
+
+        self.coefficients = numpy.einsum('ik,...kl,jl->...ij', self._HERMITE,
+                                         corner_values, self._HERMITE)
+
+    def __call__(self, x, y):
+        """Return the interpolated value(s) at the point(s) (`x`, `y`).
+
+        `x` and `y` are broadcast against each other. Values outside the
+        table are extrapolated from the nearest cell's polynomial.
+        """
+        x, y = numpy.broadcast_arrays(numpy.asarray(x, dtype=numpy.float64),
+                                      numpy.asarray(y, dtype=numpy.float64))
+        ix = bracket(self.x, x)
+        iy = bracket(self.y, y)
+        t = (x - self.x[ix]) / (self.x[ix + 1] - self.x[ix])
+        s = (y - self.y[iy]) / (self.y[iy + 1] - self.y[iy])
+
+        powers_t = numpy.stack([numpy.ones_like(t), t, t**2, t**3], axis=-1)
+        powers_s = numpy.stack([numpy.ones_like(s), s, s**2, s**3], axis=-1)
+
+        return numpy.einsum('...i,...ij,...j->...', powers_t,
+                            self.coefficients[iy, ix], powers_s)
+
+    def along_x(self, y):
+        """Return the interpolant f(x) for the fixed `y` as a scipy PPoly."""
+        iy = int(bracket(self.y, y))
+        s = (y - self.y[iy]) / (self.y[iy + 1] - self.y[iy])
+        # The coefficients of t**i for each cell along the row
+        coeffs = numpy.einsum('j,kij->ik', s ** numpy.arange(4),
+                              self.coefficients[iy])
+
+        return self._poly(self.x, coeffs)
+
+    def along_y(self, x):
+        """Return the interpolant f(y) for the fixed `x` as a scipy PPoly."""
+        ix = int(bracket(self.x, x))
+        t = (x - self.x[ix]) / (self.x[ix + 1] - self.x[ix])
+        # The coefficients of s**j for each cell along the column
+        coeffs = numpy.einsum('i,kij->jk', t ** numpy.arange(4),
+                              self.coefficients[:, ix])
+
+        return self._poly(self.y, coeffs)
+
+    @staticmethod
+    def _poly(axis, coeffs):
+        """Return a PPoly from the cell polynomials in the fractional position.
+
+        `coeffs` has the coefficients of increasing powers of the fractional
+        position along `axis` with shape (4, len(axis) - 1).
+        """
+        scale = numpy.diff(axis)[numpy.newaxis, :] ** numpy.arange(4)[:, numpy.newaxis]
+
+        return PPoly((coeffs / scale)[::-1], axis, extrapolate=False)
+
+
+INTERPOLATORS = {'1D' : Interpolator1D,
+                 '2D' : Interpolator2D}
+# The interpolation methods, see Data.interpolation_method
+METHODS = ('LINEAR', 'PCHIP', 'CUBIC')
+CUBIC_INTERPOLATORS = {'1D' : CubicInterpolator1D,
+                       '2D' : CubicInterpolator2D}
+
+
+def build_interpolator(interp_type, data, method='LINEAR'):
+    """Return a new interpolator for the table dict `data`.
+
+    Parameters
+    ----------
+    interp_type : str
+        The interpolation type, one of the keys in INTERPOLATORS.
+    data : dict
+        The table data, as from `views._read_data_file`.
+    method : str, optional
+        The interpolation method, one of METHODS, default 'LINEAR'.
+    """
+    if method == 'LINEAR':
+        return INTERPOLATORS[interp_type].from_table(data)
+
+    return CUBIC_INTERPOLATORS[interp_type].from_table(data, method=method)
+
+
+class InterpolatorRegistry(object):
+    """Keep built interpolators so they can be reused between requests.
+
+    Each interpolator is stored against the Data's primary key,
+    interpolation type and method, along with the revision of the data file
+    it was built from. Looking up an interpolator for a newer revision
+    replaces the old one. As the interpolators precompute their coefficients
+    they're only calculated once for each revision of the table.
+    """
+    def __init__(self, max_entries=None):
+        self._cache = LRUCache(max_entries=max_entries)
+
+    def get(self, pk, interp_type, revision, data, method='LINEAR'):
+        """Return the interpolator for the table.
+
+        Parameters
+        ----------
+        pk : int
+            The primary key of the Data object.
+        interp_type : str
+            The interpolation type, one of the keys in INTERPOLATORS.
+        revision : hashable
+            The revision of the Data's file, as from `views._data_file_key`.
+        data : dict
+            The table data, as from `views._read_data_file`. Only used if the
+            interpolator needs to be built.
+        method : str, optional
+            The interpolation method, one of METHODS, default 'LINEAR'.
+        """
+        key = (pk, interp_type, method)
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == revision:
+            return entry[1]
+
+        interpolator = build_interpolator(interp_type, data, method)
+        self._cache.set(key, (revision, interpolator))
+
+        return interpolator
+
+    def discard(self, pk):
+        """Remove any interpolators for the Data with primary key `pk`."""
+        for interp_type in INTERPOLATORS:
+            for method in METHODS:
+                self._cache.discard((pk, interp_type, method))
+
+    def clear(self):
+        """Remove all interpolators."""
+        self._cache.clear()
+
+    def stats(self):
+        """Return a dict containing the registry's cache statistics."""
+        return self._cache.stats()
+
+
+_REGISTRY = None
+
+
+def interpolator_registry():
+    """Return the process-wide InterpolatorRegistry.
+
+    The number of interpolators kept is taken from the
+    PDBOOK_INTERPOLATOR_CACHE_ENTRIES setting.
+    """
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = InterpolatorRegistry(
+            getattr(settings, 'PDBOOK_INTERPOLATOR_CACHE_ENTRIES', 128)
+        )
+
+    return _REGISTRY
+
+
+class InterpolationBusy(Exception):
+    """Raised when the interpolation executor can't accept any more work."""
+    pass
+
+
+class BoundedExecutor(object):
+    """A thread pool that rejects work rather than queueing without limit.
+
+    At most `max_workers` functions are run at once with up to `max_queue`
+    more waiting, any further submissions raise InterpolationBusy. The
+    caller still waits for the result, so this sheds load when the pool is
+    saturated rather than freeing the caller's thread. Work that has started
+    can't be cancelled, each function keeps its slot until it finishes even
+    if its caller has timed out, so timed out work still counts against the
+    limit.
+    """
+    def __init__(self, max_workers=4, max_queue=16):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def submit(self, func, *args):
+        """Return a concurrent.futures.Future for `func(*args)`.
+
+        Raises InterpolationBusy if the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise InterpolationBusy('The interpolation queue is full')
+
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda f: self._slots.release())
+
+        return future
+
+    def run(self, func, *args, timeout=None):
+        """Return the result of `func(*args)`, run in the pool.
+
+        Blocks until the result is available. Raises InterpolationBusy if
+        the queue is full or the result isn't available within `timeout`
+        seconds. A timed out function that's still queued is cancelled and
+        frees its slot. One that has started keeps running in its thread,
+        and keeps its slot, until it finishes.
+        """
+        future = self.submit(func, *args)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise InterpolationBusy('The interpolation timed out before it started')
+
+            raise InterpolationBusy('The interpolation timed out and is still running')
+
+
+_EXECUTOR = None
+
+
+def interpolation_executor():
+    """Return the process-wide BoundedExecutor used for interpolation.
+
+    The pool size and queue limit are taken from the
+    PDBOOK_INTERPOLATION_WORKERS and PDBOOK_INTERPOLATION_QUEUE settings.
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = BoundedExecutor(
+            getattr(settings, 'PDBOOK_INTERPOLATION_WORKERS', 4),
+            getattr(settings, 'PDBOOK_INTERPOLATION_QUEUE', 16)
+        )
+
+    return _EXECUTOR
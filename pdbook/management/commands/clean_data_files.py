@@ -0,0 +1,67 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from pdbook.models import Data
+from pdbook.storage import TABLES_DIR, content_hash
+
+
+class Command(BaseCommand):
+    help = ("Remove the stored data files that are no longer used by any "
+            "data. Files stored less than --min-age seconds ago are kept so "
+            "that uploads that haven't been saved to their data yet aren't "
+            "removed.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help="Only remove files stored more than this "
+                                 "many seconds ago, default 3600.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="List the unused files without removing them.")
+
+    def handle(self, *args, **options):
+        storage = Data._meta.get_field('data').storage
+        unused = find_unused_files(storage, options['min_age'])
+        for path in unused:
+            if options['dry_run']:
+                self.stdout.write(path)
+            else:
+                os.remove(path)
+
+        self.stdout.write("{} {} unused data files".format(
+            'Found' if options['dry_run'] else 'Removed', len(unused)
+        ))
+
+
+def find_unused_files(storage, min_age=0):
+    """Return the paths of the content addressed data files no Data uses.
+
+    Parameters
+    ----------
+    storage : django.core.files.storage.FileSystemStorage
+        The storage used by the Data's files.
+    min_age : int, optional
+        Files modified (i.e. stored) less than `min_age` seconds ago aren't
+        included.
+
+    Returns
+    -------
+    list of str
+        The sorted absolute paths of the unused files.
+    """
+    used = set(Data.objects.values_list('data', flat=True))
+    cutoff = time.time() - min_age
+
+    unused = []
+    for root, _, fnames in os.walk(storage.path(TABLES_DIR)):
+        for fname in fnames:
+            path = os.path.join(root, fname)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            if content_hash(name) is None or name in used:
+                continue
+
+            if os.path.getmtime(path) <= cutoff:
+                unused.append(path)
+
+    return sorted(unused)
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+
+from pdbook.models import DataTable
+from pdbook.navigation import build_navigation
+
+
+# Stores the fingerprint of each exported page, relative to the output directory
+MANIFEST = '.pdbook-export.json'
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                            'templates', 'pdbook')
+
+
+class Command(BaseCommand):
+    help = ("Export the index, machine, beam and data pages, the beam ZIP "
+            "downloads and the JSON API to a directory of static files with "
+            "the same URL layout. Only pages whose machines, beams, data or "
+            "tables have changed since the last export are rendered again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory',
+                            help="The directory to export the pages to.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="The number of processes used to render the "
+                                 "pages, default is the number of CPUs.")
+        parser.add_argument('--force', action='store_true',
+                            help="Render every page, even if unchanged.")
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        os.makedirs(directory, exist_ok=True)
+
+        pages = collect_pages()
+        previous = {} if options['force'] else read_manifest(directory)
+        changed = [path for path, fingerprint in pages.items()
+                   if previous.get(path, {}).get('fingerprint') != fingerprint
+                   or not os.path.exists(os.path.join(directory, previous[path]['file']))]
+
+        manifest = {path : previous[path] for path in pages if path not in changed}
+        errors = []
+        for path, status, fname in render_pages(directory, changed, options['workers']):
+            if status != 200:
+                errors.append('{}: status {}'.format(path, status))
+                continue
+
+            manifest[path] = {'fingerprint' : pages[path], 'file' : fname}
+
+        removed = remove_stale(directory, previous, manifest)
+        write_manifest(directory, manifest)
+
+        if errors:
+            raise CommandError("Unable to export the pages:\n" + '\n'.join(errors))
+
+        self.stdout.write(
+            "Exported {} pages, {} unchanged, {} removed".format(
+                len(changed), len(pages) - len(changed), removed
+            )
+        )
+
+
+def collect_pages():
+    """Return the fingerprint of the inputs for each exported page.
+
+    The fingerprint of a page covers the fields of the Machines, Beams and
+    Data it shows (including the SHA-256 of the table files for the data
+    pages and beam downloads) as well as the page templates, so that a page
+    only needs to be rendered again when its fingerprint changes.
+
+    Returns
+    -------
+    dict of {str : str}
+        The fingerprint for each page URL path, in the order the pages are
+        listed in the navigation.
+    """
+    tree = build_navigation()
+    tables = dict(DataTable.objects.values_list('data_id', 'sha256'))
+
+    # The pages all show the navigation, the API responses don't
+    site = _digest([_template_digest()] + [_nav_row(m) for m in tree.machines])
+
+    pages = {reverse('index') : site,
+             reverse('api_machines') : _digest([_row(m) for m in tree.machines])}
+    for m in tree.machines:
+        beam_list = tree.beams_for(m)
+        beams = _digest([site] + [_nav_row(b) for b in beam_list])
+        pages[reverse('machine', args=[m.slug])] = beams
+        pages[reverse('api_machine', args=[m.slug])] = _digest(
+            [_row(m)] + [_row(b) for b in beam_list]
+        )
+
+        for b in beam_list:
+            data_list = tree.data_for(b)
+            data = _digest([beams] + [_nav_row(d) for d in data_list])
+            pages[reverse('beam', args=[m.slug, b.slug])] = data
+            pages[reverse('api_beam', args=[m.slug, b.slug])] = _digest(
+                [_row(m), _row(b)] + [_row(d) for d in data_list]
+            )
+            pages[reverse('download_beam', args=[m.slug, b.slug])] = _digest(
+                [_nav_row(m), _nav_row(b)]
+                + [[_nav_row(d), tables.get(d.pk)] for d in data_list]
+            )
+
+            for d in data_list:
+                table = tables.get(d.pk)
+                pages[reverse('data', args=[m.slug, b.slug, d.slug])] = _digest(
+                    [data, _row(d), table]
+                )
+                pages[reverse('api_data', args=[m.slug, b.slug, d.slug])] = _digest(
+                    [_row(m), _row(b), _row(d), table]
+                )
+
+    return pages
+
+def render_pages(directory, paths, workers=None):
+    """Render the pages at `paths` and write them to `directory`.
+
+    Parameters
+    ----------
+    directory : str
+        The export directory.
+    paths : list of str
+        The URL paths of the pages to render.
+    workers : int, optional
+        The number of worker processes to use, default is the number of CPUs.
+        If 1 then the pages are rendered in the current process.
+
+    Returns
+    -------
+    list of tuple
+        The (path, status code, file name relative to `directory`) for each
+        page. The file is None if the page wasn't written.
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    args = [(directory, path) for path in paths]
+    if workers <= 1:
+        return [export_page(*arg) for arg in args]
+
+    # The worker processes need their own database connections
+    connections.close_all()
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_export_page_worker, *zip(*args)))
+
+def export_page(directory, path):
+    """Render the page at the URL `path` and write it to `directory`.
+
+    Pages are written as <path>/index.html (or index.json for the JSON API)
+    as a page's URL can also be the start of other pages' URLs, and files such
+    as the beam ZIP downloads are written to <path>. Each file is replaced
+    atomically so the export can be served while it's updated.
+
+    Returns
+    -------
+    tuple
+        The (path, status code, file name relative to `directory`).
+    """
+    match = resolve(path)
+    request = RequestFactory().get(path)
+    # The rows URL used to scroll large tables isn't exported so the data
+    #   pages include the whole table
+    with override_settings(PDBOOK_TABLE_WINDOW_ROWS=None):
+        response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        return path, response.status_code, None
+
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+
+    content_type = response['Content-Type'].split(';')[0]
+    fname = path.strip('/')
+    if content_type == 'text/html':
+        fname = os.path.join(fname, 'index.html')
+    elif content_type == 'application/json':
+        fname = os.path.join(fname, 'index.json')
+
+    _write_file(os.path.join(directory, fname), content)
+
+    return path, 200, fname
+
+def _export_page_worker(directory, path):
+    """Return `export_page(directory, path)`, setting up Django if needed."""
+    if not apps.ready:
+        django.setup()
+
+    return export_page(directory, path)
+
+def read_manifest(directory):
+    """Return the manifest from the last export to `directory`, if any."""
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+def write_manifest(directory, manifest):
+    """Replace the manifest in `directory`."""
+    _write_file(os.path.join(directory, MANIFEST),
+                json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+def remove_stale(directory, previous, manifest):
+    """Remove the files for pages in the `previous` manifest no longer exported.
+
+    Returns
+    -------
+    int
+        The number of files removed.
+    """
+    removed = 0
+    for path, entry in previous.items():
+        if path in manifest and manifest[path]['file'] == entry['file']:
+            continue
+
+        fpath = os.path.join(directory, entry['file'])
+        if os.path.exists(fpath):
+            os.remove(fpath)
+            removed += 1
+
+        # Remove any directories left empty, up to the export directory
+        parent = os.path.dirname(fpath)
+        while os.path.abspath(parent) != os.path.abspath(directory):
+            if os.listdir(parent):
+                break
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+    return removed
+
+def _write_file(fpath, content):
+    """Atomically replace the file at `fpath` with the bytes `content`."""
+    os.makedirs(os.path.dirname(fpath), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(fpath), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, fpath)
+
+def _row(obj):
+    """Return a list of the values of all the model instance `obj`'s fields."""
+    return [str(getattr(obj, field.attname)) for field in obj._meta.concrete_fields]
+
+def _nav_row(obj):
+    """Return a list of the values of `obj`'s fields shown in the navigation."""
+    return [obj.pk, obj.slug, obj.visible_name, obj.description]
+
+def _digest(values):
+    """Return the SHA-256 hex digest of the JSON serialisable `values`."""
+    return hashlib.sha256(json.dumps(values).encode('utf-8')).hexdigest()
+
+def _template_digest():
+    """Return the SHA-256 hex digest of the page templates."""
+    sha = hashlib.sha256()
+    for fname in sorted(os.listdir(TEMPLATE_DIR)):
+        with open(os.path.join(TEMPLATE_DIR, fname), 'rb') as f:
+            sha.update(f.read())
+
+    return sha.hexdigest()
@@ -0,0 +1,326 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.template.defaultfilters import slugify
+
+from pdbook.interpolation import interpolator_registry
+from pdbook.models import RESERVED_SLUGS, Machine, Beam, Data, DataTable
+from pdbook.navigation import invalidate_navigation
+from pdbook.search import index_data
+from pdbook.storage import content_hash
+from pdbook.views import _check_table, _parse_csv_file
+
+
+class Command(BaseCommand):
+    help = ("Import a directory of CSV data files laid out as "
+            "<directory>/<machine>/<beam>/<data>.csv")
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory',
+                            help="The directory containing the machine directories.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="The number of processes used to check the "
+                                 "data files, default is the number of CPUs.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Check the data files without importing them.")
+
+    def handle(self, *args, **options):
+        files = find_data_files(options['directory'])
+        if not files:
+            raise CommandError("No CSV data files found in '{}'"
+                               .format(options['directory']))
+
+        checked = check_data_files([path for _, _, _, path in files],
+                                   options['workers'])
+
+        errors = ['{}: {}'.format(path, result['error'])
+                  for path, result in checked.items() if result['error']]
+        if errors:
+            raise CommandError("Unable to import the data files:\n"
+                               + '\n'.join(errors))
+
+        if options['dry_run']:
+            self.stdout.write("{} data files checked".format(len(files)))
+            return
+
+        with transaction.atomic():
+            counts = import_data_files(files, checked)
+
+        invalidate_navigation()
+        registry = interpolator_registry()
+        for pk in counts['updated_pks']:
+            registry.discard(pk)
+
+        self.stdout.write(
+            "Added {} machines, {} beams and {} data, updated {} data, "
+            "{} data unchanged".format(counts['machines'], counts['beams'],
+                                       counts['data'], len(counts['updated_pks']),
+                                       counts['unchanged'])
+        )
+
+
+def find_data_files(directory):
+    """Return the CSV data files in the data book `directory`.
+
+    Parameters
+    ----------
+    directory : str
+        The directory containing one sub-directory per Machine, each of which
+        contains one sub-directory per Beam with the CSV data files.
+
+    Returns
+    -------
+    list of tuple
+        The (machine name, beam name, data name, path) for each CSV data file,
+        sorted by path. The names are taken from the directory and file names.
+    """
+    if not os.path.isdir(directory):
+        raise CommandError("'{}' is not a directory".format(directory))
+
+    files = []
+    for machine_name in sorted(os.listdir(directory)):
+        machine_dir = os.path.join(directory, machine_name)
+        if not os.path.isdir(machine_dir):
+            continue
+
+        if slugify(machine_name) in RESERVED_SLUGS:
+            raise CommandError("The machine name '{}' is reserved".format(machine_name))
+
+        for beam_name in sorted(os.listdir(machine_dir)):
+            beam_dir = os.path.join(machine_dir, beam_name)
+            if not os.path.isdir(beam_dir):
+                continue
+
+            for fname in sorted(os.listdir(beam_dir)):
+                data_name, ext = os.path.splitext(fname)
+                path = os.path.join(beam_dir, fname)
+                if ext.lower() == '.csv' and os.path.isfile(path):
+                    files.append((machine_name, beam_name, data_name, path))
+
+    return files
+
+def check_data_files(paths, workers=None):
+    """Parse and validate the CSV data files at `paths`.
+
+    Parameters
+    ----------
+    paths : list of str
+        The paths to the CSV data files.
+    workers : int, optional
+        The number of worker processes to use, default is the number of CPUs.
+        If 1 then the files are checked in the current process.
+
+    Returns
+    -------
+    dict of {str : dict}
+        The result of `check_data_file` for each path, in the same order as
+        `paths`.
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        results = [check_data_file(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(_check_data_file_worker, paths))
+
+    return dict(zip(paths, results))
+
+def check_data_file(path):
+    """Parse and validate the CSV data file at `path`.
+
+    Parameters
+    ----------
+    path : str
+        The path to the CSV data file.
+
+    Returns
+    -------
+    dict
+        A dict with keys:
+            'error' : the reason the file is invalid or None if it's valid
+            'data' : the parsed data file, as from `views._parse_csv_file`
+            'sha256' : the SHA-256 hex digest of the file contents
+            'interpolation_type' : the type of interpolation the table
+                supports, the first of '2D', '1D' or 'NA' that passes
+                `views._check_table`
+    """
+    result = {'error' : None,
+              'data' : None,
+              'sha256' : None,
+              'interpolation_type' : 'NA'}
+    try:
+        with open(path, 'rb') as f:
+            result['sha256'] = hashlib.sha256(f.read()).hexdigest()
+
+        data = _parse_csv_file(path)
+        if isinstance(data, str):
+            result['error'] = data
+            return result
+
+        # The same checks as Data.clean, so the imported Data are valid
+        for interpolation_type in ('2D', '1D', 'NA'):
+            reason = _check_table(data, interpolation_type)
+            if reason is None:
+                break
+    except Exception as exc:
+        result['error'] = str(exc) or exc.__class__.__name__
+        return result
+
+    if reason is not None:
+        result['error'] = reason
+        return result
+
+    result['data'] = data
+    result['interpolation_type'] = interpolation_type
+
+    return result
+
+def _check_data_file_worker(path):
+    """Return `check_data_file(path)`, setting up Django if needed."""
+    if not apps.ready:
+        django.setup()
+
+    return check_data_file(path)
+
+def import_data_files(files, checked):
+    """Create or update the Machines, Beams and Data for the data files.
+
+    Existing Machines and Beams are matched by name and aren't modified.
+    Existing Data are matched by name and only have their data file replaced
+    if its contents have changed. Raises CommandError if a changed file
+    can't be interpolated with the existing Data's interpolation type.
+
+    Parameters
+    ----------
+    files : list of tuple
+        The data files, as from `find_data_files`.
+    checked : dict of {str : dict}
+        The checked data files, as from `check_data_files`.
+
+    Returns
+    -------
+    dict
+        The number of 'machines', 'beams' and 'data' created, the number of
+        'unchanged' data and a list of the primary keys of the updated data
+        as 'updated_pks'.
+    """
+    counts = {'machines' : 0, 'beams' : 0, 'data' : 0, 'unchanged' : 0,
+              'updated_pks' : []}
+
+    # Machines
+    machine_names = sorted(set(m_name for m_name, _, _, _ in files))
+    machines = _machines_by_name(machine_names)
+    new_machines = [Machine(name=name, slug=slugify(name), visible_name=name)
+                    for name in machine_names if name not in machines]
+    if new_machines:
+        Machine.objects.bulk_create(new_machines)
+        counts['machines'] = len(new_machines)
+        machines = _machines_by_name(machine_names)
+
+    # Beams
+    beam_keys = sorted(set((m_name, b_name) for m_name, b_name, _, _ in files))
+    beams = _beams_by_name(machines.values())
+    new_beams = [Beam(machine=machines[m_name], name=b_name,
+                      slug=slugify(b_name), visible_name=b_name)
+                 for m_name, b_name in beam_keys if (m_name, b_name) not in beams]
+    if new_beams:
+        Beam.objects.bulk_create(new_beams)
+        counts['beams'] = len(new_beams)
+        beams = _beams_by_name(machines.values())
+
+    # Data
+    beam_list = [beams[key] for key in beam_keys]
+    existing = Data.objects.select_related('table').filter(beam__in=beam_list)
+    existing = {(d.beam_id, d.name) : d for d in existing}
+
+    # The existing Data keep their interpolation type
+    errors = []
+    for m_name, b_name, d_name, path in files:
+        data_obj = existing.get((beams[(m_name, b_name)].pk, d_name))
+        result = checked[path]
+        if data_obj is not None and _file_sha256(data_obj) != result['sha256']:
+            reason = _check_table(result['data'], data_obj.interpolation_type)
+            if reason is not None:
+                errors.append('{}: {}'.format(path, reason))
+    if errors:
+        raise CommandError("Unable to import the data files:\n" + '\n'.join(errors))
+
+    new_data = []
+    changed = {}
+    for m_name, b_name, d_name, path in files:
+        beam = beams[(m_name, b_name)]
+        result = checked[path]
+
+        data_obj = existing.get((beam.pk, d_name))
+        if data_obj is None:
+            data_obj = Data(beam=beam, name=d_name, slug=slugify(d_name),
+                            visible_name=d_name,
+                            interpolation_type=result['interpolation_type'])
+            new_data.append(data_obj)
+        elif _file_sha256(data_obj) == result['sha256']:
+            counts['unchanged'] += 1
+            continue
+        else:
+            counts['updated_pks'].append(data_obj.pk)
+
+        with open(path, 'rb') as f:
+            data_obj.data.save(os.path.basename(path), File(f), save=False)
+
+        if data_obj.pk is not None:
+            Data.objects.filter(pk=data_obj.pk).update(data=data_obj.data.name)
+
+        changed[(beam.pk, d_name)] = result
+
+    Data.objects.bulk_create(new_data)
+    counts['data'] = len(new_data)
+
+    # Store the parsed tables for the new and updated Data
+    DataTable.objects.filter(data__in=counts['updated_pks']).delete()
+    tables = []
+    for data_obj in Data.objects.filter(beam__in=beam_list):
+        result = changed.get((data_obj.beam_id, data_obj.name))
+        if result is not None:
+            table_obj = DataTable(data=data_obj, sha256=result['sha256'])
+            table_obj.set_parsed(result['data'])
+            tables.append(table_obj)
+
+    DataTable.objects.bulk_create(tables)
+
+    # Signals aren't sent by bulk_create so update the search index here
+    data = Data.objects.select_related('beam__machine', 'table')
+    index_data(data.filter(pk__in=[table_obj.data_id for table_obj in tables]))
+
+    return counts
+
+def _machines_by_name(names):
+    """Return a dict of the existing Machines with `names`, keyed by name."""
+    return {m.name : m for m in Machine.objects.filter(name__in=names)}
+
+def _beams_by_name(machines):
+    """Return a dict of the Beams of `machines`, keyed by (machine name, name)."""
+    beams = Beam.objects.select_related('machine').filter(machine__in=list(machines))
+    return {(b.machine.name, b.name) : b for b in beams}
+
+def _file_sha256(data_obj):
+    """Return the SHA-256 hex digest of `data_obj`'s file, or None."""
+    sha256 = content_hash(data_obj.data.name)
+    if sha256 is not None:
+        return sha256
+
+    try:
+        return data_obj.table.sha256
+    except DataTable.DoesNotExist:
+        pass
+
+    try:
+        with open(data_obj.data.path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (IOError, OSError, ValueError):
+        return None
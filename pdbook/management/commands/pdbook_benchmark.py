@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pdbook.benchmarks import SAMPLES_DIR, TABLE_SIZES, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Benchmark parsing, formatting and interpolating the sample and "
+            "generated tables")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='pdbook-benchmarks.json',
+                            help="The JSON file to save the results to, default "
+                                 "'pdbook-benchmarks.json'.")
+        parser.add_argument('--compare', metavar='JSON_FILE',
+                            help="Previously saved results to compare against.")
+        parser.add_argument('--samples', default=SAMPLES_DIR,
+                            help="The directory of sample CSV files to use.")
+        parser.add_argument('--no-samples', action='store_true',
+                            help="Only benchmark the generated tables.")
+        parser.add_argument('--sizes', type=int, nargs='*', default=TABLE_SIZES,
+                            help="The sizes N of the generated N x N tables, "
+                                 "default 10 100 1000.")
+        parser.add_argument('--min-time', type=float, default=0.2,
+                            help="The minimum time to spend on each benchmark, "
+                                 "in seconds, default 0.2.")
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], 'r') as f:
+                    previous = json.load(f)
+            except (IOError, OSError, ValueError) as exc:
+                raise CommandError("Unable to read '{}': {}"
+                                   .format(options['compare'], exc))
+
+        samples = None if options['no_samples'] else options['samples']
+        results = run_benchmarks(samples, options['sizes'], options['min_time'])
+
+        row = '{:<24} {:<48} {:>12} {:>12} {:>12}'
+        self.stdout.write(row.format('Benchmark', 'Table', 'Best (us)',
+                                     'Median (us)', 'Peak (KiB)'))
+        for res in results['results']:
+            self.stdout.write(row.format(res['name'], res['table'],
+                                         '{:.1f}'.format(res['best'] * 1e6),
+                                         '{:.1f}'.format(res['median'] * 1e6),
+                                         '{:.1f}'.format(res['peak_bytes'] / 1024)))
+
+        if previous is not None:
+            self.stdout.write('\nChange from {}'.format(options['compare']))
+            for name, table, best, before, ratio in compare(results, previous):
+                self.stdout.write('{:<24} {:<48} {:>8.2f}x'.format(name, table, ratio))
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+
+        self.stdout.write("Results saved to '{}'".format(options['output']))
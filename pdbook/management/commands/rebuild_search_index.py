@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pdbook.models import SearchTerm
+from pdbook.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the search index for all the data. The index is updated "
+            "automatically whenever a machine, beam or data is saved so this "
+            "is only needed for data added before the index existed.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_index()
+
+        self.stdout.write("Indexed {} search terms".format(SearchTerm.objects.count()))
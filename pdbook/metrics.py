@@ -0,0 +1,423 @@
+import bisect
+import glob
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+
+
+# The upper bounds of the request latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# The modules containing the views that have their requests counted
+VIEW_MODULES = ('pdbook.views', 'pdbook.api')
+# The name of each process's file in PDBOOK_METRICS_DIR, with the process's ID
+#   and the time (in microseconds) it started writing metrics
+METRICS_FILE = re.compile(r'^pdbook-([1-9]\d*)-(\d+)\.json$')
+
+logger = logging.getLogger('pdbook.metrics')
+
+
+class MetricsRegistry(object):
+    """In-process request counters and latency histograms for the views.
+
+    Attributes
+    ----------
+    requests : dict of {str : int}
+        The number of requests handled by each view.
+    errors : dict of {str : int}
+        The number of requests to each view that resulted in a server error.
+    durations : dict of {str : dict}
+        The latency histogram for each view, as {'buckets' : list of int,
+        'sum' : float}, with one count per bucket in BUCKETS plus one for
+        requests slower than the last bucket (i.e. not cumulative).
+    interpolations : dict of {str : int}
+        The number of points interpolated for each interpolation type.
+    interpolation_cache : dict of {str : int}
+        The number of interpolation result cache 'hits' and 'misses'.
+    table_cache : dict of {str : int}
+        The number of parsed table cache 'hits' and 'misses'.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flushed = 0
+        self._pid = None
+        self._started = None
+        self.requests = {}
+        self.errors = {}
+        self.durations = {}
+        self.interpolations = {}
+        self.interpolation_cache = {'hits' : 0, 'misses' : 0}
+        self.table_cache = {'hits' : 0, 'misses' : 0}
+
+    def observe(self, view, duration, error=False):
+        """Record a request to `view` that took `duration` seconds."""
+        with self._lock:
+            self.requests[view] = self.requests.get(view, 0) + 1
+            if error:
+                self.errors[view] = self.errors.get(view, 0) + 1
+
+            histogram = self.durations.get(view)
+            if histogram is None:
+                histogram = {'buckets' : [0] * (len(BUCKETS) + 1), 'sum' : 0.0}
+                self.durations[view] = histogram
+
+            histogram['buckets'][bisect.bisect_left(BUCKETS, duration)] += 1
+            histogram['sum'] += duration
+
+    def count_interpolations(self, interp_type, count=1):
+        """Record `count` points interpolated with `interp_type`."""
+        with self._lock:
+            self.interpolations[interp_type] = (
+                self.interpolations.get(interp_type, 0) + count
+            )
+
+    def count_interpolation_cache(self, hit):
+        """Record an interpolation result cache hit (or miss if `hit` is False)."""
+        with self._lock:
+            self.interpolation_cache['hits' if hit else 'misses'] += 1
+
+    def count_table_cache(self, hit):
+        """Record a parsed table cache hit (or miss if `hit` is False)."""
+        with self._lock:
+            self.table_cache['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        """Return a JSON serialisable dict of the process's metrics."""
+        with self._lock:
+            return {'requests' : dict(self.requests),
+                    'errors' : dict(self.errors),
+                    'durations' : {view : {'buckets' : list(hist['buckets']),
+                                           'sum' : hist['sum']}
+                                   for view, hist in self.durations.items()},
+                    'interpolations' : dict(self.interpolations),
+                    'interpolation_cache' : dict(self.interpolation_cache),
+                    'table_cache' : dict(self.table_cache)}
+
+    def flush(self, force=False):
+        """Write the process's metrics to the PDBOOK_METRICS_DIR directory.
+
+        Each process writes its metrics to its own file (replacing the file
+        atomically) at most once every PDBOOK_METRICS_FLUSH_INTERVAL seconds
+        (default 5) unless `force` is True. The file is named with the
+        process's ID and the time it first wrote its metrics, so a process
+        reusing the ID of one that has exited doesn't replace its file. Does
+        nothing if PDBOOK_METRICS_DIR isn't set. Errors writing the file are
+        logged rather than raised so they don't affect the response.
+        """
+        directory = getattr(settings, 'PDBOOK_METRICS_DIR', None)
+        if not directory:
+            return
+
+        now = time.monotonic()
+        interval = getattr(settings, 'PDBOOK_METRICS_FLUSH_INTERVAL', 5)
+        if not force and now - self._flushed < interval:
+            return
+
+        self._flushed = now
+        pid = os.getpid()
+        if pid != self._pid:
+            # A new process, including one forked after a flush, has its own file
+            self._pid = pid
+            self._started = int(time.time() * 1000000)
+
+        path = None
+        try:
+            fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.snapshot(), f)
+
+            os.replace(path, os.path.join(directory,
+                                          'pdbook-{}-{}.json'.format(pid, self._started)))
+        except OSError as exc:
+            logger.warning("Unable to write the metrics to '%s': %s", directory, exc)
+            if path is not None:
+                _remove(path)
+
+    def collect(self):
+        """Return the metrics for all processes, as from `snapshot`.
+
+        If PDBOOK_METRICS_DIR is set then the metrics written by every
+        running process are combined, otherwise only this process's metrics
+        are used. The files of processes that have exited are removed, as are
+        the older files when a process ID has been reused, so their metrics
+        are no longer included.
+        """
+        directory = getattr(settings, 'PDBOOK_METRICS_DIR', None)
+        if not directory:
+            return self.snapshot()
+
+        self.flush(force=True)
+        latest = {}
+        for path in glob.glob(os.path.join(directory, 'pdbook-*.json')):
+            match = METRICS_FILE.match(os.path.basename(path))
+            if match is None or not _pid_alive(int(match.group(1))):
+                _remove(path)
+                continue
+
+            pid, started = int(match.group(1)), int(match.group(2))
+            if pid in latest and latest[pid][0] > started:
+                _remove(path)
+                continue
+
+            if pid in latest:
+                _remove(latest[pid][1])
+            latest[pid] = (started, path)
+
+        snapshots = []
+        for started, path in sorted(latest.values()):
+            try:
+                with open(path, 'r') as f:
+                    snapshots.append(json.load(f))
+            except (IOError, OSError, ValueError):
+                # The process's file is being replaced or was removed
+                continue
+
+        return merge(snapshots)
+
+    def clear(self):
+        """Remove all the recorded metrics."""
+        with self._lock:
+            self.requests.clear()
+            self.errors.clear()
+            self.durations.clear()
+            self.interpolations.clear()
+            self.interpolation_cache = {'hits' : 0, 'misses' : 0}
+            self.table_cache = {'hits' : 0, 'misses' : 0}
+
+
+def _pid_alive(pid):
+    """Return True if the process `pid` is running on this machine."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running as another user
+        return True
+
+    return True
+
+def _remove(path):
+    """Remove the file `path`, if another process hasn't already."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def merge(snapshots):
+    """Return the sum of the metrics `snapshots`, as from `MetricsRegistry.snapshot`."""
+    result = {'requests' : {}, 'errors' : {}, 'durations' : {},
+              'interpolations' : {}, 'table_cache' : {'hits' : 0, 'misses' : 0},
+              'interpolation_cache' : {'hits' : 0, 'misses' : 0}}
+    for snapshot in snapshots:
+        for name in ('requests', 'errors', 'interpolations', 'table_cache',
+                     'interpolation_cache'):
+            for key, value in snapshot.get(name, {}).items():
+                result[name][key] = result[name].get(key, 0) + value
+
+        for view, hist in snapshot.get('durations', {}).items():
+            total = result['durations'].setdefault(
+                view, {'buckets' : [0] * (len(BUCKETS) + 1), 'sum' : 0.0}
+            )
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], hist['buckets'])]
+            total['sum'] += hist['sum']
+
+    return result
+
+def quantile(buckets, q):
+    """Return an estimate of the `q` quantile of a latency histogram.
+
+    The value is linearly interpolated within the bucket containing the
+    quantile, in the same way as Prometheus' histogram_quantile().
+
+    Parameters
+    ----------
+    buckets : list of int
+        The (non-cumulative) count for each of BUCKETS plus the overflow.
+    q : float
+        The quantile, between 0 and 1.
+
+    Returns
+    -------
+    float or None
+        The estimated quantile in seconds, None if there are no requests.
+        Quantiles in the overflow bucket are given as the largest bound.
+    """
+    count = sum(buckets)
+    if not count:
+        return None
+
+    rank = q * count
+    cumulative = 0
+    for ii, bound in enumerate(BUCKETS):
+        if cumulative + buckets[ii] >= rank and buckets[ii]:
+            lower = BUCKETS[ii - 1] if ii else 0.0
+            return lower + (bound - lower) * (rank - cumulative) / buckets[ii]
+
+        cumulative += buckets[ii]
+
+    return BUCKETS[-1]
+
+def render_metrics(metrics):
+    """Return the `metrics` in the Prometheus text exposition format.
+
+    Parameters
+    ----------
+    metrics : dict
+        The metrics, as from `MetricsRegistry.collect`.
+
+    Returns
+    -------
+    str
+    """
+    lines = []
+
+    def family(name, metric_type, help_text, samples):
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+        for suffix, labels, value in samples:
+            label_str = ','.join('{}="{}"'.format(key, _escape(val))
+                                 for key, val in labels)
+            if label_str:
+                label_str = '{' + label_str + '}'
+            lines.append('{}{}{} {}'.format(name, suffix, label_str, _number(value)))
+
+    views = sorted(metrics['requests'])
+    family('pdbook_requests_total', 'counter',
+           'The number of requests handled by each view.',
+           [('', [('view', view)], metrics['requests'][view]) for view in views])
+    family('pdbook_errors_total', 'counter',
+           'The number of requests to each view resulting in a server error.',
+           [('', [('view', view)], metrics['errors'].get(view, 0)) for view in views])
+
+    samples = []
+    quantiles = []
+    for view in sorted(metrics['durations']):
+        hist = metrics['durations'][view]
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist['buckets']):
+            cumulative += count
+            samples.append(('_bucket', [('view', view), ('le', bound)], cumulative))
+
+        count = sum(hist['buckets'])
+        samples.append(('_bucket', [('view', view), ('le', '+Inf')], count))
+        samples.append(('_sum', [('view', view)], hist['sum']))
+        samples.append(('_count', [('view', view)], count))
+
+        for q in QUANTILES:
+            value = quantile(hist['buckets'], q)
+            if value is not None:
+                quantiles.append(('', [('view', view), ('quantile', q)], value))
+
+    family('pdbook_request_duration_seconds', 'histogram',
+           'The time taken to handle requests to each view.', samples)
+    family('pdbook_request_duration_quantile_seconds', 'gauge',
+           'The estimated p50, p95 and p99 request latency for each view.',
+           quantiles)
+
+    family('pdbook_interpolations_total', 'counter',
+           'The number of points interpolated for each interpolation type.',
+           [('', [('type', interp_type)], count)
+            for interp_type, count in sorted(metrics['interpolations'].items())])
+
+    for name, description in (('table_cache', 'parsed table cache'),
+                              ('interpolation_cache', 'interpolation result cache')):
+        hits = metrics[name]['hits']
+        misses = metrics[name]['misses']
+        family('pdbook_{}_hits_total'.format(name), 'counter',
+               'The number of {} hits.'.format(description), [('', [], hits)])
+        family('pdbook_{}_misses_total'.format(name), 'counter',
+               'The number of {} misses.'.format(description), [('', [], misses)])
+        family('pdbook_{}_hit_ratio'.format(name), 'gauge',
+               'The fraction of {} lookups that were hits.'.format(description),
+               [('', [], hits / (hits + misses) if hits + misses else 0)])
+
+    return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    """Return the label `value` escaped for the exposition format."""
+    if isinstance(value, float):
+        return _number(value)
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value):
+    """Return the sample `value` formatted for the exposition format."""
+    if isinstance(value, float):
+        return repr(value)
+
+    return str(value)
+
+
+_REGISTRY = None
+
+
+def metrics_registry():
+    """Return the process-wide MetricsRegistry."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = MetricsRegistry()
+
+    return _REGISTRY
+
+
+class MetricsMiddleware(object):
+    """Record the number of requests, errors and latency for the pdbook views.
+
+    Responses with a 5xx status code are counted as errors.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        directory = getattr(settings, 'PDBOOK_METRICS_DIR', None)
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as exc:
+                logger.warning("Unable to create the metrics directory '%s': %s",
+                               directory, exc)
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        view = getattr(request, '_pdbook_view', None)
+        if view is not None:
+            registry = metrics_registry()
+            registry.observe(view, time.perf_counter() - start,
+                             error=response.status_code >= 500)
+            registry.flush()
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, '__module__', None) in VIEW_MODULES:
+            request._pdbook_view = view_func.__name__
+
+
+@require_safe
+def metrics(request):
+    """Return the metrics for the pdbook views in the Prometheus text format.
+
+    The view has no access control, access to it should be restricted by the
+    web server if the metrics shouldn't be public.
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The request
+
+    Returns
+    -------
+    response : HttpResponse
+    """
+    text = render_metrics(metrics_registry().collect())
+
+    return HttpResponse(text, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,3 +1,4 @@
+import json
 import os
 
 from django.conf import settings
@@ -9,6 +10,14 @@ from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import format_html, mark_safe
 
+import numpy
+
+from pdbook.storage import ContentAddressedStorage
+
+
+# Machine slugs that would be shadowed by the API and metrics URLs
+RESERVED_SLUGS = ('api', 'metrics', 'search')
+
 
 class Machine(models.Model):
     """Define the model for a device that produces radiation.
@@ -84,6 +93,17 @@ class Machine(models.Model):
         self.slug = slugify(self.name)
         super(Machine, self).save(*args, **kwargs)
 
+    def clean(self):
+        """Check the name doesn't give a slug used by the site's other URLs.
+
+        Raises
+        ------
+        ValidationError
+            If the slug for the name is one of RESERVED_SLUGS.
+        """
+        if slugify(self.name) in RESERVED_SLUGS:
+            raise ValidationError({'name' : "The name '{}' is reserved".format(self.name)})
+
 
 class Beam(models.Model):
     """Define the model for a radiation beam.
@@ -175,7 +195,11 @@ class Beam(models.Model):
 
 
 class OverwriteStorage(FileSystemStorage):
-    """Override the FileSystemStorage class to overwrite existing files."""
+    """Override the FileSystemStorage class to overwrite existing files.
+
+    No longer used by the Data model (see ContentAddressedStorage), kept so
+    that existing migrations can still be loaded.
+    """
     def get_available_name(self, name, max_length=None):
         if self.exists(name):
             os.remove(os.path.join(settings.MEDIA_ROOT, name))
@@ -197,9 +221,10 @@ class DataManager(models.Manager):
         Returns
         -------
         str
-            The upload path, including the filename. The file will then be
-            uploaded to <MEDIA_ROOT>/<MACHINE SLUG>/<BEAM SLUG>/<FILE NAME>
-            where <MEDIA_ROOT> is the Django MEDIA_ROOT location.
+            The upload path, including the filename, as
+            <MACHINE SLUG>/<BEAM SLUG>/<FILE NAME>. The file is then stored by
+            ContentAddressedStorage under the SHA-256 of its contents, so
+            only the extension of the name is kept.
         """
         m_slug = instance.beam.machine.slug
         b_slug = instance.beam.slug
@@ -224,6 +249,11 @@ class Data(models.Model):
         A short description of the Data.
     has_interpolation : str
         The data has an interpolation widget (default False)
+    interpolation_method : str
+        The interpolation method, one of:
+            'LINEAR' - linear or bilinear interpolation (default)
+            'PCHIP' - monotone piecewise cubic Hermite interpolation
+            'CUBIC' - cubic or bicubic spline interpolation
     name : str
         The beam name used in URLs, max 25 characters. Must be unique.
     visible_name : str
@@ -240,7 +270,7 @@ class Data(models.Model):
                              help_text="The beam object this data belongs to.",
                              on_delete=models.CASCADE)
     data = models.FileField(upload_to=objects._upload_directory_path,
-                            storage=OverwriteStorage(),
+                            storage=ContentAddressedStorage(),
                             help_text="The CSV file containing the table data.")
     data_source = models.CharField(max_length=100, blank=True,
                                    help_text="The source of the table data. Will "
@@ -256,6 +286,16 @@ class Data(models.Model):
                                           help_text="If 1D/2D interpolation is "
                                                     "chosen then the interpolation "
                                                     "widget will be available.")
+    interpolation_method = models.CharField(default='LINEAR',
+                                            max_length=6,
+                                            choices=(('LINEAR', 'Linear'),
+                                                     ('PCHIP', 'Monotone cubic (PCHIP)'),
+                                                     ('CUBIC', 'Cubic spline')),
+                                            help_text="The interpolation method. "
+                                                      "Monotone cubic doesn't "
+                                                      "overshoot the table values "
+                                                      "and suits curves such as "
+                                                      "PDDs and TPRs.")
     show_y_values = models.BooleanField(default=False,
                                         help_text="Show the Y parameter values "
                                         "in addition to the Y row labels.")
@@ -290,3 +330,171 @@ class Data(models.Model):
         """Regenerate the slug every time the object gets saved"""
         self.slug = slugify(self.name)
         super(Data, self).save(*args, **kwargs)
+
+    def clean(self):
+        """Check the uploaded data file can be displayed (and interpolated).
+
+        Raises
+        ------
+        ValidationError
+            If the data file can't be parsed, or if interpolation is enabled
+            and the table isn't numeric with increasing X and Y values.
+        """
+        # Avoid a circular import, the views use the models
+        from pdbook.views import _check_table, _parse_csv_content
+
+        if not self.data:
+            return
+
+        self.data.open('rb')
+        try:
+            content = self.data.read()
+        finally:
+            self.data.seek(0)
+
+        try:
+            error = _check_table(_parse_csv_content(content),
+                                 self.interpolation_type)
+        except (UnicodeDecodeError, ValueError) as exc:
+            error = 'Unable to parse the data file: {}'.format(exc)
+
+        if error:
+            raise ValidationError({'data' : error})
+
+
+class DataTable(models.Model):
+    """Define the model for the parsed table from a Data's CSV file.
+
+    The table is stored when the Data is saved so that it can be displayed
+    without reading the CSV file.
+
+    Attributes
+    ----------
+    data : Data
+        The Data the table was parsed from.
+    sha256 : str
+        The SHA-256 hex digest of the CSV file contents.
+    modified : datetime.datetime
+        When the table was last stored.
+    n_rows : int
+        The number of rows in the packed table values.
+    n_cols : int
+        The number of columns in the packed table values.
+    xy_values : bytes
+        The table values as packed little-endian float64 in row major order,
+        for rectangular NUMERIC tables.
+    xy_rows : str
+        The JSON encoded table rows for all other tables.
+
+    The remaining attributes are the JSON encoded values of the
+    corresponding CSV file keywords (i.e. `x_values` is X_VALUES).
+    """
+    # The CSV file keywords and their corresponding field
+    KEYWORDS = (('DESCRIPTION', 'description'), ('SOURCE', 'source'),
+                ('X_TITLE', 'x_title'), ('X_HEADERS', 'x_headers'),
+                ('X_FORMAT', 'x_format'), ('X_VALUES', 'x_values'),
+                ('Y_TITLE', 'y_title'), ('Y_HEADERS', 'y_headers'),
+                ('Y_FORMAT', 'y_format'), ('Y_VALUES', 'y_values'),
+                ('XY_FORMAT', 'xy_format'), ('XY_TYPE', 'xy_type'))
+
+    data = models.OneToOneField(Data, primary_key=True, related_name='table',
+                                on_delete=models.CASCADE)
+    sha256 = models.CharField(max_length=64)
+    modified = models.DateTimeField(auto_now=True)
+
+    description = models.TextField(default='""')
+    source = models.TextField(default='""')
+    x_title = models.TextField(default='""')
+    x_headers = models.TextField(default='""')
+    x_format = models.TextField(default='["{}"]')
+    x_values = models.TextField(default='[]')
+    y_title = models.TextField(default='""')
+    y_headers = models.TextField(default='""')
+    y_format = models.TextField(default='["{}"]')
+    y_values = models.TextField(default='[]')
+    xy_format = models.TextField(default='["{}"]')
+    xy_type = models.TextField(default='["NUMERIC"]')
+
+    n_rows = models.PositiveIntegerField(default=0)
+    n_cols = models.PositiveIntegerField(default=0)
+    xy_values = models.BinaryField(null=True)
+    xy_rows = models.TextField(default='[]')
+
+    def __str__(self):
+        """Return a str representation of the DataTable."""
+        return 'Table for {}'.format(self.data_id)
+
+    def set_parsed(self, parsed):
+        """Set the table from the parsed data file `parsed`.
+
+        Parameters
+        ----------
+        parsed : dict
+            The parsed data file, as from `views._parse_csv_file`.
+        """
+        for keyword, field in self.KEYWORDS:
+            setattr(self, field, json.dumps(parsed[keyword]))
+
+        rows = parsed['XY_VALUES']
+        if isinstance(rows, numpy.ndarray):
+            self.n_rows, self.n_cols = rows.shape
+            self.xy_values = rows.astype('<f8').tobytes()
+            self.xy_rows = '[]'
+        else:
+            self.n_rows, self.n_cols = len(rows), 0
+            self.xy_values = None
+            self.xy_rows = json.dumps(rows)
+
+    def get_parsed(self):
+        """Return the table as a parsed data file.
+
+        Returns
+        -------
+        dict
+            The table in the same form as returned by
+            `views._parse_csv_file`.
+        """
+        parsed = {keyword : json.loads(getattr(self, field))
+                  for keyword, field in self.KEYWORDS}
+
+        if self.xy_values is not None:
+            values = numpy.frombuffer(bytes(self.xy_values), dtype='<f8')
+            parsed['XY_VALUES'] = values.reshape(self.n_rows, self.n_cols)
+        else:
+            parsed['XY_VALUES'] = json.loads(self.xy_rows)
+
+        return parsed
+
+    def get_size(self):
+        """Return the approximate size of the stored table, in bytes."""
+        return len(self.xy_values or b'') + len(self.xy_rows)
+
+
+class SearchTerm(models.Model):
+    """Define the model for the search index entries of a Data.
+
+    Each Data has one SearchTerm for each distinct word in its names,
+    descriptions and table titles (and those of its Beam and Machine) so that
+    searches don't need to read the CSV files.
+
+    Attributes
+    ----------
+    term : str
+        The lower case word.
+    data : Data
+        The Data the word was found in.
+    weight : int
+        How important the word is to the Data, the highest weight of the
+        fields the word was found in.
+    """
+    term = models.CharField(max_length=64, db_index=True)
+    data = models.ForeignKey(Data, related_name='search_terms',
+                             on_delete=models.CASCADE)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('term', 'data')
+
+    def __str__(self):
+        """Return a str representation of the SearchTerm."""
+        return '{} ({})'.format(self.term, self.data_id)
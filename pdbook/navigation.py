@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404
+
+from pdbook.models import Machine, Beam, Data
+from pdbook.timing import span
+
+
+NAVIGATION_CACHE_KEY = 'pdbook:navigation'
+
+
+class NavigationTree(object):
+    """The Machines, Beams and Data shown in the page navigation.
+
+    The Beams have their Machine and the Data their Beam and Machine already
+    loaded, so the tree can be rendered without any further queries.
+
+    Attributes
+    ----------
+    machines : list of Machine
+        All the Machines, sorted by name.
+    beams : dict of {int : list of Beam}
+        The Beams for each Machine's primary key, sorted by modality and name.
+    data : dict of {int : list of Data}
+        The Data for each Beam's primary key, sorted by name.
+    """
+    def __init__(self, machines, beams, data):
+        self.machines = list(machines)
+        self.beams = {m.pk : [] for m in self.machines}
+        for b in beams:
+            self.beams.setdefault(b.machine_id, []).append(b)
+
+        self.data = {b.pk : [] for b in beams}
+        for d in data:
+            self.data.setdefault(d.beam_id, []).append(d)
+
+    def get_machine(self, machine_slug):
+        """Return the Machine with `machine_slug` or raise Http404."""
+        for m in self.machines:
+            if m.slug == machine_slug:
+                return m
+
+        raise Http404('No Machine matches the given query.')
+
+    def get_beam(self, machine_slug, beam_slug):
+        """Return the Beam with `beam_slug` for the Machine with `machine_slug`.
+
+        Raises Http404 if there is no such Beam.
+        """
+        for b in self.beams_for(self.get_machine(machine_slug)):
+            if b.slug == beam_slug:
+                return b
+
+        raise Http404('No Beam matches the given query.')
+
+    def beams_for(self, machine):
+        """Return a list of the Beams for `machine`."""
+        return self.beams.get(machine.pk, [])
+
+    def data_for(self, beam):
+        """Return a list of the Data for `beam`."""
+        return self.data.get(beam.pk, [])
+
+
+@span('navigation')
+def build_navigation():
+    """Return a new NavigationTree built from the database (3 queries)."""
+    machines = Machine.objects.order_by('-name')[:].reverse()
+    beams = Beam.objects.select_related('machine')
+    beams = beams.order_by('machine', 'modality', '-name')[:].reverse()
+    data = Data.objects.select_related('beam__machine')
+    data = data.order_by('beam', '-name')[:].reverse()
+
+    return NavigationTree(machines, list(beams), data)
+
+def get_navigation():
+    """Return the NavigationTree, from the cache if available.
+
+    The tree is stored in the cache named by the PDBOOK_NAVIGATION_CACHE
+    setting (default 'default') for PDBOOK_NAVIGATION_CACHE_TIMEOUT seconds
+    (default 3600) and removed whenever a Machine, Beam or Data is saved or
+    deleted. When running multiple processes the cache should be shared
+    between them (i.e. not the local memory cache) so that changes are seen
+    by every process.
+    """
+    cache = _get_cache()
+    tree = cache.get(NAVIGATION_CACHE_KEY)
+    if tree is None:
+        tree = build_navigation()
+        timeout = getattr(settings, 'PDBOOK_NAVIGATION_CACHE_TIMEOUT', 3600)
+        cache.set(NAVIGATION_CACHE_KEY, tree, timeout)
+
+    return tree
+
+def invalidate_navigation():
+    """Remove the cached NavigationTree."""
+    _get_cache().delete(NAVIGATION_CACHE_KEY)
+
+def _get_cache():
+    """Return the cache used to store the NavigationTree."""
+    return caches[getattr(settings, 'PDBOOK_NAVIGATION_CACHE', 'default')]
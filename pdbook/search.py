@@ -0,0 +1,151 @@
+import html
+import json
+import re
+
+from django.db.models import Q
+from django.utils.html import strip_tags
+
+from pdbook.models import Data, DataTable, SearchTerm
+from pdbook.navigation import get_navigation
+
+
+# Words are runs of letters or numbers, so '15MV' is '15' and 'mv'
+_WORD = re.compile(r'[^\W\d_]+|\d+(?:\.\d+)?')
+_LINE_BREAK = re.compile(r'<\s*/?\s*br\s*/?\s*>', re.IGNORECASE)
+# The maximum number of words used from a search query
+MAX_QUERY_TERMS = 8
+# The weights of the words found in the names, descriptions and table titles
+NAME_WEIGHT = 4
+PARENT_WEIGHT = 3
+DESCRIPTION_WEIGHT = 2
+TABLE_WEIGHT = 1
+
+
+def tokenize(text):
+    """Return a list of the lower case words in `text`, ignoring HTML tags."""
+    if not text:
+        return []
+
+    # Other tags are only formatting, so 'd<sub>max</sub>' is 'dmax'
+    text = html.unescape(strip_tags(_LINE_BREAK.sub(' ', text))).lower()
+
+    return [word[:SearchTerm._meta.get_field('term').max_length]
+            for word in _WORD.findall(text)]
+
+def data_terms(data_obj):
+    """Return a dict of {term : weight} for the words describing `data_obj`.
+
+    The words are taken from the Data's names, description and source, the
+    names and descriptions of its Beam and Machine and the DESCRIPTION,
+    SOURCE, X_TITLE and Y_TITLE values of its stored table.
+    """
+    b = data_obj.beam
+    m = b.machine
+    fields = [(NAME_WEIGHT, [data_obj.visible_name, data_obj.name]),
+              (PARENT_WEIGHT, [b.visible_name, b.name, m.visible_name, m.name]),
+              (DESCRIPTION_WEIGHT, [data_obj.description, data_obj.data_source,
+                                    b.description, m.description]),
+              (TABLE_WEIGHT, _table_text(data_obj))]
+
+    terms = {}
+    for weight, texts in fields:
+        for text in texts:
+            for term in tokenize(text):
+                terms[term] = max(terms.get(term, 0), weight)
+
+    return terms
+
+def _table_text(data_obj):
+    """Return a list of the searchable keyword values of `data_obj`'s table."""
+    try:
+        table_obj = data_obj.table
+    except DataTable.DoesNotExist:
+        return []
+
+    if table_obj is None:
+        return []
+
+    texts = []
+    for field in ('description', 'source', 'x_title', 'y_title'):
+        value = json.loads(getattr(table_obj, field))
+        texts.extend(value if isinstance(value, list) else [value])
+
+    return texts
+
+def index_data(data_list):
+    """Replace the search index entries for each Data in `data_list`.
+
+    The Data should have their Beam, Machine and DataTable already loaded
+    (i.e. with select_related('beam__machine', 'table')).
+    """
+    data_list = list(data_list)
+    if not data_list:
+        return
+
+    SearchTerm.objects.filter(data__in=data_list).delete()
+    SearchTerm.objects.bulk_create(
+        [SearchTerm(term=term, data=d, weight=weight)
+         for d in data_list for term, weight in sorted(data_terms(d).items())]
+    )
+
+def rebuild_index():
+    """Rebuild the search index entries for every Data."""
+    SearchTerm.objects.all().delete()
+    index_data(Data.objects.select_related('beam__machine', 'table'))
+
+def search(query, limit=20):
+    """Return the Data matching the search `query`, best match first.
+
+    Every word in the query must match the start of a word describing the
+    Data. Matches are ranked by the total weight of the fields the words are
+    found in, with exact words ranked higher than partial ones.
+
+    Parameters
+    ----------
+    query : str
+        The search query.
+    limit : int, optional
+        The maximum number of results, default 20.
+
+    Returns
+    -------
+    list of (Data, int)
+        The matching Data, with their Beam and Machine, and the match score.
+
+    Notes
+    -----
+    Query budget: 1 (the matching search terms), plus 3 if the navigation
+    tree isn't cached.
+    """
+    words = []
+    for word in tokenize(query):
+        if word not in words:
+            words.append(word)
+
+    words = words[:MAX_QUERY_TERMS]
+    if not words:
+        return []
+
+    condition = Q()
+    for word in words:
+        condition |= Q(term__startswith=word)
+
+    # The best score for each query word for each Data
+    matches = {}
+    rows = SearchTerm.objects.filter(condition).values_list('term', 'data_id', 'weight')
+    for term, data_id, weight in rows:
+        scores = matches.setdefault(data_id, {})
+        for word in words:
+            if term.startswith(word):
+                score = 2 * weight + (term == word)
+                scores[word] = max(scores.get(word, 0), score)
+
+    tree = get_navigation()
+    data = {d.pk : d for data_list in tree.data.values() for d in data_list}
+    results = [(data[data_id], sum(scores.values()))
+               for data_id, scores in matches.items()
+               if len(scores) == len(words) and data_id in data]
+    results.sort(key=lambda result: (-result[1], result[0].beam.machine.name,
+                                     result[0].beam.name, result[0].name))
+
+    return results[:limit]
@@ -0,0 +1,55 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from pdbook.interpolation import interpolator_registry
+from pdbook.models import Machine, Beam, Data, DataTable
+from pdbook.navigation import invalidate_navigation
+from pdbook.search import index_data
+from pdbook.views import _store_table
+
+
+@receiver(post_save, sender=Data)
+def store_data_table(sender, instance, **kwargs):
+    """Store the parsed table from the Data's CSV file after saving.
+
+    Files that can't be parsed aren't stored so that the error is reported
+    when the data is viewed.
+    """
+    try:
+        _store_table(instance)
+    except (IOError, OSError, ValueError):
+        DataTable.objects.filter(data=instance).delete()
+        instance.table = None
+
+@receiver(post_save, sender=Data)
+def index_data_terms(sender, instance, **kwargs):
+    """Update the search index for the Data after its table is stored."""
+    index_data([instance])
+
+@receiver(post_save, sender=Machine)
+@receiver(post_save, sender=Beam)
+def index_child_data_terms(sender, instance, **kwargs):
+    """Update the search index for the Data of a changed Machine or Beam."""
+    data = Data.objects.select_related('beam__machine', 'table')
+    if sender is Machine:
+        data = data.filter(beam__machine=instance)
+    else:
+        data = data.filter(beam=instance)
+
+    index_data(data)
+
+@receiver(post_save, sender=Data)
+@receiver(post_delete, sender=Data)
+def discard_interpolators(sender, instance, **kwargs):
+    """Remove any interpolators built for the previous version of the Data."""
+    interpolator_registry().discard(instance.pk)
+
+@receiver(post_save, sender=Machine)
+@receiver(post_delete, sender=Machine)
+@receiver(post_save, sender=Beam)
+@receiver(post_delete, sender=Beam)
+@receiver(post_save, sender=Data)
+@receiver(post_delete, sender=Data)
+def discard_navigation(sender, instance, **kwargs):
+    """Remove the cached navigation tree when the Machines, Beams or Data change."""
+    invalidate_navigation()
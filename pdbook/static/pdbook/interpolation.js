@@ -33,15 +33,18 @@ $.ajaxSetup({
 // Interpolation functions
 var updateTable = function(result, status) {
     if (status == "success") {
-        var data = $.parseJSON(result.responseText);
-        if (data['table_type'] == '2D') {
-            update2DTable(data);
-        } else {
-            update1DTable(data);
-        };
+        showResult($.parseJSON(result.responseText));
     };
 }
 
+function showResult(data) {
+    if (data['table_type'] == '2D') {
+        update2DTable(data);
+    } else {
+        update1DTable(data);
+    };
+};
+
 function update2DTable(tableData) {
     if (tableData['x_value_ok'] == false) {
         document.getElementById("x-input").style.border = "1px solid #ef0c34";
@@ -111,3 +114,425 @@ function reset_1d_table() {
     document.getElementById("interp-result1").innerHTML = ''
     document.getElementById("bl1").innerHTML = ''
 };
+
+// Client side interpolation
+//   Interpolates using the table embedded in the page by the get_data view,
+//   giving the same results as the interpolate view (which remains the
+//   reference implementation) without a request to the server. Falls back
+//   to the interpolate view if the table uses a format that can't be
+//   reproduced here.
+var interpolationPayload = null;
+
+function loadInterpolationPayload() {
+    var element = document.getElementById("interpolation-payload");
+    if (element === null) {
+        return null;
+    };
+
+    var payload = JSON.parse(element.textContent);
+    var formats = [payload['y_format'], payload['xy_format']];
+    if (payload['table_type'] == '2D') {
+        formats.push(payload['x_format']);
+    };
+    for (var i = 0; i < formats.length; i++) {
+        if (pyFormat(formats[i], 1.5) === null) {
+            return null;
+        };
+    };
+
+    return payload;
+};
+
+// Return the parsed input value, null if blank or NaN if not a number
+function parseInput(text) {
+    text = jQuery.trim(text);
+    if (text === '') {
+        return null;
+    };
+
+    return Number(text);
+};
+
+// Return the index of the first axis value not less than value
+function searchSorted(axis, value) {
+    var lo = 0;
+    var hi = axis.length;
+    while (lo < hi) {
+        var mid = (lo + hi) >> 1;
+        if (axis[mid] < value) {
+            lo = mid + 1;
+        } else {
+            hi = mid;
+        };
+    };
+
+    return lo;
+};
+
+// Return the index of the axis interval containing value
+function bracket(axis, value) {
+    var lo = 0;
+    var hi = axis.length;
+    while (lo < hi) {
+        var mid = (lo + hi) >> 1;
+        if (axis[mid] <= value) {
+            lo = mid + 1;
+        } else {
+            hi = mid;
+        };
+    };
+
+    return Math.min(Math.max(lo - 1, 0), axis.length - 2);
+};
+
+// Return the two axis values nearest to value, as interpolation.neighbours
+function neighbours(axis, value) {
+    var index = searchSorted(axis, value);
+    var candidates = [];
+    for (var i = Math.max(index - 2, 0); i < Math.min(index + 2, axis.length); i++) {
+        candidates.push(i);
+    };
+    candidates.sort(function(a, b) {
+        return Math.abs(axis[a] - value) - Math.abs(axis[b] - value);
+    });
+
+    var nearest = [axis[candidates[0]], axis[candidates[1]]];
+    return nearest.sort(function(a, b) { return a - b; });
+};
+
+function lerp(x, x0, x1, f0, f1) {
+    return (f1 - f0) / (x1 - x0) * (x - x0) + f0;
+};
+
+// The cubic Hermite basis functions for the values and derivatives at t = 0, 1
+function hermiteBasis(t) {
+    var t2 = t * t;
+    var t3 = t2 * t;
+    return [1 - 3 * t2 + 2 * t3, 3 * t2 - 2 * t3, t - 2 * t2 + t3, t3 - t2];
+};
+
+function evaluate1D(payload, y) {
+    var axis = payload['y'];
+    var f = payload['values'];
+    var i = bracket(axis, y);
+    if (payload['method'] == 'LINEAR') {
+        return lerp(y, axis[i], axis[i + 1], f[i], f[i + 1]);
+    };
+
+    var h = axis[i + 1] - axis[i];
+    var d = payload['slopes'];
+    var b = hermiteBasis((y - axis[i]) / h);
+
+    return b[0] * f[i] + b[1] * f[i + 1] + b[2] * d[i] * h + b[3] * d[i + 1] * h;
+};
+
+function evaluate2D(payload, x, y) {
+    var xAxis = payload['x'];
+    var yAxis = payload['y'];
+    var f = payload['values'];
+    var ix = bracket(xAxis, x);
+    var iy = bracket(yAxis, y);
+    if (payload['method'] == 'LINEAR') {
+        var x0 = xAxis[ix];
+        var x1 = xAxis[ix + 1];
+        var lower = lerp(x, x0, x1, f[iy][ix], f[iy][ix + 1]);
+        var upper = lerp(x, x0, x1, f[iy + 1][ix], f[iy + 1][ix + 1]);
+
+        return lerp(y, yAxis[iy], yAxis[iy + 1], lower, upper);
+    };
+
+    // Bicubic Hermite patch from the values and derivatives at the corners
+    var hx = xAxis[ix + 1] - xAxis[ix];
+    var hy = yAxis[iy + 1] - yAxis[iy];
+    var fx = payload['slopes'][0];
+    var fy = payload['slopes'][1];
+    var fxy = payload['slopes'][2];
+    var bx = hermiteBasis((x - xAxis[ix]) / hx);
+    var by = hermiteBasis((y - yAxis[iy]) / hy);
+
+    // First index along X (values at x0, x1 then derivatives), second along Y
+    var corners = [];
+    var columns = [[f, 1, ix], [f, 1, ix + 1], [fx, hx, ix], [fx, hx, ix + 1]];
+    for (var i = 0; i < 4; i++) {
+        var g = columns[i][0];
+        var gy = (g === f) ? fy : fxy;
+        var scale = columns[i][1];
+        var col = columns[i][2];
+        corners.push([g[iy][col] * scale, g[iy + 1][col] * scale,
+                      gy[iy][col] * scale * hy, gy[iy + 1][col] * scale * hy]);
+    };
+
+    var result = 0;
+    for (var i = 0; i < 4; i++) {
+        for (var j = 0; j < 4; j++) {
+            result += bx[i] * corners[i][j] * by[j];
+        };
+    };
+
+    return result;
+};
+
+function formatAll(fmt, values) {
+    var result = [];
+    for (var i = 0; i < values.length; i++) {
+        result.push(pyFormat(fmt, values[i]));
+    };
+
+    return result;
+};
+
+// Return the interpolation results in the same form as the interpolate view
+function interpolateLocally(payload, x, y) {
+    if (payload['table_type'] == '1D') {
+        var axis = payload['y'];
+        var yValueOk = Boolean(y && axis[0] <= y && y <= axis[axis.length - 1]);
+        var yVals = [];
+        var values = [];
+        if (yValueOk) {
+            var yNear = neighbours(axis, y);
+            yVals = [yNear[0], y, yNear[1]];
+            for (var i = 0; i < 3; i++) {
+                values.push(evaluate1D(payload, yVals[i]));
+            };
+        };
+
+        return {'y_value_ok' : yValueOk,
+                'table_type' : '1D',
+                'y_values' : formatAll(payload['y_format'], yVals),
+                'table_data' : formatAll(payload['xy_format'], values)};
+    };
+
+    var xAxis = payload['x'];
+    var yAxis = payload['y'];
+    var result = {'x_value_ok' : Boolean(x && xAxis[0] <= x && x <= xAxis[xAxis.length - 1]),
+                  'y_value_ok' : Boolean(y && yAxis[0] <= y && y <= yAxis[yAxis.length - 1]),
+                  'table_type' : '2D',
+                  'x_values' : [],
+                  'y_values' : [],
+                  'table_data' : []};
+    if (!(result['x_value_ok'] && result['y_value_ok'])) {
+        return result;
+    };
+
+    var xNear = neighbours(xAxis, x);
+    var yNear = neighbours(yAxis, y);
+    var xVals = [xNear[0], x, xNear[1]];
+    var yVals = [yNear[0], y, yNear[1]];
+    for (var j = 0; j < 3; j++) {
+        var row = [];
+        for (var i = 0; i < 3; i++) {
+            row.push(evaluate2D(payload, xVals[i], yVals[j]));
+        };
+        result['table_data'].push(formatAll(payload['xy_format'], row));
+    };
+    result['x_values'] = formatAll(payload['x_format'], xVals);
+    result['y_values'] = formatAll(payload['y_format'], yVals);
+
+    return result;
+};
+
+// Python style number formatting
+//   Supports formats such as '{}', '{:.3f}', '{:+.2e} cm', '{:8.3g}' and
+//   '{:.1%}' the same as python's str.format(), returns null for formats
+//   that aren't supported.
+var PY_FORMAT = /^([^{}]*)\{0?(?::([+\- ]?)(#?)(0?)(\d*)(?:\.(\d+))?([eEfFgG%]?))?\}([^{}]*)$/;
+
+function pyFormat(fmt, value) {
+    if (fmt.indexOf('{') == -1 && fmt.indexOf('}') == -1) {
+        return fmt;
+    };
+
+    var match = PY_FORMAT.exec(fmt);
+    if (match === null) {
+        return null;
+    };
+
+    var sign = match[2];
+    var alternate = match[3] == '#';
+    var zeroPad = match[4] == '0';
+    var width = match[5] ? parseInt(match[5], 10) : 0;
+    var precision = (match[6] !== undefined) ? parseInt(match[6], 10) : null;
+    var type = match[7] || '';
+    if (type === '' && precision !== null) {
+        return null;
+    };
+
+    var negative = value < 0 || (value === 0 && 1 / value < 0);
+    var number = formatMagnitude(Math.abs(value), type, precision, alternate);
+    if (number === null) {
+        return null;
+    };
+
+    var prefix = negative ? '-' : ((sign == '+' || sign == ' ') ? sign : '');
+    var padding = '';
+    var padChar = (zeroPad && isFinite(value)) ? '0' : ' ';
+    for (var i = prefix.length + number.length; i < width; i++) {
+        padding += padChar;
+    };
+
+    if (padChar == '0') {
+        number = prefix + padding + number;
+    } else {
+        number = padding + prefix + number;
+    };
+
+    return match[1] + number + match[8];
+};
+
+function formatMagnitude(value, type, precision, alternate) {
+    var upper = (type == 'E' || type == 'F' || type == 'G');
+    if (!isFinite(value)) {
+        var text = isNaN(value) ? 'nan' : 'inf';
+        text = upper ? text.toUpperCase() : text;
+        return (type == '%') ? text + '%' : text;
+    };
+
+    var text;
+    switch (type.toLowerCase()) {
+        case '':
+            return formatRepr(value);
+        case 'f':
+            text = roundFixed(value, (precision === null) ? 6 : precision);
+            if (text !== null && alternate && text.indexOf('.') == -1) {
+                text += '.';
+            };
+            return text;
+        case '%':
+            text = roundFixed(value * 100, (precision === null) ? 6 : precision);
+            if (text !== null && alternate && text.indexOf('.') == -1) {
+                text += '.';
+            };
+            return (text === null) ? null : text + '%';
+        case 'e':
+            text = roundExponential(value, (precision === null) ? 6 : precision, alternate);
+            return upper ? text.toUpperCase() : text;
+        case 'g':
+            text = formatGeneral(value, (precision === null) ? 6 : precision, alternate);
+            return (upper && text !== null) ? text.toUpperCase() : text;
+    };
+
+    return null;
+};
+
+// Return true if the exact decimal digits after the rounding position are
+//   a tie, i.e. '5' followed by zeros
+function isTie(digits) {
+    return /^50*$/.test(digits);
+};
+
+// Like value.toFixed(precision) but rounding ties to even, as python does
+function roundFixed(value, precision) {
+    if (value >= 1e21 || precision > 75) {
+        return null;
+    };
+
+    var text = value.toFixed(precision);
+    var exact = value.toFixed(precision + 25);
+    var cut = exact.length - 25;
+    if (isTie(exact.slice(cut))) {
+        var truncated = exact.slice(0, (precision == 0) ? cut - 1 : cut);
+        if (parseInt(truncated.charAt(truncated.length - 1), 10) % 2 == 0) {
+            text = truncated;
+        };
+    };
+
+    return text;
+};
+
+// Like value.toExponential(precision) with python's rounding and exponent
+function roundExponential(value, precision, alternate) {
+    if (precision > 75) {
+        return null;
+    };
+
+    var parts = value.toExponential(precision).split('e');
+    var exact = value.toExponential(precision + 25).split('e');
+    var cut = exact[0].length - 25;
+    if (isTie(exact[0].slice(cut))) {
+        var truncated = exact[0].slice(0, (precision == 0) ? cut - 1 : cut);
+        if (parseInt(truncated.charAt(truncated.length - 1), 10) % 2 == 0) {
+            parts = [truncated, exact[1]];
+        };
+    };
+
+    var mantissa = parts[0];
+    if (alternate && mantissa.indexOf('.') == -1) {
+        mantissa += '.';
+    };
+
+    return mantissa + 'e' + pyExponent(parseInt(parts[1], 10));
+};
+
+// Return the exponent with a sign and at least two digits, e.g. '+05'
+function pyExponent(exponent) {
+    var digits = String(Math.abs(exponent));
+    if (digits.length < 2) {
+        digits = '0' + digits;
+    };
+
+    return ((exponent < 0) ? '-' : '+') + digits;
+};
+
+function formatGeneral(value, precision, alternate) {
+    if (precision == 0) {
+        precision = 1;
+    };
+
+    var text;
+    var exponent = 0;
+    if (value != 0) {
+        exponent = parseInt(roundExponential(value, precision - 1, false).split('e')[1], 10);
+    };
+
+    if (-4 <= exponent && exponent < precision) {
+        text = roundFixed(value, precision - 1 - exponent);
+        if (text === null) {
+            return null;
+        };
+        if (alternate) {
+            return (text.indexOf('.') == -1) ? text + '.' : text;
+        };
+        return stripZeros(text);
+    };
+
+    text = roundExponential(value, precision - 1, alternate);
+    if (alternate) {
+        return text;
+    };
+
+    var parts = text.split('e');
+    return stripZeros(parts[0]) + 'e' + parts[1];
+};
+
+// Remove the trailing zeros after the decimal point, and the point if unused
+function stripZeros(text) {
+    if (text.indexOf('.') == -1) {
+        return text;
+    };
+
+    return text.replace(/0+$/, '').replace(/\.$/, '');
+};
+
+// Return the same as python's repr() of the float value
+function formatRepr(value) {
+    var parts = value.toExponential().split('e');
+    var digits = parts[0].replace('.', '');
+    var exponent = parseInt(parts[1], 10);
+    if (exponent < -4 || exponent >= 16) {
+        var mantissa = digits.charAt(0);
+        if (digits.length > 1) {
+            mantissa += '.' + digits.slice(1);
+        };
+        return mantissa + 'e' + pyExponent(exponent);
+    };
+
+    if (exponent < 0) {
+        return '0.' + new Array(-exponent).join('0') + digits;
+    };
+
+    if (digits.length <= exponent + 1) {
+        return digits + new Array(exponent + 2 - digits.length).join('0') + '.0';
+    };
+
+    return digits.slice(0, exponent + 1) + '.' + digits.slice(exponent + 1);
+};
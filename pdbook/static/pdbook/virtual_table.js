@@ -0,0 +1,164 @@
+// Virtual scrolling for large tables
+//   The data page only includes the first rows of tables with more than
+//   PDBOOK_TABLE_WINDOW_ROWS rows. As the page is scrolled the rows around
+//   the visible part of the table are fetched from the data's rows URL a
+//   block at a time and the rows that aren't shown are replaced by spacers
+//   of the same height.
+
+// The number of rows rendered above and below the visible rows
+var VIRTUAL_OVERSCAN = 20;
+// The cell classes used by tablesaw to show and hide the columns
+var TABLESAW_CELL_CLASSES = ['tablesaw-cell-hidden', 'tablesaw-cell-persist'];
+
+function VirtualTable(container) {
+    this.table = container.find('table.tablesaw');
+    this.tbody = this.table.children('tbody');
+    this.url = container.data('rows-url');
+    this.nRows = parseInt(container.data('n-rows'), 10);
+    this.blockRows = parseInt(container.data('window-rows'), 10);
+    this.nColumns = this.table.find('thead th').length;
+    this.blocks = {};
+    this.pending = {};
+
+    // The first block of rows is included in the page
+    var rows = this.tbody.children('tr');
+    var block = [];
+    rows.each(function() {
+        var cells = [];
+        $(this).children('td').each(function() {
+            cells.push(this.innerHTML);
+        });
+        block.push(cells);
+    });
+    this.blocks[0] = block;
+    this.rowHeight = rows.first().outerHeight() || 20;
+    this.first = 0;
+    this.last = block.length;
+
+    this.top = $(this.spacerHTML());
+    this.bottom = $(this.spacerHTML());
+    this.tbody.prepend(this.top).append(this.bottom);
+    this.resizeSpacers();
+};
+
+// Return the HTML for a spacer row
+VirtualTable.prototype.spacerHTML = function() {
+    var html = '<tr class="virtual-spacer">';
+    for (var i = 0; i < this.nColumns; i++) {
+        html += '<td></td>';
+    };
+
+    return html + '</tr>';
+};
+
+VirtualTable.prototype.resizeSpacers = function() {
+    this.top.css('height', (this.first * this.rowHeight) + 'px');
+    this.bottom.css('height', ((this.nRows - this.last) * this.rowHeight) + 'px');
+};
+
+// Return the [first, last) rows that should be rendered
+VirtualTable.prototype.visibleRows = function() {
+    var offset = $(window).scrollTop() - this.tbody.offset().top;
+    var first = Math.floor(offset / this.rowHeight) - VIRTUAL_OVERSCAN;
+    first = Math.min(Math.max(first, 0), this.nRows);
+    var count = Math.ceil($(window).height() / this.rowHeight) + 2 * VIRTUAL_OVERSCAN;
+
+    return [first, Math.min(first + count, this.nRows)];
+};
+
+// Render the visible rows, fetching any that haven't been loaded
+VirtualTable.prototype.update = function() {
+    var range = this.visibleRows();
+    var first = range[0];
+    var last = range[1];
+    for (var block = Math.floor(first / this.blockRows); block * this.blockRows < last; block++) {
+        this.fetch(block);
+    };
+
+    if (first != this.first || last != this.last) {
+        this.render(first, last);
+    };
+};
+
+VirtualTable.prototype.fetch = function(block) {
+    if (block in this.blocks || block in this.pending) {
+        return;
+    };
+
+    var self = this;
+    this.pending[block] = true;
+    $.ajax({
+        type: "GET",
+        url: this.url,
+        data: {'start' : block * this.blockRows,
+               'stop' : (block + 1) * this.blockRows},
+        dataType: 'json',
+        success: function(result) {
+            self.blocks[block] = result['rows'];
+            // Show the new rows if they're visible
+            if (block * self.blockRows < self.last && (block + 1) * self.blockRows > self.first) {
+                self.render(self.first, self.last);
+            };
+        },
+        complete: function() {
+            delete self.pending[block];
+        }
+    });
+};
+
+// Replace the rendered rows with the rows [first, last)
+VirtualTable.prototype.render = function(first, last) {
+    // Keep the columns shown or hidden by tablesaw
+    var columnClasses = [];
+    this.table.find('thead th').each(function() {
+        var header = $(this);
+        columnClasses.push(jQuery.grep(TABLESAW_CELL_CLASSES, function(name) {
+            return header.hasClass(name);
+        }).join(' '));
+    });
+
+    var html = '';
+    for (var index = first; index < last; index++) {
+        var block = this.blocks[Math.floor(index / this.blockRows)];
+        var row = block ? block[index % this.blockRows] : null;
+        html += row ? '<tr>' : '<tr class="virtual-loading" style="height: ' + this.rowHeight + 'px">';
+        for (var i = 0; i < (row ? row.length : this.nColumns); i++) {
+            html += '<td class="' + (columnClasses[i] || '') + '">' + (row ? row[i] : '') + '</td>';
+        };
+        html += '</tr>';
+    };
+
+    this.tbody.children('tr').not('.virtual-spacer').remove();
+    this.top.after(html);
+    this.first = first;
+    this.last = last;
+    this.resizeSpacers();
+
+    // Let tablesaw find the new cells, it adds to each header's cells
+    //   rather than replacing them
+    var tablesaw = this.table.data('tablesaw');
+    if (tablesaw) {
+        this.table.find('thead th').each(function() {
+            delete this.cells;
+        });
+        tablesaw._initCells();
+    };
+};
+
+$(document).ready(function() {
+    $('.virtual-table').each(function() {
+        var virtualTable = new VirtualTable($(this));
+        var scheduled = false;
+        $(window).on('scroll resize', function() {
+            if (scheduled) {
+                return;
+            };
+            scheduled = true;
+            window.requestAnimationFrame(function() {
+                scheduled = false;
+                virtualTable.update();
+            });
+        });
+        virtualTable.update();
+    });
+});
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+# The directory the data files are stored in, relative to the storage location
+TABLES_DIR = 'tables'
+# The names of content addressed files, <TABLES_DIR>/<ab>/<abcdef...>.<ext>
+_CONTENT_NAME = re.compile(r'^{}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.\w+)?$'.format(TABLES_DIR))
+
+
+def content_hash(name):
+    """Return the SHA-256 hex digest from a content addressed file `name`.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stored file, such as a FileField's ``name``.
+
+    Returns
+    -------
+    str or None
+        The SHA-256 hex digest of the file contents, or None if `name` isn't
+        the name of a file stored by ContentAddressedStorage.
+    """
+    match = _CONTENT_NAME.match(name or '')
+    if match:
+        return match.group(1)
+
+    return None
+
+def content_name(sha256, extension=''):
+    """Return the name of the content addressed file with SHA-256 `sha256`."""
+    return '{}/{}/{}{}'.format(TABLES_DIR, sha256[:2], sha256, extension)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Store files by the SHA-256 of their contents.
+
+    Each file is written to a temporary file, flushed to disk and then moved
+    into place as <TABLES_DIR>/<ab>/<sha256>.<ext> (keeping the extension of
+    the uploaded file's name, the rest of the name isn't used). As a file is
+    never modified once stored, a request reading a file while a new version
+    is uploaded reads the old contents, and switches to the new file once the
+    Data's reference to it has been updated. Files with the same contents,
+    such as a table shared by several beams, are only stored once.
+
+    Replaced files aren't removed, as other Data may also use them or a
+    request may still be reading them; use the clean_data_files command to
+    remove files that are no longer used.
+    """
+    def get_available_name(self, name, max_length=None):
+        """Return `name`, the stored name depends on the contents instead."""
+        return name
+
+    def _save(self, name, content):
+        """Store the file `content`, returning its content addressed name."""
+        directory = self.path(TABLES_DIR)
+        os.makedirs(directory, exist_ok=True)
+
+        sha = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    sha.update(chunk)
+                    f.write(chunk)
+
+                f.flush()
+                os.fsync(f.fileno())
+
+            name = content_name(sha.hexdigest(), os.path.splitext(name)[1].lower())
+            path = self.path(name)
+            if os.path.exists(path):
+                # Already stored, mark it as recently stored for clean_data_files
+                os.remove(tmp_path)
+                os.utime(path, None)
+                return name
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            mode = self.file_permissions_mode
+            os.chmod(tmp_path, 0o644 if mode is None else mode)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        _fsync_directory(os.path.dirname(path))
+
+        return name
+
+
+def _fsync_directory(directory):
+    """Flush the entries of `directory` to disk, where supported."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
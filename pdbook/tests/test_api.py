@@ -0,0 +1,114 @@
+import json
+import os
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase, Client
+
+from pdbook.models import Machine, Beam, Data
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
+class TestAPI(TestCase):
+    """Test the JSON API"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d1 = Data.objects.create(beam=self.b,
+                                      name='Data Name 01',
+                                      visible_name='Data 01')
+        self.d1.data.save(os.path.basename(SAMPLE_1D), open(SAMPLE_1D, 'r'))
+        self.d2 = Data.objects.create(beam=self.b,
+                                      name='Data Name 02',
+                                      visible_name='Data 02')
+        self.d2.data.save(os.path.basename(SAMPLE_2D), open(SAMPLE_2D, 'r'))
+        self.d3 = Data.objects.create(beam=self.b,
+                                      name='Data Name 03',
+                                      visible_name='Data 03')
+
+    def _get(self, name, args, **headers):
+        c = Client()
+        rsp = c.get(reverse(name, args=args), **headers)
+        return rsp, json.loads(rsp.content.decode('utf-8') or 'null')
+
+    def test_machines(self):
+        """Test listing the machines"""
+        rsp, out = self._get('api_machines', [])
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(out['machines'][0]['slug'], self.m.slug)
+        self.assertEqual(out['machines'][0]['url'],
+                         reverse('api_machine', args=[self.m.slug]))
+
+    def test_machine(self):
+        """Test a machine lists its beams"""
+        rsp, out = self._get('api_machine', [self.m.slug])
+        self.assertEqual(out['visible_name'], 'Linac 01')
+        self.assertEqual([b['slug'] for b in out['beams']], [self.b.slug])
+        rsp = Client().get(reverse('api_machine', args=['no-such-machine']))
+        self.assertEqual(rsp.status_code, 404)
+
+    def test_beam(self):
+        """Test a beam lists its data"""
+        rsp, out = self._get('api_beam', [self.m.slug, self.b.slug])
+        self.assertEqual([d['slug'] for d in out['data']],
+                         [self.d1.slug, self.d2.slug, self.d3.slug])
+
+    def test_data_1d(self):
+        """Test the 1D table data"""
+        rsp, out = self._get('api_data', [self.m.slug, self.b.slug, self.d1.slug])
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(out['y_values'][:3], [2.0, 3.0, 4.0])
+        self.assertEqual(out['values'][:2], [[0.653], [0.688]])
+        self.assertEqual(out['row_labels'][0], '2.0 x 2.0')
+        self.assertEqual(out['xy_format'], '{:.3f}')
+
+    def test_data_2d(self):
+        """Test the 2D table data"""
+        rsp, out = self._get('api_data', [self.m.slug, self.b.slug, self.d2.slug])
+        self.assertEqual(len(out['x_values']), 22)
+        self.assertEqual(len(out['y_values']), 53)
+        self.assertEqual(len(out['values']), 53)
+        self.assertEqual(out['values'][1][1], 100.1)
+
+    def test_data_no_file(self):
+        """Test a Data without a valid file"""
+        rsp, out = self._get('api_data', [self.m.slug, self.b.slug, self.d3.slug])
+        self.assertEqual(rsp.status_code, 500)
+        self.assertTrue('error' in out)
+
+    def test_conditional_get(self):
+        """Test conditional requests for unchanged data get 304"""
+        args = [self.m.slug, self.b.slug, self.d1.slug]
+        rsp, out = self._get('api_data', args)
+        etag = rsp['ETag']
+        self.assertTrue(rsp.has_header('Last-Modified'))
+
+        c = Client()
+        rsp = c.get(reverse('api_data', args=args), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(rsp.status_code, 304)
+        self.assertEqual(rsp['ETag'], etag)
+
+        rsp = c.get(reverse('api_data', args=args),
+                    HTTP_IF_MODIFIED_SINCE=rsp['Last-Modified'])
+        self.assertEqual(rsp.status_code, 304)
+
+    def test_etag_changes(self):
+        """Test the ETag changes with the file and the Data fields"""
+        args = [self.m.slug, self.b.slug, self.d1.slug]
+        c = Client()
+        etag = c.get(reverse('api_data', args=args))['ETag']
+
+        self.d1.description = 'Changed'
+        self.d1.save()
+        new_etag = c.get(reverse('api_data', args=args))['ETag']
+        self.assertNotEqual(etag, new_etag)
+
+        self.d1.data.save(os.path.basename(SAMPLE_1D), open(SAMPLE_2D, 'r'))
+        rsp = c.get(reverse('api_data', args=args), HTTP_IF_NONE_MATCH=new_etag)
+        self.assertEqual(rsp.status_code, 200)
@@ -1,9 +1,20 @@
+import io
+import os
+import zipfile
+
 from django.core.urlresolvers import reverse
 from django.test import TestCase, Client
 
+import numpy
+
 from pdbook.models import Machine, Beam, Data
 
 
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
 class TestBeamView(TestCase):
     """Test the beam view"""
     def setUp(self):
@@ -55,6 +66,20 @@ class TestBeamView(TestCase):
         self.assertFalse(b"No data has been added" in rsp.content)
         self.assertEqual(len(rsp.context['data_list']), 1)
 
+    def test_query_budget(self):
+        """Test the beam view uses no queries once the navigation is cached"""
+        Data.objects.create(beam=self.m1_b2,
+                            name='Data Name M01B02D01',
+                            visible_name='Data M01B02D01')
+        Data.objects.create(beam=self.m1_b2,
+                            name='Data Name M01B02D02',
+                            visible_name='Data M01B02D02')
+        c = Client()
+        c.get(reverse('index'))
+        with self.assertNumQueries(0):
+            rsp = c.get(reverse('beam', args=[self.m1.slug, self.m1_b2.slug]))
+        self.assertEqual(rsp.status_code, 200)
+
     def test_machine_selector_some_beams(self):
         """Test the machine selector shows the available machines"""
         Data.objects.create(beam=self.m1_b2,
@@ -69,3 +94,59 @@ class TestBeamView(TestCase):
         self.assertEqual(rsp.status_code, 200)
         self.assertEqual(len(rsp.context['data_list']), 2)
 
+
+
+class TestBeamDownload(TestCase):
+    """Test downloading all the data for a beam"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d1 = Data.objects.create(beam=self.b,
+                                      name='Data Name 01',
+                                      visible_name='Data 01')
+        self.d1.data.save('iso_ci.csv', open(SAMPLE_1D, 'r'))
+        self.d2 = Data.objects.create(beam=self.b,
+                                      name='Data Name 02',
+                                      visible_name='Data 02')
+        self.d2.data.save('ssd_pdd.csv', open(SAMPLE_2D, 'r'))
+        self.d3 = Data.objects.create(beam=self.b,
+                                      name='Data Name 03',
+                                      visible_name='Data 03')
+
+    def test_download(self):
+        """Test the ZIP file contains the CSV files and arrays"""
+        url = reverse('download_beam', args=[self.m.slug, self.b.slug])
+        rsp = Client().get(url)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue(rsp.streaming)
+        self.assertEqual(rsp['Content-Type'], 'application/zip')
+        self.assertTrue('attachment' in rsp['Content-Disposition'])
+
+        zf = zipfile.ZipFile(io.BytesIO(b''.join(rsp.streaming_content)))
+        self.assertEqual(sorted(zf.namelist()),
+                         sorted(['{}.csv'.format(self.d1.slug),
+                                 '{}.csv'.format(self.d2.slug),
+                                 '{}.npz'.format(self.b.slug)]))
+        with open(SAMPLE_2D, 'rb') as f:
+            self.assertEqual(zf.read('{}.csv'.format(self.d2.slug)), f.read())
+
+        npz = numpy.load(io.BytesIO(zf.read('{}.npz'.format(self.b.slug))))
+        values = npz['{}/values'.format(self.d2.slug)]
+        x_values = npz['{}/x_values'.format(self.d2.slug)]
+        y_values = npz['{}/y_values'.format(self.d2.slug)]
+        self.assertEqual(values.shape, (len(y_values), len(x_values)))
+        self.assertTrue('{}/values'.format(self.d1.slug) in npz.files)
+
+    def test_download_link(self):
+        """Test the beam page links to the download"""
+        rsp = Client().get(reverse('beam', args=[self.m.slug, self.b.slug]))
+        url = reverse('download_beam', args=[self.m.slug, self.b.slug])
+        self.assertTrue(url.encode('utf-8') in rsp.content)
+
+    def test_no_beam(self):
+        """Test a 404 is returned for an unknown beam"""
+        rsp = Client().get(reverse('download_beam', args=[self.m.slug, 'none']))
+        self.assertEqual(rsp.status_code, 404)
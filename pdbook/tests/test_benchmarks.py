@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from pdbook.benchmarks import compare, run_benchmarks
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+
+
+class TestBenchmarks(TestCase):
+    """Test the benchmark suite"""
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_run(self):
+        """Test running the benchmarks"""
+        results = run_benchmarks(SAMPLE_DIR, sizes=[4], min_time=0.001)
+        self.assertTrue('numpy' in results['environment'])
+
+        found = {(res['name'], res['table']) : res for res in results['results']}
+        for name in ['parse', 'read', 'build_interpolator_1d', 'interpolate_1d']:
+            self.assertTrue((name, 'iso_ci.csv') in found)
+            self.assertTrue((name, 'generated_4x1.csv') in found)
+
+        for name in ['build_interpolator_2d', 'interpolate_2d']:
+            self.assertTrue((name, 'ssd_pdd.csv') in found)
+            self.assertTrue((name, 'generated_4x4.csv') in found)
+            self.assertFalse((name, 'generated_4x1.csv') in found)
+
+        result = found[('parse', 'ssd_pdd.csv')]
+        self.assertEqual(result['shape'], [53, 22])
+        self.assertTrue(result['best'] <= result['median'])
+        self.assertTrue(result['peak_bytes'] > 0)
+        self.assertTrue(result['calls'] >= 1)
+
+    def test_command(self):
+        """Test the pdbook_benchmark command saves and compares results"""
+        first = os.path.join(self.tmpdir, 'first.json')
+        second = os.path.join(self.tmpdir, 'second.json')
+        options = ['--samples', SAMPLE_DIR, '--sizes', '3', '--min-time', '0.001']
+
+        call_command('pdbook_benchmark', '--output', first, *options,
+                     stdout=StringIO())
+        out = StringIO()
+        call_command('pdbook_benchmark', '--output', second, '--compare', first,
+                     *options, stdout=out)
+        self.assertTrue('Change from' in out.getvalue())
+
+        with open(first) as f, open(second) as g:
+            changes = compare(json.load(g), json.load(f))
+        self.assertTrue(('interpolate_2d', 'generated_3x3.csv') in
+                        [change[:2] for change in changes])
@@ -0,0 +1,158 @@
+import os
+
+from django.test import TestCase
+
+from pdbook.cache import LRUCache, table_cache
+from pdbook.models import Machine, Beam, Data
+from pdbook.views import _read_data_file, _render_table
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
+class TestLRUCache(TestCase):
+    """Test the LRUCache class"""
+    def test_get_set(self):
+        """Test adding and retrieving values"""
+        cache = LRUCache()
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('a', 1), 1)
+        cache.set('a', 2)
+        self.assertEqual(cache.get('a'), 2)
+        self.assertTrue('a' in cache)
+        self.assertEqual(len(cache), 1)
+
+    def test_counters(self):
+        """Test the hit and miss counters"""
+        cache = LRUCache()
+        cache.get('a')
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        cache.clear()
+        self.assertEqual(cache.stats()['hits'], 0)
+
+    def test_entry_budget(self):
+        """Test the least recently used entry is evicted"""
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_byte_budget(self):
+        """Test entries are evicted to stay within the byte budget"""
+        cache = LRUCache(max_bytes=100)
+        cache.set('a', 1, size=60)
+        cache.set('b', 2, size=30)
+        self.assertEqual(cache.stats()['bytes'], 90)
+        cache.set('c', 3, size=30)
+        self.assertFalse('a' in cache)
+        self.assertEqual(cache.stats()['bytes'], 60)
+        # Too large to ever be cached
+        cache.set('d', 4, size=101)
+        self.assertFalse('d' in cache)
+
+    def test_discard(self):
+        """Test removing an entry"""
+        cache = LRUCache()
+        cache.set('a', 1, size=10)
+        cache.discard('a')
+        cache.discard('b')
+        self.assertFalse('a' in cache)
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+
+class TestTableCache(TestCase):
+    """Test the parsed table cache is used when reading data files"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01')
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'), False)
+        table_cache().clear()
+
+    def test_cache_hit(self):
+        """Test the second read of a file uses the cache"""
+        first = _read_data_file(self.d)
+        self.assertEqual(table_cache().stats()['misses'], 1)
+        second = _read_data_file(self.d)
+        self.assertEqual(table_cache().stats()['hits'], 1)
+        self.assertEqual(first, second)
+
+    def test_changed_file(self):
+        """Test replacing the file causes it to be parsed again"""
+        first = _read_data_file(self.d)
+        self.d.data.save('table.csv', open(SAMPLE_2D, 'r'))
+        second = _read_data_file(self.d)
+        self.assertEqual(table_cache().stats()['misses'], 2)
+        self.assertNotEqual(first['table_data'], second['table_data'])
+
+    def test_model_overrides(self):
+        """Test the Data description and source aren't cached"""
+        self.assertNotEqual(_read_data_file(self.d)['description'], 'New')
+        self.d.description = 'New'
+        self.d.data_source = 'Source'
+        table = _read_data_file(self.d)
+        self.assertEqual(table['description'], 'New')
+        self.assertEqual(table['source'], 'Source')
+        self.assertEqual(table_cache().stats()['hits'], 1)
+
+    def test_show_y_values(self):
+        """Test show_y_values produces a separate cache entry"""
+        first = _read_data_file(self.d)
+        self.d.show_y_values = True
+        second = _read_data_file(self.d)
+        self.assertEqual(len(second['table_data'][0]), len(first['table_data'][0]) + 1)
+
+
+class TestTableFragmentCache(TestCase):
+    """Test the rendered HTML table is cached"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01')
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'), False)
+        table_cache().clear()
+
+    def test_cache_hit(self):
+        """Test the second render of a table uses the cache"""
+        first = _render_table(self.d, _read_data_file(self.d))
+        self.assertTrue(first.startswith('<table'))
+        self.assertEqual(table_cache().stats()['misses'], 2)
+        second = _render_table(self.d, _read_data_file(self.d))
+        self.assertEqual(table_cache().stats()['hits'], 2)
+        self.assertEqual(first, second)
+
+    def test_changed_file(self):
+        """Test replacing the file causes the table to be rendered again"""
+        first = _render_table(self.d, _read_data_file(self.d))
+        self.d.data.save('table.csv', open(SAMPLE_2D, 'r'))
+        second = _render_table(self.d, _read_data_file(self.d))
+        self.assertNotEqual(first, second)
+
+    def test_show_y_values(self):
+        """Test show_y_values renders a separate table"""
+        first = _render_table(self.d, _read_data_file(self.d))
+        self.d.show_y_values = True
+        second = _render_table(self.d, _read_data_file(self.d))
+        self.assertTrue(second.count('<td>') > first.count('<td>'))
@@ -0,0 +1,150 @@
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from pdbook.models import Machine, Beam, Data, DataTable
+from pdbook.views import _format_table, _parse_csv_file, _read_data_file
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
+class TestDataTable(TestCase):
+    """Test the parsed tables stored for the Data"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01')
+
+    def test_no_file(self):
+        """Test saving without a data file doesn't store a table"""
+        self.d.save()
+        self.assertFalse(DataTable.objects.filter(data=self.d).exists())
+
+    def test_table_stored_on_save(self):
+        """Test saving the Data stores the parsed CSV file"""
+        self.d.data.save('table.csv', open(SAMPLE_2D, 'r'), False)
+        self.assertFalse(DataTable.objects.filter(data=self.d).exists())
+        self.d.save()
+
+        table_obj = DataTable.objects.get(data=self.d)
+        self.assertEqual((table_obj.n_rows, table_obj.n_cols), (53, 22))
+        parsed = table_obj.get_parsed()
+        csv_parsed = _parse_csv_file(self.d.data.path)
+        self.assertTrue((parsed.pop('XY_VALUES') == csv_parsed.pop('XY_VALUES')).all())
+        self.assertEqual(parsed, csv_parsed)
+
+    def test_table_1d(self):
+        """Test the stored table gives the same table as the CSV file"""
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+
+        csv_table = _format_table(_parse_csv_file(self.d.data.path))
+        table = dict(_read_data_file(Data.objects.get(pk=self.d.pk)))
+        self.assertTrue((table.pop('xy_array') == csv_table.pop('xy_array')).all())
+        self.assertEqual(table, csv_table)
+
+    def test_table_verbatim(self):
+        """Test storing a VERBATIM table"""
+        self.d.data.save('table.csv', SimpleUploadedFile('table.csv',
+            b'X_HEADERS=A,B\nY_HEADERS=\nXY_TYPE=VERBATIM\na,b^,c\nd,e\n'))
+        parsed = DataTable.objects.get(data=self.d).get_parsed()
+        self.assertEqual(parsed['XY_VALUES'], [['a', 'b,c'], ['d', 'e']])
+
+    def test_no_file_io(self):
+        """Test reading the table doesn't use the data file"""
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        os.remove(self.d.data.path)
+        d = Data.objects.select_related('table').get(pk=self.d.pk)
+        self.assertEqual(len(_read_data_file(d)['table_data']), 15)
+
+    def test_changed_file(self):
+        """Test saving a new file replaces the stored table"""
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        sha256 = DataTable.objects.get(data=self.d).sha256
+        self.d.data.save('table.csv', open(SAMPLE_2D, 'r'))
+        table_obj = DataTable.objects.get(data=self.d)
+        self.assertNotEqual(table_obj.sha256, sha256)
+        self.assertEqual(table_obj.n_rows, 53)
+
+    def test_invalid_file(self):
+        """Test an invalid file removes the stored table"""
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        self.d.data.save('table.csv', SimpleUploadedFile('table.csv', b'1,2,3\n'))
+        self.assertFalse(DataTable.objects.filter(data=self.d).exists())
+        self.assertTrue(isinstance(_read_data_file(self.d), str))
+
+    def test_stored_when_missing(self):
+        """Test a table is stored when reading Data without one"""
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'), False)
+        self.assertEqual(len(_read_data_file(self.d)['table_data']), 15)
+        self.assertTrue(DataTable.objects.filter(data=self.d).exists())
+
+    def test_table_deleted(self):
+        """Test deleting the Data removes the table"""
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        self.d.delete()
+        self.assertFalse(DataTable.objects.exists())
+
+
+class TestDataClean(TestCase):
+    """Test validating the data file when uploading"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+
+    def _data(self, content, interpolation_type='NA'):
+        d = Data(beam=self.b, name='Data Name 01', visible_name='Data 01',
+                 interpolation_type=interpolation_type)
+        d.data = SimpleUploadedFile('table.csv', content)
+        return d
+
+    def _sample(self, path, interpolation_type='NA'):
+        with open(path, 'rb') as f:
+            return self._data(f.read(), interpolation_type)
+
+    def test_valid(self):
+        """Test valid files pass validation"""
+        self._sample(SAMPLE_1D, '1D').full_clean(exclude=['slug'])
+        self._sample(SAMPLE_2D, '2D').full_clean(exclude=['slug'])
+        self._sample(SAMPLE_2D, 'NA').full_clean(exclude=['slug'])
+
+    def test_malformed(self):
+        """Test malformed files are rejected"""
+        for content in [b'1,2,3\n',
+                        b'X_HEADERS=A,B\nY_HEADERS=\nY_VALUES=1,2\n',
+                        b'Z_VALUES=1,2\n',
+                        b'X_HEADERS=A,B\nY_HEADERS=\n1,abc\n',
+                        b'\xff\xfe\x00']:
+            with self.assertRaises(ValidationError) as cm:
+                self._data(content).full_clean(exclude=['slug'])
+            self.assertTrue('data' in cm.exception.message_dict)
+
+    def test_interpolation(self):
+        """Test files that can't be interpolated are rejected"""
+        header = b'X_HEADERS=Y,A,B\nY_HEADERS=\nX_VALUES=1,2\n'
+        for content, interpolation_type in [
+                (header + b'Y_VALUES=1,2\n1,2,3\n4,5,6\n', '2D'),
+                (header + b'Y_VALUES=2,1\n1,2\n3,4\n', '1D'),
+                (header + b'Y_VALUES=1,1\n1,2\n3,4\n', '1D'),
+                (header + b'Y_VALUES=1,2,3\n1,2\n3,4\n', '1D'),
+                (header.replace(b'1,2\n', b'2,1\n') + b'Y_VALUES=1,2\n1,2\n3,4\n', '2D'),
+                (header + b'Y_VALUES=1,2\n1,2\n3\n', '1D'),
+                (header + b'Y_VALUES=1,2\nXY_TYPE=VERBATIM\n1,2\n3,4\n', '1D')]:
+            # Valid if not interpolated
+            self._data(content).full_clean(exclude=['slug'])
+            with self.assertRaises(ValidationError):
+                self._data(content, interpolation_type).full_clean(exclude=['slug'])
+
+        self._data(header + b'Y_VALUES=1,2\n1,2\n3,4\n', '2D').full_clean(exclude=['slug'])
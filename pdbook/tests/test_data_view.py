@@ -1,9 +1,13 @@
 import json
 import os
 
+from django.core.files.base import ContentFile
 from django.core.urlresolvers import reverse
 from django.test import TestCase, Client
 
+import numpy
+from scipy.interpolate import PchipInterpolator
+
 from pdbook.models import Machine, Beam, Data
 
 
@@ -73,6 +77,28 @@ class TestDataView(TestCase):
         self.assertFalse(b"No data has been added" in rsp.content)
         self.assertFalse('error_message' in rsp.context)
 
+    def test_query_budget(self):
+        """Test the data view uses one query once the navigation is cached"""
+        Data.objects.create(beam=self.m1_b1,
+                            name='Data Name M01B01D02',
+                            visible_name='Data M01B01D02')
+        d = Data.objects.get(id=1)
+        d.data.save(os.path.basename(SAMPLE_2D), open(SAMPLE_2D, 'r'))
+
+        c = Client()
+        c.get(reverse('index'))
+        with self.assertNumQueries(1):
+            rsp = c.get(reverse('data', args=[self.m1.slug, self.m1_b1.slug, self.m1_b1_d1.slug]))
+        self.assertEqual(rsp.status_code, 200)
+
+    def test_wrong_beam(self):
+        """Test the data must belong to the beam and machine in the URL"""
+        c = Client()
+        rsp = c.get(reverse('data', args=[self.m1.slug, self.m1_b2.slug, self.m1_b1_d1.slug]))
+        self.assertEqual(rsp.status_code, 404)
+        rsp = c.get(reverse('data', args=[self.m2.slug, self.m1_b1.slug, self.m1_b1_d1.slug]))
+        self.assertEqual(rsp.status_code, 404)
+
 
 class Test1DInterpolation(TestCase):
     """Test 1D interpolation works correctly"""
@@ -121,6 +147,19 @@ class Test1DInterpolation(TestCase):
         self.assertEqual(out['y_values'], ["2.0", "2.5", "3.0"])
         self.assertEqual(out['table_data'], ["0.653", "0.670", "0.688"])
 
+    def test_query_budget(self):
+        """Test the interpolate view uses a single query"""
+        self.d.interpolation_type = '1D'
+        self.d.save()
+
+        c = Client()
+        data = {'y_value' : '2.5', 'interp_type' : '1D'}
+        with self.assertNumQueries(1):
+            rsp = c.post(reverse('interpolate',
+                                 args=[self.m.slug, self.b.slug, self.d.slug]),
+                         data)
+        self.assertEqual(rsp.status_code, 200)
+
 
 class Test2DInterpolation(TestCase):
     """Test 2D interpolation works correctly"""
@@ -171,3 +210,289 @@ class Test2DInterpolation(TestCase):
         self.assertEqual(out['table_data'], [["98.6", "98.4", "98.4"],
                                              ["98.0", "98.0", "98.0"],
                                              ["97.5", "97.5", "97.5"]])
+
+
+class TestInterpolationPayload(TestCase):
+    """Test the table embedded in the data page for client side interpolation"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d1 = Data.objects.create(beam=self.b,
+                                      name='Data Name 01',
+                                      visible_name='Data 01',
+                                      interpolation_type='1D')
+        self.d1.data.save(os.path.basename(SAMPLE_1D), open(SAMPLE_1D, 'r'))
+        self.d2 = Data.objects.create(beam=self.b,
+                                      name='Data Name 02',
+                                      visible_name='Data 02',
+                                      interpolation_type='2D')
+        self.d2.data.save(os.path.basename(SAMPLE_2D), open(SAMPLE_2D, 'r'))
+
+    def _payload(self, data_obj):
+        c = Client()
+        rsp = c.get(reverse('data', args=[self.m.slug, self.b.slug, data_obj.slug]))
+        self.assertEqual(rsp.status_code, 200)
+        payload = rsp.context['interpolation_payload']
+        if payload is not None:
+            self.assertTrue(b'<script type="application/json" id="interpolation-payload">'
+                            in rsp.content)
+            payload = json.loads(payload)
+
+        return payload
+
+    def test_1d(self):
+        """Test the 1D payload"""
+        payload = self._payload(self.d1)
+        self.assertEqual(payload['table_type'], '1D')
+        self.assertEqual(payload['method'], 'LINEAR')
+        self.assertEqual(payload['y'][:3], [2.0, 3.0, 4.0])
+        self.assertEqual(payload['values'][:3], [0.653, 0.688, 0.716])
+        self.assertEqual(payload['y_format'], '{:.1f}')
+        self.assertEqual(payload['xy_format'], '{:.3f}')
+        self.assertFalse('x' in payload)
+        self.assertFalse('slopes' in payload)
+
+    def test_2d(self):
+        """Test the 2D payload"""
+        payload = self._payload(self.d2)
+        self.assertEqual(payload['table_type'], '2D')
+        self.assertEqual(len(payload['values']), len(payload['y']))
+        self.assertEqual(len(payload['values'][0]), len(payload['x']))
+        self.assertEqual(payload['x_format'], '{:.1f}')
+
+    def test_cubic(self):
+        """Test the derivatives are included for the cubic methods"""
+        self.d1.interpolation_method = 'PCHIP'
+        self.d1.save()
+        payload = self._payload(self.d1)
+        self.assertEqual(len(payload['slopes']), len(payload['y']))
+
+        # The values and derivatives are enough to reproduce the interpolant
+        y = numpy.array(payload['y'])
+        f = numpy.array(payload['values'])
+        d = numpy.array(payload['slopes'])
+        h = y[3] - y[2]
+        t = 0.3
+        expected = PchipInterpolator(y, f)(y[2] + t * h)
+        value = ((1 - 3 * t**2 + 2 * t**3) * f[2] + (3 * t**2 - 2 * t**3) * f[3]
+                 + (t - 2 * t**2 + t**3) * h * d[2] + (t**3 - t**2) * h * d[3])
+        self.assertAlmostEqual(value, expected, places=12)
+
+        self.d2.interpolation_method = 'CUBIC'
+        self.d2.save()
+        payload = self._payload(self.d2)
+        self.assertEqual(len(payload['slopes']), 3)
+        self.assertEqual(numpy.shape(payload['slopes'][2]),
+                         numpy.shape(payload['values']))
+
+    def test_no_interpolation(self):
+        """Test there's no payload if the Data isn't interpolated"""
+        self.d1.interpolation_type = 'NA'
+        self.d1.save()
+        self.assertEqual(self._payload(self.d1), None)
+
+    def test_query_budget(self):
+        """Test the payload doesn't add any queries"""
+        c = Client()
+        c.get(reverse('index'))
+        c.get(reverse('data', args=[self.m.slug, self.b.slug, self.d2.slug]))
+        with self.assertNumQueries(1):
+            c.get(reverse('data', args=[self.m.slug, self.b.slug, self.d2.slug]))
+
+
+class TestBatchInterpolation(TestCase):
+    """Test interpolating many points in one request"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d1 = Data.objects.create(beam=self.b,
+                                      name='Data Name 01',
+                                      visible_name='Data 01',
+                                      interpolation_type='1D')
+        self.d1.data.save(os.path.basename(SAMPLE_1D), open(SAMPLE_1D, 'r'))
+        self.d2 = Data.objects.create(beam=self.b,
+                                      name='Data Name 02',
+                                      visible_name='Data 02',
+                                      interpolation_type='2D')
+        self.d2.data.save(os.path.basename(SAMPLE_2D), open(SAMPLE_2D, 'r'))
+
+    def _post(self, data_obj, body):
+        c = Client()
+        return c.post(reverse('interpolate_batch',
+                              args=[self.m.slug, self.b.slug, data_obj.slug]),
+                      json.dumps(body),
+                      content_type='application/json')
+
+    def test_1d(self):
+        """Test batch 1D interpolation"""
+        rsp = self._post(self.d1, {'y_values' : [2, 2.5, 40, 41]})
+        self.assertEqual(rsp.status_code, 200)
+        out = json.loads(rsp.content.decode('utf-8'))
+        self.assertEqual(out['table_type'], '1D')
+        self.assertEqual(out['table_data'], ["0.653", "0.670", "0.936", None])
+        self.assertEqual(out['values'][3], None)
+
+    def test_2d(self):
+        """Test batch 2D interpolation matches the single point results"""
+        rsp = self._post(self.d2, {'x_values' : [5.0, 5.8, 6.0, 2.0],
+                                   'y_values' : [2.2, 2.2, 2.4, 2.2]})
+        self.assertEqual(rsp.status_code, 200)
+        out = json.loads(rsp.content.decode('utf-8'))
+        self.assertEqual(out['table_type'], '2D')
+        self.assertEqual(out['table_data'], ["98.6", "98.4", "97.5", None])
+
+    def test_bad_requests(self):
+        """Test invalid requests are rejected"""
+        rsp = self._post(self.d2, {'y_values' : [2.2]})
+        self.assertEqual(rsp.status_code, 400)
+        rsp = self._post(self.d2, {'x_values' : [1, 2], 'y_values' : [2.2]})
+        self.assertEqual(rsp.status_code, 400)
+        rsp = self._post(self.d2, {'interp_type' : '3D', 'y_values' : [2.2]})
+        self.assertEqual(rsp.status_code, 400)
+        rsp = self._post(self.d1, {'y_values' : ['a']})
+        self.assertEqual(rsp.status_code, 400)
+
+    def test_limit(self):
+        """Test the number of points is limited"""
+        with self.settings(PDBOOK_BATCH_INTERPOLATION_LIMIT=2):
+            rsp = self._post(self.d1, {'y_values' : [2, 3, 4]})
+        self.assertEqual(rsp.status_code, 400)
+
+    def test_not_interpolable(self):
+        """Test tables that can't be interpolated with the type are rejected"""
+        d3 = Data.objects.create(beam=self.b,
+                                 name='Data Name 03',
+                                 visible_name='Data 03',
+                                 interpolation_type='NA')
+        d3.data.save('ragged.csv', ContentFile(b'X_HEADERS=Y,A,B\nY_HEADERS=\n'
+                                               b'X_VALUES=1,2\nY_VALUES=1,2\n'
+                                               b'1,2\n3\n'))
+        rsp = self._post(d3, {'interp_type' : '1D', 'y_values' : [1.5]})
+        self.assertEqual(rsp.status_code, 400)
+        out = json.loads(rsp.content.decode('utf-8'))
+        self.assertEqual(out['error'], "The table can't be interpolated with 1D interpolation")
+
+        rsp = self._post(self.d1, {'interp_type' : '2D', 'x_values' : [1],
+                                   'y_values' : [2]})
+        self.assertEqual(rsp.status_code, 400)
+
+        # The single point view is also rejected rather than failing
+        rsp = Client().post(reverse('interpolate',
+                                    args=[self.m.slug, self.b.slug, d3.slug]),
+                            {'interp_type' : '1D', 'y_value' : '1.5'})
+        self.assertEqual(rsp.status_code, 400)
+        out = json.loads(rsp.content.decode('utf-8'))
+        self.assertEqual(out['error'], "The table can't be interpolated with 1D interpolation")
+
+        self.d2.interpolation_type = 'NA'
+        self.d2.save()
+        rsp = Client().post(reverse('interpolate',
+                                    args=[self.m.slug, self.b.slug, self.d2.slug]),
+                            {'interp_type' : '2D', 'x_value' : '5', 'y_value' : '2'})
+        self.assertEqual(rsp.status_code, 400)
+
+    def test_get_not_allowed(self):
+        """Test only POST is allowed"""
+        c = Client()
+        rsp = c.get(reverse('interpolate_batch',
+                            args=[self.m.slug, self.b.slug, self.d1.slug]))
+        self.assertEqual(rsp.status_code, 405)
+
+
+class TestTableRows(TestCase):
+    """Test fetching a window of the table rows"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01',
+                                     interpolation_type='2D')
+        self.d.data.save(os.path.basename(SAMPLE_2D), open(SAMPLE_2D, 'r'))
+        self.url = reverse('data_rows', args=[self.m.slug, self.b.slug, self.d.slug])
+
+    def _get(self, **params):
+        rsp = Client().get(self.url, params)
+        self.assertEqual(rsp.status_code, 200)
+        return json.loads(rsp.content.decode('utf-8'))
+
+    def test_window(self):
+        """Test fetching a range of rows and columns"""
+        rsp = Client().get(reverse('data', args=[self.m.slug, self.b.slug, self.d.slug]))
+        table_data = rsp.context['table_data']
+
+        out = self._get(start=10, stop=15)
+        self.assertEqual((out['start'], out['stop'], out['n_rows']), (10, 15, 53))
+        self.assertEqual(out['n_columns'], 23)
+        self.assertEqual(out['columns'], list(range(23)))
+        self.assertEqual(out['rows'], table_data[10:15])
+
+        out = self._get(start=50, stop=60, columns='3,0,1')
+        self.assertEqual((out['start'], out['stop']), (50, 53))
+        self.assertEqual(out['columns'], [0, 1, 3])
+        self.assertEqual(out['column_labels'][0], rsp.context['column_labels'][0])
+        self.assertEqual(out['rows'], [[row[0], row[1], row[3]] for row in table_data[50:53]])
+
+        out = self._get()
+        self.assertEqual((out['start'], out['stop']), (0, 53))
+        self.assertEqual(self._get(start=60)['rows'], [])
+
+    def test_bad_requests(self):
+        """Test invalid requests are rejected"""
+        for params in ({'start' : 'a'}, {'start' : -1}, {'start' : 5, 'stop' : 4},
+                       {'columns' : '1,x'}, {'columns' : '23'}, {'columns' : '-1'}):
+            rsp = Client().get(self.url, params)
+            self.assertEqual(rsp.status_code, 400)
+
+        with self.settings(PDBOOK_TABLE_WINDOW_LIMIT=10):
+            rsp = Client().get(self.url, {'start' : 0, 'stop' : 11})
+            self.assertEqual(rsp.status_code, 400)
+
+        rsp = Client().post(self.url)
+        self.assertEqual(rsp.status_code, 405)
+
+    def test_query_budget(self):
+        """Test fetching rows uses a single query"""
+        with self.assertNumQueries(1):
+            Client().get(self.url, {'start' : 20})
+
+    def test_virtual_table(self):
+        """Test only the first rows of large tables are in the data page"""
+        url = reverse('data', args=[self.m.slug, self.b.slug, self.d.slug])
+        with self.settings(PDBOOK_TABLE_WINDOW_ROWS=10):
+            rsp = Client().get(url)
+        content = rsp.content.decode('utf-8')
+        # The header row and the first 10 rows
+        self.assertEqual(rsp.context['table_html'].count('<tr>'), 10 + 1)
+        self.assertTrue('class="tablesaw-wrapper virtual-table" data-rows-url="{}" '
+                        'data-n-rows="53" data-window-rows="10"'.format(self.url) in content)
+        self.assertFalse('id="interpolation-payload"' in content)
+
+        rsp = Client().get(url)
+        content = rsp.content.decode('utf-8')
+        self.assertEqual(rsp.context['table_html'].count('<tr>'), 53 + 1)
+        self.assertFalse('virtual-table' in content)
+        self.assertTrue('id="interpolation-payload"' in content)
+
+    def test_window_limit(self):
+        """Test the window is clamped to the most rows that may be requested"""
+        url = reverse('data', args=[self.m.slug, self.b.slug, self.d.slug])
+        with self.settings(PDBOOK_TABLE_WINDOW_ROWS=50, PDBOOK_TABLE_WINDOW_LIMIT=20):
+            rsp = Client().get(url)
+            self.assertEqual(rsp.context['window_rows'], 20)
+            self.assertEqual(rsp.context['table_html'].count('<tr>'), 20 + 1)
+
+            # The blocks fetched as the table is scrolled
+            out = self._get(start=20, stop=40)
+            self.assertEqual((out['start'], out['stop']), (20, 40))
+            out = self._get(start=40)
+            self.assertEqual((out['start'], out['stop']), (40, 53))
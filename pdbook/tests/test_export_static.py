@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from pdbook.models import Machine, Beam, Data
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
+class TestExportStatic(TestCase):
+    """Test the export_static management command"""
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d1 = Data.objects.create(beam=self.b,
+                                      name='Data Name 01',
+                                      visible_name='Data 01',
+                                      interpolation_type='1D')
+        self.d1.data.save(os.path.basename(SAMPLE_1D), open(SAMPLE_1D, 'r'))
+        self.d2 = Data.objects.create(beam=self.b,
+                                      name='Data Name 02',
+                                      visible_name='Data 02',
+                                      interpolation_type='2D')
+        self.d2.data.save(os.path.basename(SAMPLE_2D), open(SAMPLE_2D, 'r'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _export(self, *args):
+        out = StringIO()
+        call_command('export_static', self.root, '--workers', '1', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def _file(self, path, *fname):
+        return os.path.join(self.root, path.strip('/'), *fname)
+
+    def test_export(self):
+        """Test the pages are exported with the same URL layout"""
+        with self.settings(PDBOOK_TABLE_WINDOW_ROWS=10):
+            out = self._export()
+        # index, 1 machine, 1 beam, 2 data, the beam ZIP and 5 API pages
+        self.assertIn('Exported 11 pages, 0 unchanged', out)
+
+        url = reverse('data', args=[self.m.slug, self.b.slug, self.d2.slug])
+        with open(self._file(url, 'index.html'), 'rb') as f:
+            content = f.read()
+        self.assertTrue(b'id="interpolation-payload"' in content)
+        self.assertTrue(b'Data 01' in content)
+
+        self.assertTrue(os.path.exists(self._file(reverse('index'), 'index.html')))
+        self.assertTrue(os.path.exists(
+            self._file(reverse('beam', args=[self.m.slug, self.b.slug]), 'index.html')
+        ))
+
+        # Large tables are exported whole as the rows URL isn't exported
+        self.assertFalse(b'virtual-table' in content)
+
+        url = reverse('api_data', args=[self.m.slug, self.b.slug, self.d1.slug])
+        with open(self._file(url, 'index.json'), 'r') as f:
+            self.assertEqual(json.load(f)['slug'], self.d1.slug)
+
+        url = reverse('download_beam', args=[self.m.slug, self.b.slug])
+        with zipfile.ZipFile(self._file(url)) as zf:
+            self.assertEqual(len(zf.namelist()), 3)
+
+    def test_incremental(self):
+        """Test only the pages whose inputs have changed are exported again"""
+        self._export()
+        self.assertIn('Exported 0 pages, 11 unchanged', self._export())
+
+        # A new table only changes its data pages, the beam ZIP and API
+        self.d1.data.save(os.path.basename(SAMPLE_2D), open(SAMPLE_2D, 'r'))
+        self.d1.save()
+        self.assertIn('Exported 4 pages, 7 unchanged', self._export())
+
+        # Renaming a data changes the pages for its beam
+        self.d1.visible_name = 'Data 03'
+        self.d1.save()
+        self.assertIn('Exported 6 pages, 5 unchanged', self._export())
+
+        # Missing files are exported again
+        os.remove(self._file(reverse('index'), 'index.html'))
+        self.assertIn('Exported 1 pages, 10 unchanged', self._export())
+
+        self.assertIn('Exported 11 pages, 0 unchanged', self._export('--force'))
+
+    def test_removed(self):
+        """Test the pages of deleted data are removed"""
+        self._export()
+        url = reverse('data', args=[self.m.slug, self.b.slug, self.d1.slug])
+        self.assertTrue(os.path.exists(self._file(url, 'index.html')))
+
+        self.d1.delete()
+        out = self._export()
+        self.assertIn('2 removed', out)
+        self.assertFalse(os.path.exists(self._file(url)))
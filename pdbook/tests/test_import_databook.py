@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from pdbook.models import Machine, Beam, Data
+from pdbook.search import search
+from pdbook.storage import content_name
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
+class TestImportDataBook(TestCase):
+    """Test the import_databook management command"""
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.beam_dir = os.path.join(self.root, 'Linac 01', '06 MV Photons')
+        os.makedirs(self.beam_dir)
+        shutil.copy(SAMPLE_1D, self.beam_dir)
+        shutil.copy(SAMPLE_2D, self.beam_dir)
+
+        other_dir = os.path.join(self.root, 'Linac 02', '10 MV Photons')
+        os.makedirs(other_dir)
+        shutil.copy(SAMPLE_2D, other_dir)
+        # Not a CSV file or not in a beam directory
+        open(os.path.join(other_dir, 'notes.txt'), 'w').close()
+        shutil.copy(SAMPLE_1D, os.path.join(self.root, 'Linac 01'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _import(self, *args):
+        out = StringIO()
+        call_command('import_databook', self.root, '--workers', '1', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_import(self):
+        """Test importing creates the Machines, Beams and Data"""
+        out = self._import()
+        self.assertIn('Added 2 machines, 2 beams and 3 data', out)
+
+        m = Machine.objects.get(name='Linac 01')
+        self.assertEqual(m.slug, 'linac-01')
+        b = Beam.objects.get(machine=m)
+        self.assertEqual(b.slug, '06-mv-photons')
+
+        d = Data.objects.get(beam=b, name='ssd_pdd')
+        self.assertEqual(d.slug, 'ssd_pdd')
+        self.assertEqual(d.interpolation_type, '2D')
+        self.assertEqual(d.data.name, content_name(d.table.sha256, '.csv'))
+        self.assertEqual(d.table.n_rows, 53)
+        self.assertEqual(Data.objects.get(beam=b, name='iso_ci').interpolation_type, '1D')
+
+        response = self.client.get(d.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['table_data']), 53)
+
+    def test_import_again(self):
+        """Test importing the same directory twice changes nothing"""
+        self._import()
+        d = Data.objects.get(name='iso_ci')
+        d.visible_name = 'Edited'
+        d.save()
+
+        out = self._import()
+        self.assertIn('Added 0 machines, 0 beams and 0 data, updated 0 data, '
+                      '3 data unchanged', out)
+        self.assertEqual(Machine.objects.count(), 2)
+        self.assertEqual(Beam.objects.count(), 2)
+        self.assertEqual(Data.objects.count(), 3)
+        self.assertEqual(Data.objects.get(name='iso_ci').visible_name, 'Edited')
+
+    def test_import_changed_file(self):
+        """Test a changed data file replaces the existing file"""
+        self._import()
+        shutil.copy(SAMPLE_2D, os.path.join(self.beam_dir, 'iso_ci.csv'))
+
+        out = self._import()
+        self.assertIn('updated 1 data, 2 data unchanged', out)
+        d = Data.objects.get(beam__machine__name='Linac 01', name='iso_ci')
+        with open(d.data.path) as f, open(SAMPLE_2D) as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_interpolation_type(self):
+        """Test tables with non-monotonic axes aren't imported as interpolated"""
+        header = 'X_HEADERS=Y,A,B\nY_HEADERS=\nX_VALUES=2,1\n'
+        with open(os.path.join(self.beam_dir, 'x_decreasing.csv'), 'w') as f:
+            f.write(header + 'Y_VALUES=1,2\n1,2\n3,4\n')
+        with open(os.path.join(self.beam_dir, 'y_decreasing.csv'), 'w') as f:
+            f.write(header + 'Y_VALUES=2,1\n1,2\n3,4\n')
+
+        self._import()
+        self.assertEqual(Data.objects.get(name='x_decreasing').interpolation_type, '1D')
+        d = Data.objects.get(name='y_decreasing')
+        self.assertEqual(d.interpolation_type, 'NA')
+        d.full_clean()
+
+    def test_existing_interpolation_type(self):
+        """Test changed files must suit the existing Data's interpolation type"""
+        self._import()
+        path = os.path.join(self.beam_dir, 'ssd_pdd.csv')
+        with open(path, 'w') as f:
+            f.write('X_HEADERS=Y,A,B\nY_HEADERS=\nX_VALUES=2,1\n'
+                    'Y_VALUES=1,2\n1,2\n3,4\n')
+
+        with self.assertRaises(CommandError) as cm:
+            self._import()
+
+        self.assertIn('ssd_pdd.csv: X_VALUES must be increasing', str(cm.exception))
+        d = Data.objects.get(beam__machine__name='Linac 01', name='ssd_pdd')
+        self.assertEqual(d.table.n_rows, 53)
+
+    def test_invalid_file(self):
+        """Test nothing is imported if any file is invalid"""
+        with open(os.path.join(self.beam_dir, 'bad.csv'), 'w') as f:
+            f.write('X_HEADERS=A,B\nY_HEADERS=\n1,abc\n')
+
+        with self.assertRaises(CommandError) as cm:
+            self._import()
+
+        self.assertIn('bad.csv', str(cm.exception))
+        self.assertEqual(Machine.objects.count(), 0)
+        self.assertEqual(Data.objects.count(), 0)
+
+    def test_search_index(self):
+        """Test the imported Data are added to the search index"""
+        self._import()
+        results = search('isocentric 06 mv')
+        self.assertEqual([d.name for d, score in results], ['iso_ci'])
+
+    def test_dry_run(self):
+        """Test a dry run doesn't import anything"""
+        out = self._import('--dry-run')
+        self.assertIn('3 data files checked', out)
+        self.assertEqual(Machine.objects.count(), 0)
+
+    def test_workers(self):
+        """Test checking the files in worker processes"""
+        out = StringIO()
+        call_command('import_databook', self.root, '--workers', '2', stdout=out)
+        self.assertEqual(Data.objects.count(), 3)
+
+    def test_reserved_name(self):
+        """Test machine directories with a reserved name are rejected"""
+        os.rename(os.path.join(self.root, 'Linac 02'), os.path.join(self.root, 'Metrics'))
+        with self.assertRaises(CommandError) as cm:
+            self._import()
+
+        self.assertIn('Metrics', str(cm.exception))
+        self.assertEqual(Machine.objects.count(), 0)
+
+    def test_no_directory(self):
+        """Test importing a missing directory"""
+        with self.assertRaises(CommandError):
+            call_command('import_databook', os.path.join(self.root, 'missing'))
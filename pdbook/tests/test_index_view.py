@@ -2,10 +2,14 @@ from django.core.urlresolvers import reverse
 from django.test import TestCase, Client
 
 from pdbook.models import Machine
+from pdbook.navigation import invalidate_navigation
 
 
 class TestIndexView(TestCase):
     """Test the index view"""
+    def setUp(self):
+        invalidate_navigation()
+
     def test_machine_selector_none(self):
         """Test the machine selector shows no machine message if none"""
         c = Client()
@@ -44,3 +48,17 @@ class TestIndexView(TestCase):
         self.assertEqual(rsp.status_code, 200)
         self.assertEqual(len(rsp.context['machine_list']), 2)
 
+
+    def test_query_budget(self):
+        """Test the index view uses no queries once the navigation is cached"""
+        Machine.objects.create(name="Linac Name 03",
+                               visible_name="Linac 03")
+        Machine.objects.create(name="Linac Name 04",
+                               visible_name="Linac 04")
+
+        c = Client()
+        with self.assertNumQueries(3):
+            rsp = c.get(reverse('index'))
+        with self.assertNumQueries(0):
+            rsp = c.get(reverse('index'))
+        self.assertEqual(rsp.status_code, 200)
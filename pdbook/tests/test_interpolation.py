@@ -0,0 +1,564 @@
+from heapq import nsmallest
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.test import TestCase, Client
+
+import numpy
+from scipy.interpolate import (
+    CubicSpline, PchipInterpolator, RectBivariateSpline, RegularGridInterpolator
+)
+
+from pdbook.interpolation import (
+    BoundedExecutor, CubicInterpolator1D, CubicInterpolator2D,
+    InterpolationBusy, Interpolator1D, Interpolator2D, InterpolatorRegistry,
+    MonotoneSegments, bracket, interpolator_registry, neighbours
+)
+from pdbook import views
+from pdbook.metrics import metrics_registry
+from pdbook.models import Machine, Beam, Data
+from pdbook.views import _data_file_key, _quantize, _read_data_file
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
+class TestInterpolators(TestCase):
+    """Test the interpolator classes"""
+    def test_1d(self):
+        """Test 1D linear interpolation"""
+        interp = Interpolator1D([1, 2, 4], [10, 20, 30])
+        self.assertAlmostEqual(float(interp(1.5)), 15)
+        self.assertAlmostEqual(float(interp(3)), 25)
+
+    def test_1d_points(self):
+        """Test 1D interpolation of many points"""
+        interp = Interpolator1D([1, 2, 4], [10, 20, 30])
+        out = interp.points([0, 1, 3, 4, 5])
+        self.assertTrue(numpy.isnan(out[[0, 4]]).all())
+        self.assertEqual(out[1:4].tolist(), [10, 25, 30])
+
+    def test_2d(self):
+        """Test 2D linear interpolation"""
+        interp = Interpolator2D([1, 2], [10, 20], [[1, 2], [3, 4]])
+        self.assertAlmostEqual(float(interp(1.5, 10)), 1.5)
+        self.assertAlmostEqual(float(interp(1.5, 15)), 2.5)
+        self.assertEqual(interp.grid([1, 1.5, 2], [10, 20]).tolist(),
+                         [[1, 1.5, 2], [3, 3.5, 4]])
+
+    def test_2d_matches_scipy(self):
+        """Test 2D interpolation of a large table matches scipy"""
+        rng = numpy.random.RandomState(0)
+        x = numpy.cumsum(rng.uniform(0.1, 1, 500))
+        y = numpy.cumsum(rng.uniform(0.1, 1, 500))
+        values = rng.uniform(0, 100, (500, 500))
+        interp = Interpolator2D(x, y, values)
+        reference = RegularGridInterpolator((y, x), values)
+
+        xi = rng.uniform(x[0], x[-1], 1000)
+        yi = rng.uniform(y[0], y[-1], 1000)
+        expected = reference(numpy.column_stack((yi, xi)))
+        self.assertTrue(numpy.allclose(interp.points(xi, yi), expected))
+
+    def test_bracket(self):
+        """Test finding the interval containing a value"""
+        axis = numpy.asarray([1., 2., 4., 8.])
+        self.assertEqual(bracket(axis, [0, 1, 1.5, 2, 7, 8, 9]).tolist(),
+                         [0, 0, 0, 1, 2, 2, 2])
+
+    def test_neighbours(self):
+        """Test the neighbours are the same as using heapq.nsmallest"""
+        axis = numpy.asarray([1., 2., 2.2, 2.4, 3., 10., 11.])
+        for value in [0, 1, 1.1, 2.1, 2.2, 2.3, 2.6, 2.7, 5, 10.5, 11, 12]:
+            expected = sorted(nsmallest(2, axis, key=lambda k: abs(k - value)))
+            self.assertEqual(neighbours(axis, value), expected)
+
+
+class TestCubicInterpolators(TestCase):
+    """Test the cubic interpolator classes"""
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.x = numpy.cumsum(rng.uniform(0.1, 1, 20))
+        self.y = numpy.cumsum(rng.uniform(0.1, 1, 30))
+        self.values = rng.uniform(0, 100, (30, 20))
+        self.xi = rng.uniform(self.x[0], self.x[-1], 200)
+        self.yi = rng.uniform(self.y[0], self.y[-1], 200)
+
+    def test_1d_matches_scipy(self):
+        """Test 1D PCHIP and cubic spline interpolation match scipy"""
+        values = self.values[:, 0]
+        interp = CubicInterpolator1D(self.y, values, 'PCHIP')
+        expected = PchipInterpolator(self.y, values)(self.yi)
+        self.assertTrue(numpy.allclose(interp.points(self.yi), expected))
+
+        interp = CubicInterpolator1D(self.y, values, 'CUBIC')
+        expected = CubicSpline(self.y, values)(self.yi)
+        self.assertTrue(numpy.allclose(interp.points(self.yi), expected))
+
+    def test_1d_monotone(self):
+        """Test PCHIP doesn't overshoot a monotone curve"""
+        y = [0, 1, 2, 3, 4, 5]
+        values = [0, 0, 0, 100, 100, 100]
+        yi = numpy.linspace(0, 5, 101)
+        out = CubicInterpolator1D(y, values, 'PCHIP')(yi)
+        self.assertTrue((numpy.diff(out) >= 0).all())
+        self.assertTrue(out.min() >= 0 and out.max() <= 100)
+        # Whereas the spline overshoots
+        out = CubicInterpolator1D(y, values, 'CUBIC')(yi)
+        self.assertTrue(out.max() > 100)
+
+    def test_2d_table_values(self):
+        """Test 2D interpolation at the table values returns them"""
+        for method in ('PCHIP', 'CUBIC'):
+            interp = CubicInterpolator2D(self.x, self.y, self.values, method)
+            self.assertTrue(numpy.allclose(interp.grid(self.x, self.y), self.values))
+
+    def test_2d_spline_matches_scipy(self):
+        """Test 2D cubic spline interpolation matches scipy"""
+        interp = CubicInterpolator2D(self.x, self.y, self.values, 'CUBIC')
+        reference = RectBivariateSpline(self.y, self.x, self.values, s=0)
+        expected = reference(self.yi, self.xi, grid=False)
+        self.assertTrue(numpy.allclose(interp.points(self.xi, self.yi), expected))
+
+    def test_2d_pchip_separable(self):
+        """Test 2D PCHIP interpolation of a separable table"""
+        fx = numpy.log(self.x)
+        fy = numpy.sqrt(self.y)
+        values = fy[:, numpy.newaxis] * fx[numpy.newaxis, :]
+        interp = CubicInterpolator2D(self.x, self.y, values, 'PCHIP')
+        expected = (PchipInterpolator(self.y, fy)(self.yi)
+                    * PchipInterpolator(self.x, fx)(self.xi))
+        self.assertTrue(numpy.allclose(interp.points(self.xi, self.yi), expected))
+
+    def test_2d_cubic_polynomial(self):
+        """Test bicubic interpolation reproduces a cubic polynomial"""
+        def func(x, y):
+            return x**3 - 2 * x * y**2 + y**3 + 4
+
+        x, y = numpy.meshgrid(self.x, self.y)
+        interp = CubicInterpolator2D(self.x, self.y, func(x, y), 'CUBIC')
+        self.assertTrue(numpy.allclose(interp(self.xi, self.yi),
+                                       func(self.xi, self.yi)))
+
+
+class TestInverseInterpolation(TestCase):
+    """Test solving for the parameter values that give a table value"""
+    def test_segments(self):
+        """Test splitting a curve into monotone segments"""
+        interp = Interpolator1D([0, 1, 2, 3, 4, 5], [0, 10, 5, 5, 20, 30])
+        segments = MonotoneSegments(interp.as_poly())
+        self.assertEqual(segments.segments, [(0, 1, 1), (1, 3, -1), (3, 5, 1)])
+
+    def test_1d(self):
+        """Test every solution of a 1D table is found"""
+        interp = Interpolator1D([0, 1, 2, 3, 4], [0, 10, 5, 5, 20])
+        self.assertEqual(interp.solve(7.5), [0.75, 1.5, 3 + 1 / 6.])
+        self.assertEqual(interp.solve(0), [0])
+        self.assertEqual(interp.solve(20), [4])
+        self.assertEqual(interp.solve(-1), [])
+        self.assertEqual(interp.solve(21), [])
+        # A flat run is given by its ends
+        self.assertEqual(interp.solve(5), [0.5, 2, 3])
+
+    def test_1d_cubic(self):
+        """Test solving cubic interpolants, including turning points"""
+        y = numpy.linspace(0, 2 * numpy.pi, 15)
+        for method in ('PCHIP', 'CUBIC'):
+            interp = CubicInterpolator1D(y, numpy.sin(y), method)
+            solutions = interp.solve(0.5)
+            self.assertEqual(len(solutions), 2)
+            self.assertTrue(numpy.allclose(interp(solutions), 0.5))
+            self.assertTrue(numpy.allclose(solutions, [numpy.pi / 6, 5 * numpy.pi / 6],
+                                           atol=1e-2))
+
+        # The spline's maximum lies between the table values
+        interp = CubicInterpolator1D([0, 1, 2, 3], [0, 1, 1, 0], 'CUBIC')
+        peak = float(interp(1.5))
+        self.assertTrue(peak > 1)
+        self.assertEqual(len(interp.solve((1 + peak) / 2)), 2)
+
+    def test_2d(self):
+        """Test solving along a 2D table's rows and columns"""
+        x = numpy.array([1., 2., 4., 5., 7.])
+        y = numpy.array([0., 1., 3., 4.])
+        xx, yy = numpy.meshgrid(x, y)
+        values = xx**2 * yy + 3 * yy**3 - xx
+        for interp in (Interpolator2D(x, y, values),
+                       CubicInterpolator2D(x, y, values, 'PCHIP'),
+                       CubicInterpolator2D(x, y, values, 'CUBIC')):
+            solutions = interp.solve_y(3.3, 20)
+            self.assertEqual(len(solutions), 1)
+            self.assertAlmostEqual(float(interp(3.3, solutions[0])), 20)
+
+            solutions = interp.solve_x(3.5, 150)
+            self.assertEqual(len(solutions), 1)
+            self.assertAlmostEqual(float(interp(solutions[0], 3.5)), 150)
+
+            self.assertEqual(interp.solve_x(2.5, 20), [])
+            # The fixed value isn't extrapolated
+            self.assertEqual(interp.solve_y(8, 20), [])
+            self.assertEqual(interp.solve_x(-1, 20), [])
+
+
+class TestInterpolatorRegistry(TestCase):
+    """Test the interpolators are reused between requests"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01')
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'), False)
+        self.registry = InterpolatorRegistry()
+
+    def test_reused(self):
+        """Test the same interpolator is returned for the same revision"""
+        data = _read_data_file(self.d)
+        revision = _data_file_key(self.d)
+        first = self.registry.get(self.d.pk, '1D', revision, data)
+        second = self.registry.get(self.d.pk, '1D', revision, data)
+        self.assertTrue(first is second)
+        self.assertEqual(self.registry.stats()['hits'], 1)
+
+    def test_new_revision(self):
+        """Test a new interpolator is built when the file changes"""
+        first = self.registry.get(self.d.pk, '1D', _data_file_key(self.d),
+                                  _read_data_file(self.d))
+        self.d.data.save('table.csv', open(SAMPLE_2D, 'r'))
+        second = self.registry.get(self.d.pk, '2D', _data_file_key(self.d),
+                                   _read_data_file(self.d))
+        third = self.registry.get(self.d.pk, '1D', _data_file_key(self.d),
+                                  _read_data_file(self.d))
+        self.assertFalse(first is third)
+        self.assertEqual(len(third.y), 53)
+        self.assertEqual(len(second.x), 22)
+        self.assertEqual(self.registry.stats()['entries'], 2)
+
+    def test_discard(self):
+        """Test discarding the interpolators for a Data"""
+        data = _read_data_file(self.d)
+        revision = _data_file_key(self.d)
+        first = self.registry.get(self.d.pk, '1D', revision, data)
+        self.registry.discard(self.d.pk)
+        second = self.registry.get(self.d.pk, '1D', revision, data)
+        self.assertFalse(first is second)
+
+    def test_saving_discards(self):
+        """Test saving the Data discards its interpolators"""
+        registry = interpolator_registry()
+        data = _read_data_file(self.d)
+        registry.get(self.d.pk, '1D', _data_file_key(self.d), data)
+        self.assertTrue((self.d.pk, '1D', 'LINEAR') in registry._cache)
+        self.d.save()
+        self.assertFalse((self.d.pk, '1D', 'LINEAR') in registry._cache)
+
+    def test_methods(self):
+        """Test each interpolation method has its own interpolator"""
+        data = _read_data_file(self.d)
+        revision = _data_file_key(self.d)
+        linear = self.registry.get(self.d.pk, '1D', revision, data)
+        pchip = self.registry.get(self.d.pk, '1D', revision, data, 'PCHIP')
+        self.assertTrue(isinstance(pchip, CubicInterpolator1D))
+        self.assertEqual(pchip.method, 'PCHIP')
+        self.assertFalse(isinstance(linear, CubicInterpolator1D))
+        self.assertTrue(self.registry.get(self.d.pk, '1D', revision, data, 'PCHIP') is pchip)
+
+    def test_method_view(self):
+        """Test the Data's interpolation method is used by the views"""
+        self.d.interpolation_type = '1D'
+        self.d.interpolation_method = 'CUBIC'
+        self.d.save()
+        data = _read_data_file(self.d)
+        y = numpy.asarray(data['y_values'], dtype=numpy.float64)
+        yi = (y[2] + y[3]) / 2
+        expected = CubicSpline(y, data['xy_array'][:, -1])(yi)
+
+        args = [self.m.slug, self.b.slug, self.d.slug]
+        c = Client()
+        rsp = c.post(reverse('interpolate_batch', args=args),
+                     json.dumps({'y_values' : [yi]}), content_type='application/json')
+        result = json.loads(rsp.content.decode('utf-8'))
+        self.assertAlmostEqual(result['values'][0], expected)
+
+        rsp = c.post(reverse('interpolate_batch', args=args),
+                     json.dumps({'y_values' : [yi], 'method' : 'LINEAR'}),
+                     content_type='application/json')
+        result = json.loads(rsp.content.decode('utf-8'))
+        self.assertNotAlmostEqual(result['values'][0], expected)
+
+        rsp = c.post(reverse('interpolate_batch', args=args),
+                     json.dumps({'y_values' : [yi], 'method' : 'QUINTIC'}),
+                     content_type='application/json')
+        self.assertEqual(rsp.status_code, 400)
+
+        rsp = c.post(reverse('interpolate', args=args),
+                     {'interp_type' : '1D', 'y_value' : str(yi)})
+        result = json.loads(rsp.content.decode('utf-8'))
+        self.assertEqual(result['table_data'][1], data['xy_format'].format(float(expected)))
+
+
+class TestInverseView(TestCase):
+    """Test the inverse interpolation view"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01',
+                                     interpolation_type='2D')
+        self.d.data.save('table.csv', open(SAMPLE_2D, 'r'))
+        self.url = reverse('interpolate_inverse',
+                           args=[self.m.slug, self.b.slug, self.d.slug])
+
+    def _post(self, body):
+        rsp = Client().post(self.url, json.dumps(body), content_type='application/json')
+        return rsp.status_code, json.loads(rsp.content.decode('utf-8'))
+
+    def test_column(self):
+        """Test finding the depth at which the PDD is 50%"""
+        status, result = self._post({'value' : 50, 'x_value' : 10})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['table_type'], '2D')
+        self.assertEqual(result['solve_for'], 'y')
+        self.assertEqual(len(result['values']), 1)
+        interp = Interpolator2D.from_table(_read_data_file(self.d))
+        self.assertAlmostEqual(float(interp(10, result['values'][0])), 50)
+        data = _read_data_file(self.d)
+        self.assertEqual(result['table_data'], [data['y_format'].format(result['values'][0])])
+
+    def test_row(self):
+        """Test solving along a row for the field size"""
+        data = _read_data_file(self.d)
+        depth = float(data['y_values'][20])
+        row = data['xy_array'][20]
+        target = float(row[3] + row[4]) / 2
+        status, result = self._post({'value' : target, 'y_value' : depth,
+                                     'method' : 'PCHIP'})
+        self.assertEqual(result['solve_for'], 'x')
+        interp = CubicInterpolator2D.from_table(data, method='PCHIP')
+        for x in result['values']:
+            self.assertAlmostEqual(float(interp(x, depth)), target)
+
+    def test_1d(self):
+        """Test solving a 1D table"""
+        status, result = self._post({'value' : 50, 'interp_type' : '1D'})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['solve_for'], 'y')
+        interp = Interpolator1D.from_table(_read_data_file(self.d))
+        for y in result['values']:
+            self.assertAlmostEqual(float(interp(y)), 50)
+
+    def test_invalid(self):
+        """Test invalid requests are rejected"""
+        self.assertEqual(self._post({'x_value' : 10})[0], 400)
+        self.assertEqual(self._post({'value' : 50})[0], 400)
+        self.assertEqual(self._post({'value' : 50, 'x_value' : 10, 'y_value' : 5})[0], 400)
+        self.assertEqual(self._post({'value' : 'a', 'x_value' : 10})[0], 400)
+        self.assertEqual(self._post({'value' : 50, 'x_value' : 10, 'method' : 'X'})[0], 400)
+
+    def test_out_of_range(self):
+        """Test a fixed X or Y value outside the table is rejected"""
+        status, result = self._post({'value' : 50, 'x_value' : 1000})
+        self.assertEqual(status, 400)
+        self.assertEqual(result['error'], 'The X value is outside the table')
+        status, result = self._post({'value' : 99, 'y_value' : -50})
+        self.assertEqual(status, 400)
+        self.assertEqual(result['error'], 'The Y value is outside the table')
+
+    def test_not_interpolable(self):
+        """Test tables that can't be interpolated with the type are rejected"""
+        self.d.interpolation_type = '1D'
+        self.d.save()
+        self.assertEqual(self._post({'value' : 50, 'interp_type' : '1D'})[0], 200)
+        self.assertEqual(self._post({'value' : 50, 'x_value' : 10,
+                                     'interp_type' : '2D'})[0], 400)
+        self.d.interpolation_type = 'NA'
+        self.d.save()
+        self.assertEqual(self._post({'value' : 50, 'interp_type' : '1D'})[0], 400)
+
+
+class TestInterpolationCache(TestCase):
+    """Test the interpolation results are cached"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01',
+                                     interpolation_type='2D')
+        self.d.data.save('table.csv', open(SAMPLE_2D, 'r'))
+        self.url = reverse('interpolate', args=[self.m.slug, self.b.slug, self.d.slug])
+        caches['default'].clear()
+        metrics_registry().clear()
+
+    def _post(self, x, y):
+        rsp = Client().post(self.url, {'interp_type' : '2D', 'x_value' : x, 'y_value' : y})
+        self.assertEqual(rsp.status_code, 200)
+        return json.loads(rsp.content.decode('utf-8'))
+
+    def test_quantize(self):
+        """Test rounding values to the precision they're displayed with"""
+        self.assertEqual(_quantize('{:.1f}', 5.83), 5.8)
+        self.assertEqual(_quantize('{:.2e} cm', 12345.0), 12300.0)
+        self.assertEqual(_quantize('{:.3g}', 0.012345), 0.0123)
+        self.assertEqual(_quantize('{}', 5.83), 5.83)
+        self.assertEqual(_quantize('{:.1f}', None), None)
+
+    def test_cached(self):
+        """Test repeated lookups of values at the display precision are cached"""
+        first = self._post('10.0', '5.0')
+        with mock.patch('pdbook.views._run_interpolation') as run:
+            second = self._post('10.0', '5.0')
+            self.assertFalse(run.called)
+
+        self.assertEqual(first, second)
+        self.assertEqual(metrics_registry().snapshot()['interpolation_cache'],
+                         {'hits' : 1, 'misses' : 1})
+        self.assertEqual(metrics_registry().snapshot()['interpolations']['2D'], 2)
+
+        # A different value isn't cached
+        third = self._post('10.1', '5.0')
+        self.assertEqual(third['x_values'][1], '10.1')
+        self.assertEqual(metrics_registry().snapshot()['interpolation_cache']['misses'], 2)
+
+    def test_exact_values(self):
+        """Test values more precise than displayed are interpolated exactly"""
+        self._post('10.0', '5.0')
+        data = _read_data_file(self.d)
+        expected = Interpolator2D.from_table(data)(10.04, 4.96)
+        for ii in range(2):
+            with mock.patch('pdbook.views._run_interpolation',
+                            wraps=views._run_interpolation) as run:
+                result = self._post('10.04', '4.96')
+                self.assertEqual(run.call_args[0][-2:], (10.04, 4.96))
+
+            self.assertEqual(result['table_data'][1][1],
+                             data['xy_format'].format(float(expected)))
+
+        # The results aren't cached, nor looked up
+        self.assertEqual(metrics_registry().snapshot()['interpolation_cache'],
+                         {'hits' : 0, 'misses' : 1})
+
+    def test_new_table(self):
+        """Test a new table isn't given the old table's results"""
+        self._post('10.0', '5.0')
+        self.d.interpolation_method = 'CUBIC'
+        self.d.save()
+        self._post('10.0', '5.0')
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        self.d.interpolation_type = '1D'
+        self.d.save()
+        rsp = Client().post(self.url, {'interp_type' : '1D', 'y_value' : '5.0'})
+        self.assertEqual(len(json.loads(rsp.content.decode('utf-8'))['table_data']), 3)
+        self.assertEqual(metrics_registry().snapshot()['interpolation_cache'],
+                         {'hits' : 0, 'misses' : 3})
+
+
+class TestBoundedExecutor(TestCase):
+    """Test the BoundedExecutor class"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01',
+                                     interpolation_type='1D')
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        # Cached results wouldn't use the executor
+        caches['default'].clear()
+
+    def test_run(self):
+        """Test running a function in the pool"""
+        executor = BoundedExecutor(2, 0)
+        self.assertEqual(executor.run(sum, [1, 2, 3]), 6)
+
+    def test_queue_full(self):
+        """Test work is rejected when the queue is full"""
+        executor = BoundedExecutor(1, 1)
+        event = threading.Event()
+        first = executor.submit(event.wait)
+        second = executor.submit(event.wait)
+        with self.assertRaises(InterpolationBusy):
+            executor.submit(event.wait)
+
+        event.set()
+        first.result()
+        second.result()
+        self.assertEqual(executor.run(abs, -1), 1)
+
+    def test_timeout(self):
+        """Test InterpolationBusy is raised if the result isn't ready"""
+        executor = BoundedExecutor(1, 0)
+        event = threading.Event()
+        with self.assertRaises(InterpolationBusy):
+            executor.run(event.wait, timeout=0.01)
+
+        # The timed out work keeps running and holds its slot
+        with self.assertRaises(InterpolationBusy):
+            executor.submit(abs, -1)
+        event.set()
+        # The slot is released once the work has finished
+        for _ in range(100):
+            try:
+                self.assertEqual(executor.run(abs, -1, timeout=1), 1)
+                break
+            except InterpolationBusy:
+                time.sleep(0.01)
+        else:
+            self.fail('The timed out work kept its slot')
+        event.clear()
+
+        # Queued work that times out is cancelled and gives up its slot
+        executor = BoundedExecutor(1, 1)
+        first = executor.submit(event.wait)
+        with self.assertRaises(InterpolationBusy):
+            executor.run(abs, -1, timeout=0.01)
+        second = executor.submit(event.wait)
+
+        event.set()
+        first.result()
+        second.result()
+
+    def test_busy_response(self):
+        """Test the interpolation views respond with 503 when busy"""
+        executor = BoundedExecutor(1, 0)
+        event = threading.Event()
+        executor.submit(event.wait)
+
+        args = [self.m.slug, self.b.slug, self.d.slug]
+        c = Client()
+        with mock.patch('pdbook.views.interpolation_executor', return_value=executor):
+            rsp = c.post(reverse('interpolate', args=args),
+                         {'interp_type' : '1D', 'y_value' : '2.5'})
+            self.assertEqual(rsp.status_code, 503)
+            self.assertEqual(rsp['Retry-After'], '1')
+
+            rsp = c.post(reverse('interpolate_batch', args=args),
+                         json.dumps({'y_values' : [2.5]}),
+                         content_type='application/json')
+            self.assertEqual(rsp.status_code, 503)
+
+        event.set()
+        rsp = c.post(reverse('interpolate', args=args),
+                     {'interp_type' : '1D', 'y_value' : '2.5'})
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue(json.loads(rsp.content.decode('utf-8'))['y_value_ok'])
@@ -1,5 +1,6 @@
 import unittest
 
+from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError
 from django.test import TestCase, Client
 
@@ -59,6 +60,16 @@ class TestMachineModel(TestCase):
                                    serial_number="Linac 0003",
                                    visible_name="Linac 03")
 
+    def test_reserved_name(self):
+        """Test names giving the slugs of the API and metrics URLs are rejected"""
+        for name in ('api', 'Metrics', 'API'):
+            m = Machine(name=name, visible_name="Linac 03")
+            with self.assertRaises(ValidationError) as cm:
+                m.full_clean(exclude=['slug'])
+            self.assertTrue('name' in cm.exception.message_dict)
+
+        Machine(name="api 2", visible_name="Linac 03").full_clean(exclude=['slug'])
+
     @unittest.skip("Can't test")
     def test_machine_name_required(self):
         """Test exception raised if no machine name value"""
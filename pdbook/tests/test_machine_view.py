@@ -55,3 +55,18 @@ class TestMachineView(TestCase):
         self.assertEqual(rsp.status_code, 200)
         self.assertEqual(len(rsp.context['beam_list']), 2)
 
+
+    def test_query_budget(self):
+        """Test the machine view uses no queries once the navigation is cached"""
+        Beam.objects.create(name="Beam Name 01",
+                            visible_name="Beam 01",
+                            machine=self.m2)
+        Beam.objects.create(name="Beam Name 02",
+                            visible_name="Beam 02",
+                            machine=self.m2)
+
+        c = Client()
+        c.get(reverse('index'))
+        with self.assertNumQueries(0):
+            rsp = c.get(reverse('machine', args=[self.m2.slug]))
+        self.assertEqual(rsp.status_code, 200)
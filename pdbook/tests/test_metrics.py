@@ -0,0 +1,167 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase, Client, override_settings
+
+from pdbook.metrics import (
+    BUCKETS, MetricsMiddleware, MetricsRegistry, merge, metrics_registry, quantile,
+    render_metrics
+)
+from pdbook.models import Machine, Beam, Data
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+
+MIDDLEWARE = ['pdbook.metrics.MetricsMiddleware']
+
+
+class TestMetricsRegistry(TestCase):
+    """Test the MetricsRegistry class"""
+    def test_observe(self):
+        """Test recording requests"""
+        registry = MetricsRegistry()
+        registry.observe('get_data', 0.003)
+        registry.observe('get_data', 0.02, error=True)
+        registry.observe('get_data', 20)
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot['requests'], {'get_data' : 3})
+        self.assertEqual(snapshot['errors'], {'get_data' : 1})
+        buckets = snapshot['durations']['get_data']['buckets']
+        self.assertEqual(buckets[0], 1)
+        self.assertEqual(buckets[BUCKETS.index(0.025)], 1)
+        self.assertEqual(buckets[-1], 1)
+
+    def test_merge(self):
+        """Test combining the metrics from several processes"""
+        first = MetricsRegistry()
+        first.observe('index', 0.001)
+        first.count_interpolations('1D')
+        second = MetricsRegistry()
+        second.observe('index', 0.2)
+        second.count_interpolations('1D', 5)
+        result = merge([first.snapshot(), second.snapshot()])
+        self.assertEqual(result['requests']['index'], 2)
+        self.assertEqual(result['interpolations']['1D'], 6)
+        self.assertEqual(sum(result['durations']['index']['buckets']), 2)
+
+    def test_quantile(self):
+        """Test estimating the quantiles from the histogram"""
+        buckets = [0] * (len(BUCKETS) + 1)
+        self.assertEqual(quantile(buckets, 0.5), None)
+        buckets[0] = 50
+        buckets[1] = 50
+        self.assertAlmostEqual(quantile(buckets, 0.5), 0.005)
+        self.assertAlmostEqual(quantile(buckets, 0.75), 0.0075)
+        buckets[-1] = 100
+        self.assertEqual(quantile(buckets, 0.99), BUCKETS[-1])
+
+    def test_shared_directory(self):
+        """Test the metrics are combined through PDBOOK_METRICS_DIR"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self.settings(PDBOOK_METRICS_DIR=tmpdir):
+                other = MetricsRegistry()
+                other.observe('index', 0.001)
+                other.flush()
+                # Simulate a second (running) process' file
+                path, = glob.glob(os.path.join(tmpdir, 'pdbook-*.json'))
+                os.rename(path, os.path.join(tmpdir, 'pdbook-{}-0.json'.format(os.getppid())))
+
+                registry = MetricsRegistry()
+                registry.observe('index', 0.001)
+                result = registry.collect()
+                self.assertEqual(result['requests']['index'], 2)
+
+    def test_stale_files(self):
+        """Test the files of processes that have exited are removed"""
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self.settings(PDBOOK_METRICS_DIR=tmpdir):
+                other = MetricsRegistry()
+                other.observe('index', 0.001)
+                other.flush()
+                path, = glob.glob(os.path.join(tmpdir, 'pdbook-*.json'))
+                stale = [os.path.join(tmpdir, 'pdbook-{}-0.json'.format(exited.pid)),
+                         # An exited process with this process's ID
+                         os.path.join(tmpdir, 'pdbook-{}-0.json'.format(os.getpid())),
+                         # The file name used by older versions
+                         os.path.join(tmpdir, 'pdbook-{}.json'.format(os.getppid()))]
+                for name in stale:
+                    shutil.copy(path, name)
+                os.remove(path)
+
+                registry = MetricsRegistry()
+                registry.observe('index', 0.001)
+                result = registry.collect()
+                self.assertEqual(result['requests']['index'], 1)
+                self.assertEqual(len(os.listdir(tmpdir)), 1)
+
+
+    def test_flush_error(self):
+        """Test errors writing the metrics are logged rather than raised"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            directory = os.path.join(tmpdir, 'missing')
+            with self.settings(PDBOOK_METRICS_DIR=directory):
+                registry = MetricsRegistry()
+                registry.observe('index', 0.001)
+                with self.assertLogs('pdbook.metrics', 'WARNING'):
+                    registry.flush()
+
+                # The middleware creates the directory
+                MetricsMiddleware(None)
+                registry.flush(force=True)
+                self.assertEqual(len(os.listdir(directory)), 1)
+
+
+@override_settings(MIDDLEWARE=MIDDLEWARE)
+class TestMetricsView(TestCase):
+    """Test the metrics middleware and view"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01',
+                                     interpolation_type='1D')
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        metrics_registry().clear()
+
+    def test_metrics(self):
+        """Test the view requests are shown in the metrics"""
+        c = Client()
+        c.get(reverse('index'))
+        c.get(reverse('data', args=[self.m.slug, self.b.slug, self.d.slug]))
+        c.post(reverse('interpolate', args=[self.m.slug, self.b.slug, self.d.slug]),
+               {'interp_type' : '1D', 'y_value' : '2.5'})
+
+        rsp = c.get(reverse('metrics'))
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue(rsp['Content-Type'].startswith('text/plain'))
+        text = rsp.content.decode('utf-8')
+        self.assertTrue('pdbook_requests_total{view="index"} 1\n' in text)
+        self.assertTrue('pdbook_requests_total{view="get_data"} 1\n' in text)
+        self.assertTrue('pdbook_errors_total{view="get_data"} 0\n' in text)
+        self.assertTrue('pdbook_request_duration_seconds_bucket{view="get_data",le="+Inf"} 1\n' in text)
+        self.assertTrue('pdbook_request_duration_quantile_seconds{view="get_data",quantile="0.99"}' in text)
+        self.assertTrue('pdbook_interpolations_total{type="1D"} 1\n' in text)
+        self.assertTrue('pdbook_table_cache_hit_ratio ' in text)
+        # Only the parsed table lookups are counted, not the rendered HTML
+        stats = metrics_registry().snapshot()['table_cache']
+        self.assertEqual(stats['hits'] + stats['misses'], 2)
+        self.assertTrue('pdbook_interpolation_cache_hit_ratio ' in text)
+        # The metrics view itself isn't counted
+        self.assertFalse('view="metrics"' in text)
+
+    def test_render_empty(self):
+        """Test rendering with no requests"""
+        text = render_metrics(MetricsRegistry().snapshot())
+        self.assertTrue('# TYPE pdbook_requests_total counter' in text)
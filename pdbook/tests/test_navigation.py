@@ -0,0 +1,85 @@
+from django.http import Http404
+from django.test import TestCase
+
+from pdbook.models import Machine, Beam, Data
+from pdbook.navigation import get_navigation, invalidate_navigation
+
+
+class TestNavigationTree(TestCase):
+    """Test the cached navigation tree"""
+    def setUp(self):
+        self.m1 = Machine.objects.create(name="Linac Name 01",
+                                         visible_name="Linac 01")
+        self.m2 = Machine.objects.create(name="Linac Name 02",
+                                         visible_name="Linac 02")
+        self.m1_b1 = Beam.objects.create(name="Beam Name 01",
+                                         visible_name="Beam 01",
+                                         modality='MVE',
+                                         machine=self.m1)
+        self.m1_b2 = Beam.objects.create(name="Beam Name 02",
+                                         visible_name="Beam 02",
+                                         machine=self.m1)
+        self.m1_b1_d1 = Data.objects.create(beam=self.m1_b1,
+                                            name='Data Name 01',
+                                            visible_name='Data 01')
+        invalidate_navigation()
+
+    def test_tree(self):
+        """Test the tree contents and ordering"""
+        tree = get_navigation()
+        self.assertEqual(tree.machines, [self.m1, self.m2])
+        self.assertEqual(tree.beams_for(self.m1), [self.m1_b2, self.m1_b1])
+        self.assertEqual(tree.beams_for(self.m2), [])
+        self.assertEqual(tree.data_for(self.m1_b1), [self.m1_b1_d1])
+        self.assertEqual(tree.data_for(self.m1_b2), [])
+
+    def test_lookups(self):
+        """Test looking up Machines and Beams by slug"""
+        tree = get_navigation()
+        self.assertEqual(tree.get_machine(self.m2.slug), self.m2)
+        self.assertEqual(tree.get_beam(self.m1.slug, self.m1_b1.slug), self.m1_b1)
+        with self.assertRaises(Http404):
+            tree.get_machine('no-such-machine')
+        with self.assertRaises(Http404):
+            tree.get_beam(self.m2.slug, self.m1_b1.slug)
+
+    def test_cached(self):
+        """Test the tree is only built once"""
+        get_navigation()
+        with self.assertNumQueries(0):
+            tree = get_navigation()
+            for b in tree.beams_for(self.m1):
+                b.get_absolute_url()
+            for d in tree.data_for(self.m1_b1):
+                d.get_absolute_url()
+
+    def test_invalidated_on_save(self):
+        """Test saving a Machine, Beam or Data updates the tree"""
+        get_navigation()
+        m3 = Machine.objects.create(name="Linac Name 03",
+                                    visible_name="Linac 03")
+        self.assertEqual(len(get_navigation().machines), 3)
+
+        b = Beam.objects.create(name="Beam Name 03",
+                                visible_name="Beam 03",
+                                machine=m3)
+        self.assertEqual(get_navigation().beams_for(m3), [b])
+
+        d = Data.objects.create(beam=b,
+                                name='Data Name 01',
+                                visible_name='Data 01')
+        self.assertEqual(get_navigation().data_for(b), [d])
+
+        d.visible_name = 'Renamed'
+        d.save()
+        self.assertEqual(get_navigation().data_for(b)[0].visible_name, 'Renamed')
+
+    def test_invalidated_on_delete(self):
+        """Test deleting a Machine, Beam or Data updates the tree"""
+        get_navigation()
+        self.m1_b1_d1.delete()
+        self.assertEqual(get_navigation().data_for(self.m1_b1), [])
+        self.m1_b2.delete()
+        self.assertEqual(get_navigation().beams_for(self.m1), [self.m1_b1])
+        self.m2.delete()
+        self.assertEqual(get_navigation().machines, [self.m1])
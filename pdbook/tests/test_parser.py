@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+import numpy
+
+from pdbook.views import _TableRows, _format_table, _format_values, _parse_csv_file
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+HEADER = """X_HEADERS=Y,A,B,C
+Y_HEADERS=
+Y_FORMAT={:.1f}
+Y_VALUES=1,2,3
+XY_FORMAT={:.2f}
+"""
+
+
+class TestParseCSVFile(TestCase):
+    """Test parsing the CSV data files"""
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, contents):
+        path = os.path.join(self.tmpdir, 'table.csv')
+        with open(path, 'w') as f:
+            f.write(contents)
+
+        return path
+
+    def test_numeric(self):
+        """Test a rectangular NUMERIC table is parsed to an array"""
+        path = self._write(HEADER + "1.0, 2.0, 3.0  # comment\n"
+                                    "# A comment line\n"
+                                    "4.0,5.0,6.0\n"
+                                    "7,8,9\n")
+        data = _parse_csv_file(path)
+        self.assertTrue(isinstance(data['XY_VALUES'], numpy.ndarray))
+        self.assertEqual(data['XY_VALUES'].tolist(),
+                         [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0], [7.0, 8.0, 9.0]])
+        self.assertEqual(data['X_HEADERS'], ['Y', 'A', 'B', 'C'])
+
+        table = _format_table(data)
+        self.assertEqual(table['table_data'][0], ['1.0', '1.00', '2.00', '3.00'])
+        self.assertEqual(table['xy_array'].shape, (3, 3))
+
+    def test_numeric_ragged(self):
+        """Test a NUMERIC table with uneven rows is parsed to lists"""
+        path = self._write(HEADER + "1.0,2.0,3.0\n4.0,5.0\n7,8,9\n")
+        data = _parse_csv_file(path)
+        self.assertEqual(data['XY_VALUES'], [[1.0, 2.0, 3.0], [4.0, 5.0], [7.0, 8.0, 9.0]])
+
+        table = _format_table(data)
+        self.assertEqual(table['table_data'][1], ['2.0', '4.00', '5.00'])
+        self.assertEqual(table['xy_array'], None)
+
+    def test_numeric_invalid(self):
+        """Test a NUMERIC table with non-numeric values raises"""
+        path = self._write(HEADER + "1.0,2.0,3.0\n4.0,abc,6.0\n")
+        self.assertRaises(ValueError, _parse_csv_file, path)
+
+    def test_verbatim(self):
+        """Test a VERBATIM table keeps the values as entered"""
+        path = self._write(HEADER + "XY_TYPE=VERBATIM\n"
+                                    "1.0,a^,b,c\n"
+                                    "x,y=1,z\n"
+                                    "4,5,6\n")
+        data = _parse_csv_file(path)
+        self.assertEqual(data['XY_VALUES'],
+                         [['1.0', 'a,b', 'c'], ['x', 'y=1', 'z'], ['4', '5', '6']])
+
+    def test_unknown_keyword(self):
+        """Test an unknown keyword fails to parse"""
+        path = self._write(HEADER + "Z_VALUES=1,2,3\n1,2,3\n")
+        self.assertEqual(_parse_csv_file(path), 'Unable to parse the data file')
+
+    def test_sample_file(self):
+        """Test the sample data is parsed the same as per cell"""
+        table = _format_table(_parse_csv_file(SAMPLE_2D))
+        xy_array = table['xy_array']
+        expected = [['{:.1f}'.format(val) for val in row] for row in xy_array.tolist()]
+        self.assertEqual([row[1:] for row in table['table_data']], expected)
+
+
+class TestFormatValues(TestCase):
+    """Test formatting the table values"""
+    def test_formats(self):
+        """Test the formatted values match str.format"""
+        values = [0.0, -1.5, 2.25, 1234.5678, 1e-7, float('nan'), float('inf')]
+        for fmt in ['{}', '{:.3f}', '{:+.2e}', '{:g}', '{0:8.1f}', '{:.1f} %',
+                    '{:.3}', '{:,.2f}', '{:.0f}%', '<b>{:.2f}</b>']:
+            self.assertEqual(_format_values(fmt, values),
+                             [fmt.format(val) for val in values])
+
+    def test_empty(self):
+        """Test formatting no values"""
+        self.assertEqual(_format_values('{:.2f}', []), [])
+
+
+class TestTableRows(TestCase):
+    """Test formatting the table rows as they're used"""
+    def test_window(self):
+        """Test formatting a window of the rows and columns"""
+        xy_values = numpy.arange(12, dtype=numpy.float64).reshape(4, 3)
+        rows = _TableRows(xy_values, ['a', 'b', 'c', 'd'], '{:.1f}', ['1', '2', '3'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows.n_columns, 5)
+        self.assertEqual(rows[0], ['a', '1', '0.0', '1.0', '2.0'])
+        # Rows past the end of the Y values don't have one
+        self.assertEqual(rows[-1], ['d', '9.0', '10.0', '11.0'])
+        self.assertEqual(rows.window(1, 3, [0, 3]), [['b', '4.0'], ['c', '7.0']])
+        self.assertEqual(rows.window(3, 10, [1, 4]), [['11.0']])
+        self.assertEqual(rows[1:3], list(rows)[1:3])
+        self.assertRaises(IndexError, rows.__getitem__, 4)
+
+    def test_only_window_formatted(self):
+        """Test only the rows in the window are formatted"""
+        xy_values = numpy.arange(3000, dtype=numpy.float64).reshape(1000, 3)
+        labels = [str(val) for val in range(1000)]
+        rows = _TableRows(xy_values, labels, '{:.2f}')
+        with mock.patch('pdbook.views._format_values', wraps=_format_values) as fmt:
+            self.assertEqual(rows.window(500, 502, [0, 2]),
+                             [['500', '1501.00'], ['501', '1504.00']])
+            self.assertEqual(len(fmt.call_args[0][1]), 2)
+
+    def test_verbatim(self):
+        """Test the rows of VERBATIM tables are used as entered"""
+        rows = _TableRows([['x', 'y=1', 'z'], ['4', '5']])
+        self.assertEqual(rows.n_columns, 3)
+        self.assertEqual(rows.window(0, 2, [1, 2]), [['y=1', 'z'], ['5']])
+        self.assertEqual(list(rows), [['x', 'y=1', 'z'], ['4', '5']])
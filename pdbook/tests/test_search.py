@@ -0,0 +1,131 @@
+import json
+import os
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase, Client
+
+from pdbook.models import Machine, Beam, Data, SearchTerm
+from pdbook.search import search, tokenize
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
+class TestSearch(TestCase):
+    """Test searching the Data"""
+    def setUp(self):
+        self.m1 = Machine.objects.create(name="Linac Name 01",
+                                         visible_name="Linac 01")
+        self.m2 = Machine.objects.create(name="Linac Name 02",
+                                         visible_name="Linac 02")
+        self.m1_b1 = Beam.objects.create(name="06 MV Photons",
+                                         visible_name="6 MV",
+                                         machine=self.m1)
+        self.m2_b1 = Beam.objects.create(name="15 MV Photons",
+                                         visible_name="15MV",
+                                         machine=self.m2)
+        self.d1 = Data.objects.create(beam=self.m1_b1,
+                                      name='PDD',
+                                      visible_name='Percentage<br/>Depth Dose')
+        self.d1.data.save('ssd_pdd.csv', open(SAMPLE_2D, 'r'))
+        self.d2 = Data.objects.create(beam=self.m2_b1,
+                                      name='Wedge OAR',
+                                      visible_name='Wedge OAR',
+                                      description='Off axis ratios for the wedge')
+        self.d2.data.save('iso_ci.csv', open(SAMPLE_1D, 'r'))
+        self.d3 = Data.objects.create(beam=self.m2_b1,
+                                      name='Open OAR',
+                                      visible_name='Open OAR')
+
+    def test_tokenize(self):
+        """Test splitting text into search words"""
+        self.assertEqual(tokenize('Wedge <b>OAR</b> 15MV'),
+                         ['wedge', 'oar', '15', 'mv'])
+        self.assertEqual(tokenize('d<sub>max</sub> 1.5&nbsp;cm<br/>SSD'),
+                         ['dmax', '1.5', 'cm', 'ssd'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_search(self):
+        """Test searching across the machine, beam and data"""
+        results = search('wedge OAR 15 MV')
+        self.assertEqual([d for d, score in results], [self.d2])
+        results = search('oar')
+        self.assertEqual([d for d, score in results], [self.d3, self.d2])
+        self.assertEqual(search('oar 6'), [])
+        self.assertEqual(search(''), [])
+
+    def test_prefix(self):
+        """Test query words match the start of words"""
+        results = search('percent')
+        self.assertEqual([d for d, score in results], [self.d1])
+        # 'depth' is also in the other table's DESCRIPTION
+        results = search('dep')
+        self.assertEqual([d for d, score in results], [self.d1, self.d2])
+
+    def test_table_keywords(self):
+        """Test the table DESCRIPTION, SOURCE and titles are searched"""
+        results = search('isocentric calibration')
+        self.assertEqual([d for d, score in results], [self.d2])
+        results = search('planning data book')
+        self.assertEqual(len(results), 2)
+
+    def test_ranking(self):
+        """Test exact and name matches are ranked first"""
+        results = search('wedge')
+        self.assertEqual(results[0][0], self.d2)
+        d4 = Data.objects.create(beam=self.m1_b1,
+                                 name='Factors',
+                                 visible_name='Factors',
+                                 description='Wedged fields')
+        results = search('wedge')
+        self.assertEqual([d for d, score in results], [self.d2, d4])
+
+    def test_incremental(self):
+        """Test the index is updated when the Data, Beam or Machine change"""
+        self.d3.visible_name = 'Electron Cutout'
+        self.d3.save()
+        self.assertEqual([d for d, score in search('cutout')], [self.d3])
+
+        self.m2_b1.visible_name = 'Flattening Filter Free'
+        self.m2_b1.save()
+        self.assertEqual(len(search('filter free')), 2)
+
+        self.m1.description = 'Bunker three'
+        self.m1.save()
+        self.assertEqual([d for d, score in search('bunker')], [self.d1])
+
+        self.d3.delete()
+        self.assertEqual(search('cutout'), [])
+
+    def test_query_budget(self):
+        """Test searching doesn't read the data files or do a query per Data"""
+        search('oar')
+        with self.assertNumQueries(1):
+            search('wedge oar mv')
+
+    def test_rebuild(self):
+        """Test the rebuild_search_index command"""
+        SearchTerm.objects.all().delete()
+        self.assertEqual(search('wedge'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertEqual([d for d, score in search('wedge')], [self.d2])
+        self.assertTrue('search terms' in out.getvalue())
+
+    def test_api(self):
+        """Test the search API"""
+        rsp = Client().get(reverse('api_search'), {'q' : 'wedge oar'})
+        self.assertEqual(rsp.status_code, 200)
+        result = json.loads(rsp.content.decode('utf-8'))
+        self.assertEqual(result['query'], 'wedge oar')
+        self.assertEqual(len(result['results']), 1)
+        self.assertEqual(result['results'][0]['slug'], self.d2.slug)
+        self.assertEqual(result['results'][0]['beam']['slug'], self.m2_b1.slug)
+        self.assertEqual(result['results'][0]['page_url'], self.d2.get_absolute_url())
+
+        rsp = Client().get(reverse('api_search'), {'q' : 'oar', 'limit' : 'x'})
+        self.assertEqual(rsp.status_code, 400)
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import time
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+
+from pdbook.models import Machine, Beam, Data, DataTable
+from pdbook.storage import content_hash, content_name
+from pdbook.views import _data_file_key, _read_data_file
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+SAMPLE_2D = os.path.join(SAMPLE_DIR, 'ssd_pdd.csv')
+
+
+class TestContentAddressedStorage(TestCase):
+    """Test storing the data files by their contents"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b1 = Beam.objects.create(name="Beam Name 01",
+                                      visible_name="Beam 01",
+                                      machine=self.m)
+        self.b2 = Beam.objects.create(name="Beam Name 02",
+                                      visible_name="Beam 02",
+                                      machine=self.m)
+        self.d1 = Data.objects.create(beam=self.b1,
+                                      name='Data Name 01',
+                                      visible_name='Data 01')
+        self.d2 = Data.objects.create(beam=self.b2,
+                                      name='Data Name 01',
+                                      visible_name='Data 01')
+
+    def test_content_name(self):
+        """Test the file is named by the SHA-256 of its contents"""
+        self.d1.data.save('Table.CSV', open(SAMPLE_1D, 'r'))
+        with open(SAMPLE_1D, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+
+        self.assertEqual(self.d1.data.name, content_name(sha256, '.csv'))
+        self.assertEqual(content_hash(self.d1.data.name), sha256)
+        self.assertEqual(DataTable.objects.get(data=self.d1).sha256, sha256)
+        with open(self.d1.data.path, 'rb') as f, open(SAMPLE_1D, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
+
+        self.assertEqual(content_hash('linac/beam/table.csv'), None)
+        self.assertEqual(content_hash(''), None)
+
+    def test_deduplicated(self):
+        """Test identical files used by different beams are stored once"""
+        self.d1.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        self.d2.data.save('other.csv', SimpleUploadedFile('other.csv',
+                                                          open(SAMPLE_1D, 'rb').read()))
+        self.assertEqual(self.d1.data.name, self.d2.data.name)
+        directory = os.path.dirname(self.d1.data.path)
+        self.assertEqual([fname for fname in os.listdir(directory)
+                          if fname.startswith(content_hash(self.d1.data.name))],
+                         [os.path.basename(self.d1.data.path)])
+
+    def test_replace(self):
+        """Test a new file doesn't modify the previous one"""
+        self.d1.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        old_path = self.d1.data.path
+        old_key = _data_file_key(self.d1)
+
+        self.d1.data.save('table.csv', open(SAMPLE_2D, 'r'))
+        self.assertNotEqual(self.d1.data.path, old_path)
+        self.assertNotEqual(_data_file_key(self.d1), old_key)
+        with open(old_path, 'rb') as f, open(SAMPLE_1D, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_cache_key(self):
+        """Test the cache key is taken from the file name"""
+        self.d1.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        d = Data.objects.get(pk=self.d1.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(_data_file_key(d),
+                             (d.pk, content_hash(d.data.name)))
+
+        # Data with the same file share the cached table
+        self.d2.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        table = _read_data_file(Data.objects.select_related('table').get(pk=self.d1.pk))
+        other = _read_data_file(Data.objects.select_related('table').get(pk=self.d2.pk))
+        self.assertTrue(table['xy_array'] is other['xy_array'])
+
+    def test_clean_data_files(self):
+        """Test the clean_data_files command removes only unused files"""
+        self.d1.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        old_path = self.d1.data.path
+        self.d1.data.save('table.csv', open(SAMPLE_2D, 'r'))
+
+        out = StringIO()
+        call_command('clean_data_files', '--dry-run', '--min-age', '0', stdout=out)
+        self.assertIn(old_path, out.getvalue())
+        self.assertTrue(os.path.exists(old_path))
+
+        # Recently stored files are kept
+        out = StringIO()
+        call_command('clean_data_files', stdout=out)
+        self.assertTrue(os.path.exists(old_path))
+
+        os.utime(old_path, (time.time() - 7200, time.time() - 7200))
+        out = StringIO()
+        call_command('clean_data_files', stdout=out)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(self.d1.data.path))
+        self.assertIn('Removed', out.getvalue())
@@ -0,0 +1,111 @@
+import marshal
+import os
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.test import TestCase, Client, override_settings
+
+from pdbook.models import Machine, Beam, Data
+from pdbook.timing import Timings, span
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
+SAMPLE_1D = os.path.join(SAMPLE_DIR, 'iso_ci.csv')
+
+MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'pdbook.timing.ServerTimingMiddleware',
+]
+
+
+class TestTimings(TestCase):
+    """Test the Timings class"""
+    def test_header(self):
+        """Test the Server-Timing header value"""
+        timings = Timings()
+        timings.add('read', 0.001)
+        timings.add('render', 0.002)
+        timings.add('read', 0.0005)
+        self.assertEqual(timings.header(),
+                         'read;dur=1.50, render;dur=2.00')
+        self.assertEqual(timings.header(0.01),
+                         'read;dur=1.50, render;dur=2.00, total;dur=10.00')
+        self.assertEqual(timings.as_dict()['read']['calls'], 2)
+
+    def test_span_inactive(self):
+        """Test spans do nothing outside a timed request"""
+        @span('test')
+        def func(value):
+            return value * 2
+
+        self.assertEqual(func(2), 4)
+        with span('test'):
+            pass
+
+
+@override_settings(MIDDLEWARE=MIDDLEWARE)
+class TestServerTimingMiddleware(TestCase):
+    """Test the ServerTimingMiddleware"""
+    def setUp(self):
+        self.m = Machine.objects.create(name="Linac Name 01",
+                                        visible_name="Linac 01")
+        self.b = Beam.objects.create(name="Beam Name 01",
+                                     visible_name="Beam 01",
+                                     machine=self.m)
+        self.d = Data.objects.create(beam=self.b,
+                                     name='Data Name 01',
+                                     visible_name='Data 01',
+                                     interpolation_type='1D')
+        self.d.data.save('table.csv', open(SAMPLE_1D, 'r'))
+        self.url = reverse('data', args=[self.m.slug, self.b.slug, self.d.slug])
+
+    def test_header(self):
+        """Test the data page has a Server-Timing header with the spans"""
+        rsp = Client().get(self.url)
+        self.assertEqual(rsp.status_code, 200)
+        metrics = [val.split(';')[0] for val in rsp['Server-Timing'].split(', ')]
+        for name in ['db', 'read', 'render', 'total']:
+            self.assertTrue(name in metrics)
+
+    def test_interpolate(self):
+        """Test the interpolation is timed"""
+        url = reverse('interpolate', args=[self.m.slug, self.b.slug, self.d.slug])
+        # Cached results aren't interpolated again
+        caches['default'].clear()
+        rsp = Client().post(url, {'interp_type' : '1D', 'y_value' : '2.5'})
+        self.assertTrue('interpolate;dur=' in rsp['Server-Timing'])
+
+    @override_settings(PDBOOK_TIMING_LOG=True)
+    def test_log(self):
+        """Test the timings are logged if PDBOOK_TIMING_LOG is True"""
+        with self.assertLogs('pdbook.timing', 'INFO') as logs:
+            Client().get(self.url)
+
+        record = logs.records[0]
+        self.assertEqual(record.path, self.url)
+        self.assertEqual(record.status, 200)
+        self.assertTrue('read' in record.spans)
+
+    def test_profile_staff(self):
+        """Test staff users can download a profile of the request"""
+        user = User.objects.create_user('staff', password='password', is_staff=True)
+        c = Client()
+        c.force_login(user)
+        rsp = c.get(self.url, {'profile' : 1})
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp['Content-Type'], 'application/octet-stream')
+        self.assertTrue('attachment' in rsp['Content-Disposition'])
+        stats = marshal.loads(rsp.content)
+        self.assertTrue(any(func[2] == 'get_data' for func in stats))
+
+    def test_profile_not_staff(self):
+        """Test other users can't profile requests"""
+        user = User.objects.create_user('user', password='password')
+        c = Client()
+        c.force_login(user)
+        rsp = c.get(self.url, {'profile' : 1})
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue(rsp['Content-Type'].startswith('text/html'))
+        self.assertTrue('Server-Timing' in rsp)
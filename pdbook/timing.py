@@ -0,0 +1,162 @@
+import contextlib
+import cProfile
+import logging
+import marshal
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+
+logger = logging.getLogger('pdbook.timing')
+
+_LOCAL = threading.local()
+
+
+class Timings(object):
+    """The total time spent in each named span during a request.
+
+    Attributes
+    ----------
+    spans : dict of {str : list of [float, int]}
+        The total duration (in seconds) and number of calls for each span
+        name, in the order the spans were first entered.
+    """
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, name, duration):
+        """Add `duration` seconds to the span `name`."""
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [duration, 1]
+        else:
+            entry[0] += duration
+            entry[1] += 1
+
+    def header(self, total=None):
+        """Return the Server-Timing header value for the spans.
+
+        Parameters
+        ----------
+        total : float, optional
+            The total duration of the request, in seconds, added as the
+            'total' metric if used.
+        """
+        metrics = ['{};dur={:.2f}'.format(name, duration * 1000)
+                   for name, (duration, count) in self.spans.items()]
+        if total is not None:
+            metrics.append('total;dur={:.2f}'.format(total * 1000))
+
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        """Return a JSON serialisable dict of {name : {'ms', 'calls'}}."""
+        return {name : {'ms' : round(duration * 1000, 3), 'calls' : count}
+                for name, (duration, count) in self.spans.items()}
+
+
+@contextlib.contextmanager
+def span(name):
+    """Record the time spent in the enclosed block as the span `name`.
+
+    Can be used as a context manager or a decorator. Nothing is recorded
+    unless a request is being timed by the ServerTimingMiddleware.
+
+    Examples
+    --------
+    >>> with span('render'):
+    ...     response = render(request, template, context)
+
+    >>> @span('read')
+    ... def _read_data_file(data_obj):
+    ...     ...
+    """
+    timings = getattr(_LOCAL, 'timings', None)
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class ServerTimingMiddleware(object):
+    """Add a Server-Timing header with the time spent in each span.
+
+    The header contains the total time spent in each of the spans recorded
+    with `span` while handling the request (such as 'db', 'navigation',
+    'read', 'interpolate' and 'render') as well as the 'total' time, and can
+    be seen in the browser's developer tools. If the PDBOOK_TIMING_LOG setting
+    is True then the timings are also logged to the 'pdbook.timing' logger.
+
+    Staff users can add the PDBOOK_PROFILE_PARAM query parameter (default
+    'profile') to a request to download a cProfile of the request instead of
+    the response. Requires the authentication middleware for the profile to be
+    available.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self._profile_requested(request):
+            return self._profile(request)
+
+        timings = Timings()
+        _LOCAL.timings = timings
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _LOCAL.timings = None
+
+        total = time.perf_counter() - start
+        response['Server-Timing'] = timings.header(total)
+
+        if getattr(settings, 'PDBOOK_TIMING_LOG', False):
+            logger.info(
+                '%s %s %s %.2fms', request.method, request.path,
+                response.status_code, total * 1000,
+                extra={'method' : request.method,
+                       'path' : request.path,
+                       'status' : response.status_code,
+                       'total_ms' : round(total * 1000, 3),
+                       'spans' : timings.as_dict()}
+            )
+
+        return response
+
+    def _profile_requested(self, request):
+        """Return True if a profile of `request` is wanted and allowed."""
+        param = getattr(settings, 'PDBOOK_PROFILE_PARAM', 'profile')
+        if not param or param not in request.GET:
+            return False
+
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_active and user.is_staff)
+
+    def _profile(self, request):
+        """Return a HttpResponse with the cProfile stats for `request`.
+
+        The stats are in the same format as written by `pstats.Stats.dump_stats`
+        and can be loaded with `pstats.Stats` or a viewer such as snakeviz.
+        """
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            self.get_response(request)
+        finally:
+            profiler.disable()
+
+        profiler.create_stats()
+
+        response = HttpResponse(marshal.dumps(profiler.stats),
+                                content_type='application/octet-stream')
+        name = request.path.strip('/').replace('/', '-') or 'index'
+        response['Content-Disposition'] = 'attachment; filename="{}.prof"'.format(name)
+
+        return response
@@ -1,16 +1,38 @@
 from django.conf.urls import url
 
-from . import views
+from . import api, metrics, views
 
 urlpatterns = [
+    # JSON API, must come before the pages so 'api' isn't taken as a slug
+    #   (Machine names giving the slugs in RESERVED_SLUGS are rejected)
+    # ex: /pdb/api
+    url(r'^api$', api.machines, name='api_machines'),
+    # ex: /pdb/api/search?q=wedge
+    url(r'^api/search$', api.search, name='api_search'),
+    # ex: /pdb/api/test-machine
+    url(r'^api/(?P<machine_slug>[-\w]+)$', api.machine, name='api_machine'),
+    # ex: /pdb/api/test-machine/06-mv-photons
+    url(r'^api/(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)$', api.beam, name='api_beam'),
+    # ex: /pdb/api/test-machine/06-mv-photons/pdd
+    url(r'^api/(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)/(?P<data_slug>[-\w]+)$', api.data, name='api_data'),
+    # ex: /pdb/metrics
+    url(r'^metrics$', metrics.metrics, name='metrics'),
     # ex: /pdb
     url(r'^$', views.index, name='index'),
     # ex: /pdb/test-machine
     url(r'^(?P<machine_slug>[-\w]+)$', views.get_machine, name='machine'),
     # ex: /pdb/test-machine/06-mv-photons
     url(r'^(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)$', views.get_beam, name='beam'),
+    # ex: /pdb/test-machine/06-mv-photons.zip
+    url(r'^(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)\.zip$', views.download_beam, name='download_beam'),
     # ex: /pdb/test-machine/06-mv-photons/pdd
     url(r'^(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)/(?P<data_slug>[-\w]+)$', views.get_data, name='data'),
+    # ex: /pdb/test-machine/06-mv-photons/pdd/rows?start=100&stop=200
+    url(r'^(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)/(?P<data_slug>[-\w]+)/rows$', views.get_rows, name='data_rows'),
     # ex: /pdb/test-machine/06-mv-photons/pdd/interpolate
     url(r'^(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)/(?P<data_slug>[-\w]+)/interpolate$', views.interpolate, name='interpolate'),
+    # ex: /pdb/test-machine/06-mv-photons/pdd/interpolate/batch
+    url(r'^(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)/(?P<data_slug>[-\w]+)/interpolate/batch$', views.interpolate_batch, name='interpolate_batch'),
+    # ex: /pdb/test-machine/06-mv-photons/pdd/interpolate/inverse
+    url(r'^(?P<machine_slug>[-\w]+)/(?P<beam_slug>[-\w]+)/(?P<data_slug>[-\w]+)/interpolate/inverse$', views.interpolate_inverse, name='interpolate_inverse'),
 ]
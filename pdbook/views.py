@@ -1,16 +1,43 @@
 import codecs
+import copy
 import csv
-from heapq import nsmallest
+import hashlib
+import io
 import json
 import re
-
-from django.http import HttpResponse
+import time
+import zipfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+)
 from django.shortcuts import render, render_to_response, get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
 
 import numpy
-from scipy.interpolate import interp1d, interp2d
 
-from pdbook.models import Machine, Beam, Data
+from pdbook.cache import table_cache
+from pdbook.interpolation import (
+    INTERPOLATORS, METHODS, InterpolationBusy, Interpolator1D, Interpolator2D,
+    interpolation_executor, interpolator_registry, neighbours
+)
+from pdbook.metrics import metrics_registry
+from pdbook.models import Data, DataTable
+from pdbook.navigation import get_navigation
+from pdbook.storage import content_hash
+from pdbook.timing import span
+
+
+# New style float formats such as '{:.2f}' or '{:+.3e} cm' which can be
+#   converted to printf-style formats
+_PRINTF_FORMAT = re.compile(
+    r'^([^{}\n]*)\{0?:([+\- ]?#?0?\d*(?:\.\d+)?[eEfFgG])\}([^{}\n]*)$'
+)
 
 
 def index(request):
@@ -24,6 +51,10 @@ def index(request):
     Returns
     -------
     response : HttpResponse
+
+    Notes
+    -----
+    Query budget: 0 (3 if the navigation tree isn't cached).
     """
     machine_list = _get_machines()
 
@@ -32,7 +63,8 @@ def index(request):
     if machine_list:
         context = {'machine_list' : machine_list}
 
-    return render(request, 'pdbook/index.html', context)
+    with span('render'):
+        return render(request, 'pdbook/index.html', context)
 
 def get_machine(request, machine_slug):
     """Return a page with the available Beams for the selected Machine
@@ -47,8 +79,12 @@ def get_machine(request, machine_slug):
     Returns
     -------
     response : HttpResponse
+
+    Notes
+    -----
+    Query budget: 0 (3 if the navigation tree isn't cached).
     """
-    m = get_object_or_404(Machine, slug=machine_slug)
+    m = get_navigation().get_machine(machine_slug)
 
     machine_list = _get_machines()
     beam_list = _get_beams(m)
@@ -59,7 +95,8 @@ def get_machine(request, machine_slug):
     if beam_list:
         context['beam_list'] = beam_list
 
-    return render(request, 'pdbook/index.html', context)
+    with span('render'):
+        return render(request, 'pdbook/index.html', context)
 
 def get_beam(request, machine_slug, beam_slug):
     """Return a page with the available Data for the selected Beam
@@ -76,9 +113,13 @@ def get_beam(request, machine_slug, beam_slug):
     Returns
     -------
     response : HttpResponse
+
+    Notes
+    -----
+    Query budget: 0 (3 if the navigation tree isn't cached).
     """
-    m = get_object_or_404(Machine, slug=machine_slug)
-    b = get_object_or_404(Beam, slug=beam_slug, machine=m)
+    b = _get_beam_or_404(machine_slug, beam_slug)
+    m = b.machine
 
     machine_list = _get_machines()
     beam_list = _get_beams(m)
@@ -92,7 +133,48 @@ def get_beam(request, machine_slug, beam_slug):
     if data_list:
         context['data_list'] = data_list
 
-    return render(request, 'pdbook/index.html', context)
+    with span('render'):
+        return render(request, 'pdbook/index.html', context)
+
+@require_safe
+def download_beam(request, machine_slug, beam_slug):
+    """Return a ZIP file containing all the data for the selected Beam.
+
+    The ZIP file contains the CSV file for each of the Beam's Data, named
+    after the Data's slug, and a single NumPy .npz file named after the
+    Beam's slug with the numeric 'values', 'x_values' and 'y_values' arrays
+    for each table as '<data slug>/values' etc. The file is generated while
+    it's being sent, each CSV file is sent once it's added and only the
+    compressed .npz file is kept in memory until the end.
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The request
+    machine_slug :str
+        The slug for the selected Machine object
+    beam_slug : str
+        The slug for the selected Beam object
+
+    Returns
+    -------
+    response : StreamingHttpResponse
+
+    Notes
+    -----
+    Query budget: 1 (the Beam's Data with their stored tables), plus 3 if the
+    navigation tree isn't cached.
+    """
+    b = _get_beam_or_404(machine_slug, beam_slug)
+    data_list = Data.objects.filter(beam=b).select_related('beam__machine', 'table')
+    data_list = list(data_list.order_by('name'))
+
+    response = StreamingHttpResponse(_stream_beam_zip(b, data_list),
+                                     content_type='application/zip')
+    filename = '{}-{}.zip'.format(b.machine.slug, b.slug)
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+
+    return response
 
 def get_data(request, machine_slug, beam_slug, data_slug):
     """Return a page with the table data for the selected Data.
@@ -176,10 +258,21 @@ def get_data(request, machine_slug, beam_slug, data_slug):
     Returns
     -------
     response : HttpResponse
+
+    Notes
+    -----
+    Query budget: 1 (the selected Data with its Beam, Machine and stored
+    table), plus 3 if the navigation tree isn't cached. The data file isn't
+    read.
+
+    Tables with more than PDBOOK_TABLE_WINDOW_ROWS rows (default 100, no more
+    than PDBOOK_TABLE_WINDOW_LIMIT) only include the first rows, the rest are fetched from the `get_rows` view as
+    the table is scrolled. The interpolation payload isn't included for these
+    tables so the size of the page doesn't depend on the size of the table.
     """
-    m = get_object_or_404(Machine, slug=machine_slug)
-    b = get_object_or_404(Beam, slug=beam_slug, machine=m)
-    d = get_object_or_404(Data, slug=data_slug, beam=b)
+    d = _get_data_or_404(machine_slug, beam_slug, data_slug)
+    b = d.beam
+    m = b.machine
 
     machine_list = _get_machines()
     beam_list = _get_beams(m)
@@ -198,10 +291,109 @@ def get_data(request, machine_slug, beam_slug, data_slug):
     try:
         table_data = _read_data_file(d)
         context.update(table_data)
+        window = _table_window()[0]
+        if window is not None and len(table_data['table_data']) > window:
+            context['table_html'] = _render_table(d, table_data, window)
+            context['n_rows'] = len(table_data['table_data'])
+            context['window_rows'] = window
+        else:
+            context['table_html'] = _render_table(d, table_data)
+            context['interpolation_payload'] = _interpolation_payload(d, table_data)
     except Exception as ex:
         context['error_message'] = 'There was an error reading the data file'
 
-    return render(request, 'pdbook/index.html', context)
+    with span('render'):
+        return render(request, 'pdbook/index.html', context)
+
+@require_safe
+def get_rows(request, machine_slug, beam_slug, data_slug):
+    """Return a window of the formatted table rows for the selected Data.
+
+    The query string may contain:
+        'start' : int, optional, the index of the first row, default 0.
+        'stop' : int, optional, the index after the last row, default
+            'start' plus PDBOOK_TABLE_WINDOW_ROWS (default 100, no more than
+            PDBOOK_TABLE_WINDOW_LIMIT), or plus PDBOOK_TABLE_WINDOW_LIMIT if
+            that's None.
+        'columns' : str, optional, the comma separated indices of the
+            columns to include, default all. The first column is the row
+            labels.
+
+    The rows are clipped to the table and no more than
+    PDBOOK_TABLE_WINDOW_LIMIT rows (default 1000) may be requested at once.
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The request
+    machine_slug :str
+        The slug for the selected Machine object
+    beam_slug : str
+        The slug for the selected Beam object
+    data_slug : str
+        The slug for the selected Data object
+
+    Returns
+    -------
+    HttpResponse
+        The JSON encoded rows with keys 'start', 'stop', 'n_rows',
+        'n_columns', 'columns' (the sorted column indices), 'column_labels'
+        (the labels of the columns, null if unlabelled) and 'rows'. If the
+        request is invalid then a HttpResponseBadRequest with the key 'error'.
+
+    Notes
+    -----
+    Query budget: 1 (the selected Data with its Beam, Machine and stored
+    table). Only the requested rows and columns are formatted.
+    """
+    d = _get_data_or_404(machine_slug, beam_slug, data_slug)
+
+    try:
+        table = _read_data_file(d)
+        if isinstance(table, str):
+            raise ValueError(table)
+    except Exception:
+        return HttpResponse(json.dumps({'error' : 'There was an error reading the data file'}),
+                            content_type="application/json", status=500)
+
+    window, limit = _table_window()
+    window = window or limit
+    try:
+        start = int(request.GET.get('start', 0))
+        stop = int(request.GET.get('stop', start + window))
+        columns = None
+        if request.GET.get('columns'):
+            columns = sorted(set(int(val) for val in request.GET['columns'].split(',')))
+    except ValueError:
+        return _bad_request("'start', 'stop' and 'columns' must be integers")
+
+    if start < 0 or stop < start:
+        return _bad_request("'start' must be positive and no more than 'stop'")
+
+    if stop - start > limit:
+        return _bad_request('No more than {} rows may be requested '
+                            'per request'.format(limit))
+
+    rows = table['table_data']
+    n_columns = rows.n_columns
+    if columns is None:
+        columns = list(range(n_columns))
+    elif columns[0] < 0 or columns[-1] >= n_columns:
+        return _bad_request('The table has {} columns'.format(n_columns))
+
+    stop = min(stop, len(rows))
+    start = min(start, stop)
+    labels = table['column_labels']
+    result = {'start' : start,
+              'stop' : stop,
+              'n_rows' : len(rows),
+              'n_columns' : n_columns,
+              'columns' : columns,
+              'column_labels' : [labels[ii] if ii < len(labels) else None
+                                 for ii in columns],
+              'rows' : rows.window(start, stop, columns)}
+
+    return HttpResponse(json.dumps(result), content_type="application/json")
 
 def interpolate(request, machine_slug, beam_slug, data_slug):
     """Returns the results from the interpolation widget
@@ -223,46 +415,519 @@ def interpolate(request, machine_slug, beam_slug, data_slug):
         The result of the interpolation. For 1D keys are 'x_value_ok',
         'table_type', 'y_values', 'table_data'.
         For 2D keys are 'y_value_ok', 'x_value_ok', 'table_type', 'x_values',
-        'y_values', 'table_data'.
+        'y_values', 'table_data'. If the table can't be interpolated with
+        the interpolation type then a HttpResponseBadRequest with the key
+        'error', or if the interpolation executor is busy then a 503 response
+        with a Retry-After header.
+
+    Notes
+    -----
+    Query budget: 1 (the selected Data with its Beam, Machine and stored
+    table).
+
+    The table is always interpolated at the exact X and Y values. When the
+    values are given at no more than the precision of the table's X_FORMAT
+    and Y_FORMAT (such as values typed from the table) the results are kept
+    in the interpolation result cache, so repeated lookups of the same
+    values don't interpolate the table again.
     """
-    m = get_object_or_404(Machine, slug=machine_slug)
-    b = get_object_or_404(Beam, slug=beam_slug, machine=m)
-    d = get_object_or_404(Data, slug=data_slug, beam=b)
+    d = _get_data_or_404(machine_slug, beam_slug, data_slug)
 
     data = _read_data_file(d)
+    revision = _data_file_key(d)
 
-    if request.POST['interp_type'] == '1D':
-        y = None
-        if 'y_value' in request.POST.keys() and request.POST['y_value']:
-            y = float(request.POST['y_value'])
+    x = None
+    if 'x_value' in request.POST.keys() and request.POST['x_value']:
+        x = float(request.POST['x_value'])
 
-        result = _do_interpolate_1d(y, data)
-    elif request.POST['interp_type'] == '2D':
-        x = None
-        if 'x_value' in request.POST.keys() and request.POST['x_value']:
-            x = float(request.POST['x_value'])
+    y = None
+    if 'y_value' in request.POST.keys() and request.POST['y_value']:
+        y = float(request.POST['y_value'])
+
+    interp_type = request.POST['interp_type']
+    if interp_type not in ('1D', '2D'):
+        raise Http404('No such interpolation type')
 
-        y = None
-        if 'y_value' in request.POST.keys() and request.POST['y_value']:
-            y = float(request.POST['y_value'])
+    reason = _check_interpolation(d, data, interp_type)
+    if reason is not None:
+        return _bad_request(reason)
+
+    # The X value isn't used by 1D interpolation
+    if interp_type == '1D':
+        x = None
 
-        result = _do_interpolate_2d(x, y, data)
+    # Only values at the display precision are cached, which keeps the number
+    #   of distinct keys bounded, the results are for the exact values
+    cache = None
+    content = None
+    if x == _quantize(data['x_format'], x) and y == _quantize(data['y_format'], y):
+        cache = _interpolation_cache()
+        key = _interpolation_cache_key(revision[1], interp_type,
+                                       d.interpolation_method, x, y)
+        content = cache.get(key)
+        metrics_registry().count_interpolation_cache(content is not None)
+
+    if content is None:
+        try:
+            result = _run_interpolation(_interpolate_table, d.pk, interp_type,
+                                        d.interpolation_method, revision, data, x, y)
+        except InterpolationBusy:
+            return _busy()
+
+        if cache is not None:
+            timeout = getattr(settings, 'PDBOOK_INTERPOLATION_CACHE_TIMEOUT', 86400)
+            cache.set(key, result.content, timeout)
     else:
-        result = Http404('No such interpolation type')
+        result = HttpResponse(content, content_type="application/json")
+
+    metrics_registry().count_interpolations(interp_type)
 
     return result
 
+@csrf_exempt
+@require_POST
+def interpolate_batch(request, machine_slug, beam_slug, data_slug):
+    """Returns the results from interpolating the table at many points.
+
+    The request body should be JSON encoded with the keys:
+        'interp_type' : '1D' or '2D', optional, defaults to the Data's
+            interpolation type.
+        'method' : 'LINEAR', 'PCHIP' or 'CUBIC', optional, defaults to the
+            Data's interpolation method.
+        'y_values' : list of float, the Y values to interpolate at.
+        'x_values' : list of float, required for 2D interpolation. The X
+            values to interpolate at, must be the same length as 'y_values'.
+
+    The number of points per request is limited by the
+    PDBOOK_BATCH_INTERPOLATION_LIMIT setting (default 5000). The view doesn't
+    change any data so it's exempt from CSRF protection to allow it to be
+    used by scripts.
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The interpolation request
+    machine_slug :str
+        The slug for the selected Machine object
+    beam_slug : str
+        The slug for the selected Beam object
+    data_slug : str
+        The slug for the selected Data object to be interpolated
+
+    Returns
+    -------
+    HttpResponse
+        The JSON encoded results with keys 'table_type', 'values' (the
+        interpolated values, null where out of range) and 'table_data' (the
+        formatted values, null where out of range). If the request is invalid
+        then a HttpResponseBadRequest with the key 'error', or a 503 response
+        if the interpolation executor is busy.
+
+    Notes
+    -----
+    Query budget: 1 (the selected Data with its Beam, Machine and stored
+    table).
+    """
+    d = _get_data_or_404(machine_slug, beam_slug, data_slug)
+
+    try:
+        body = json.loads(request.body.decode('utf-8'))
+        interp_type = body.get('interp_type', d.interpolation_type)
+        method = body.get('method', d.interpolation_method)
+        y = numpy.asarray(body['y_values'], dtype=numpy.float64)
+        x = None
+        if interp_type == '2D':
+            x = numpy.asarray(body['x_values'], dtype=numpy.float64)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return _bad_request('The request must be JSON containing the '
+                            'interpolation values')
+
+    if interp_type not in INTERPOLATORS:
+        return _bad_request('No such interpolation type')
+
+    if method not in METHODS:
+        return _bad_request('No such interpolation method')
+
+    if y.ndim != 1 or (x is not None and x.shape != y.shape):
+        return _bad_request('The X and Y values must be lists of equal length')
+
+    limit = getattr(settings, 'PDBOOK_BATCH_INTERPOLATION_LIMIT', 5000)
+    if len(y) > limit:
+        return _bad_request('No more than {} values may be interpolated '
+                            'per request'.format(limit))
+
+    data = _read_data_file(d)
+    reason = _check_interpolation(d, data, interp_type)
+    if reason is not None:
+        return _bad_request(reason)
+
+    try:
+        values = _run_interpolation(_interpolate_points, d.pk, interp_type, method,
+                                    _data_file_key(d), data, x, y)
+    except InterpolationBusy:
+        return _busy()
+
+    metrics_registry().count_interpolations(interp_type, len(y))
+
+    values = [None if numpy.isnan(val) else val for val in values.tolist()]
+    result = {'table_type' : interp_type,
+              'values' : values,
+              'table_data' : [None if val is None else data['xy_format'].format(val)
+                              for val in values]}
+
+    return HttpResponse(json.dumps(result), content_type="application/json")
+
+@csrf_exempt
+@require_POST
+def interpolate_inverse(request, machine_slug, beam_slug, data_slug):
+    """Returns the parameter values at which the table has a given value.
+
+    For example, the depths at which a PDD falls to 50%. The request body
+    should be JSON encoded with the keys:
+        'value' : float, the table value to solve for.
+        'interp_type' : '1D' or '2D', optional, defaults to the Data's
+            interpolation type.
+        'method' : 'LINEAR', 'PCHIP' or 'CUBIC', optional, defaults to the
+            Data's interpolation method.
+        'x_value' : float, for 2D interpolation only. Solve for the Y values
+            along the table column at this X value.
+        'y_value' : float, for 2D interpolation only. Solve for the X values
+            along the table row at this Y value.
+    For 2D interpolation exactly one of 'x_value' or 'y_value' is required.
+
+    Parameters
+    ----------
+    request : django.core.handlers.wsgi.WSGIRequest
+        The interpolation request
+    machine_slug :str
+        The slug for the selected Machine object
+    beam_slug : str
+        The slug for the selected Beam object
+    data_slug : str
+        The slug for the selected Data object to be interpolated
+
+    Returns
+    -------
+    HttpResponse
+        The JSON encoded results with keys 'table_type', 'solve_for' ('x' or
+        'y'), 'values' (every solution within the table, in increasing
+        order) and 'table_data' (the solutions formatted with the X or Y
+        format). If the request is invalid then a HttpResponseBadRequest
+        with the key 'error', or a 503 response if the interpolation executor
+        is busy.
+
+    Notes
+    -----
+    Query budget: 1 (the selected Data with its Beam, Machine and stored
+    table).
+    """
+    d = _get_data_or_404(machine_slug, beam_slug, data_slug)
+
+    try:
+        body = json.loads(request.body.decode('utf-8'))
+        interp_type = body.get('interp_type', d.interpolation_type)
+        method = body.get('method', d.interpolation_method)
+        value = float(body['value'])
+        x = body.get('x_value')
+        y = body.get('y_value')
+        x = None if x is None else float(x)
+        y = None if y is None else float(y)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return _bad_request('The request must be JSON containing the table '
+                            'value to solve for')
+
+    if interp_type not in INTERPOLATORS:
+        return _bad_request('No such interpolation type')
+
+    if method not in METHODS:
+        return _bad_request('No such interpolation method')
+
+    if interp_type == '2D' and (x is None) == (y is None):
+        return _bad_request('One of the X or Y values is required')
+
+    data = _read_data_file(d)
+    reason = _check_interpolation(d, data, interp_type)
+    if reason is not None:
+        return _bad_request(reason)
+
+    # The fixed value must be within the table, it isn't extrapolated
+    if interp_type == '2D':
+        name, keyword, fixed = ('X', 'x_values', x) if y is None else ('Y', 'y_values', y)
+        axis = numpy.asarray(data[keyword], dtype=numpy.float64)
+        if not axis[0] <= fixed <= axis[-1]:
+            return _bad_request('The {} value is outside the table'.format(name))
+
+    try:
+        solutions = _run_interpolation(_solve_table, d.pk, interp_type, method,
+                                       _data_file_key(d), data, x, y, value)
+    except InterpolationBusy:
+        return _busy()
+
+    metrics_registry().count_interpolations(interp_type)
+
+    solve_for = 'x' if interp_type == '2D' and x is None else 'y'
+    fmt = data['x_format'] if solve_for == 'x' else data['y_format']
+    result = {'table_type' : interp_type,
+              'solve_for' : solve_for,
+              'values' : solutions,
+              'table_data' : [fmt.format(val) for val in solutions]}
+
+    return HttpResponse(json.dumps(result), content_type="application/json")
+
+def _interpolate_table(pk, interp_type, method, revision, data, x, y):
+    """Return the HttpResponse from interpolating the table at (`x`, `y`).
+
+    `x` is ignored for 1D interpolation. Uses the interpolator from the
+    registry, building it if necessary.
+    """
+    interp_func = interpolator_registry().get(pk, interp_type, revision, data, method)
+    if interp_type == '1D':
+        return _do_interpolate_1d(y, data, interp_func)
+
+    return _do_interpolate_2d(x, y, data, interp_func)
+
+def _interpolate_points(pk, interp_type, method, revision, data, x, y):
+    """Return a numpy.ndarray of the table interpolated at each of the points.
+
+    `x` is ignored for 1D interpolation. Points out of range are NaN.
+    """
+    interp_func = interpolator_registry().get(pk, interp_type, revision, data, method)
+    if interp_type == '1D':
+        return interp_func.points(y)
+
+    return interp_func.points(x, y)
+
+def _run_interpolation(func, *args):
+    """Return the result of `func(*args)` run in the interpolation executor.
+
+    The request's thread waits for the result. The interpolation is done in
+    a bounded thread pool so that when it's saturated further requests are
+    rejected straight away rather than queueing. Raises InterpolationBusy if
+    the pool's queue is full or the result isn't ready within
+    PDBOOK_INTERPOLATION_TIMEOUT seconds (default 10). An interpolation that
+    times out after starting isn't stopped, it keeps its pool thread until
+    it finishes.
+    """
+    timeout = getattr(settings, 'PDBOOK_INTERPOLATION_TIMEOUT', 10)
+    with span('interpolate'):
+        return interpolation_executor().run(func, *args, timeout=timeout)
+
+def _quantize(fmt, value):
+    """Return `value` rounded to the precision it's displayed with by `fmt`.
+
+    Only formats with an equivalent printf-style format (such as '{:.2f}')
+    have a precision, for other formats `value` is returned unchanged. Used to
+    decide whether an interpolation result can be cached, `value` itself is
+    always used for the interpolation.
+
+    Parameters
+    ----------
+    fmt : str
+        A python new style formatting string, such as '{:.2f}'.
+    value : float or None
+        The value to round.
+
+    Returns
+    -------
+    float or None
+    """
+    match = _PRINTF_FORMAT.match(fmt)
+    if value is None or not match:
+        return value
+
+    return float(('%' + match.group(2)) % value)
+
+def _interpolation_cache():
+    """Return the cache used to store the interpolation results."""
+    return caches[getattr(settings, 'PDBOOK_INTERPOLATION_CACHE', 'default')]
+
+def _interpolation_cache_key(sha256, interp_type, method, x, y):
+    """Return the interpolation result cache key for the (`x`, `y`) lookup.
+
+    The key uses the SHA-256 of the table file rather than the Data so that
+    uploading a new table never returns results from the old one.
+    """
+    return 'pdbook:interpolate:{}:{}:{}:{!r}:{!r}'.format(sha256, interp_type,
+                                                          method, x, y)
+
+def _busy():
+    """Return a 503 HttpResponse for when the interpolation executor is busy.
+
+    Timed out interpolations may still be running, so the executor can stay
+    busy for longer than the Retry-After delay.
+    """
+    msg = ('The server is busy or the interpolation timed out (it may still '
+           'be running), please try again later')
+    response = HttpResponse(json.dumps({'error' : msg}),
+                            content_type="application/json", status=503)
+    response['Retry-After'] = '1'
+
+    return response
+
+class _ZipStream(object):
+    """A write-only file object that keeps what's written until it's taken.
+
+    Provides `tell` as ZipFile needs it to write to a stream before Python
+    3.5.
+    """
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def take(self):
+        """Return and remove everything written so far."""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _stream_beam_zip(beam, data_list):
+    """Yield the contents of the ZIP file for `beam`, see `download_beam`.
+
+    Tables that can't be read are left out of the .npz file and Data
+    without an uploaded file are skipped. Each member is added whole with
+    `ZipFile.writestr` as `ZipFile.open` can't write before Python 3.6.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for d in data_list:
+            if not d.data:
+                continue
+
+            try:
+                with open(d.data.path, 'rb') as src:
+                    content = src.read()
+            except (IOError, OSError):
+                continue
+
+            zf.writestr('{}.csv'.format(d.slug), content)
+            yield stream.take()
+
+        npz_file = io.BytesIO()
+        with zipfile.ZipFile(npz_file, 'w', zipfile.ZIP_DEFLATED) as npz:
+            for d in data_list:
+                for name, values in _table_arrays(d):
+                    array_file = io.BytesIO()
+                    numpy.lib.format.write_array(array_file, values)
+                    npz.writestr('{}/{}.npy'.format(d.slug, name), array_file.getvalue())
+
+        # The arrays are compressed within the .npz so it's stored as is
+        info = zipfile.ZipInfo('{}.npz'.format(beam.slug), time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        zf.writestr(info, npz_file.getvalue())
+
+    yield stream.take()
+
+def _table_arrays(data_obj):
+    """Return a list of (name, numpy.ndarray) for the numeric arrays of a table.
+
+    The names are 'values', 'x_values' and 'y_values', the X and Y values
+    are only included if numeric and the list is empty if the table can't be
+    read or isn't numeric.
+    """
+    if not data_obj.data:
+        return []
+
+    try:
+        table = _read_data_file(data_obj)
+    except Exception:
+        return []
+
+    if isinstance(table, str) or table['xy_array'] is None:
+        return []
+
+    arrays = [('values', table['xy_array'])]
+    for name in ('x_values', 'y_values'):
+        try:
+            arrays.append((name, numpy.asarray(table[name], dtype=numpy.float64)))
+        except (TypeError, ValueError):
+            continue
+
+    return arrays
+
+def _solve_table(pk, interp_type, method, revision, data, x, y, value):
+    """Return a list of the solutions where the interpolated table is `value`.
+
+    For 1D interpolation solves for Y. For 2D interpolation solves for Y
+    along the column at `x` or for X along the row at `y`.
+    """
+    interp_func = interpolator_registry().get(pk, interp_type, revision, data, method)
+    if interp_type == '1D':
+        return interp_func.solve(value)
+
+    if x is not None:
+        return interp_func.solve_y(x, value)
+
+    return interp_func.solve_x(y, value)
+
+def _check_interpolation(data_obj, data, interp_type):
+    """Return the reason the table can't be interpolated with `interp_type`.
+
+    Only the Data's configured interpolation type (or 1D for a 2D table) is
+    allowed, since that's the type the table was validated for.
+
+    Parameters
+    ----------
+    data_obj : pdbook.models.Data
+    data : dict or str
+        The table data, as returned by `_read_data_file`.
+    interp_type : str
+        The requested interpolation type.
+
+    Returns
+    -------
+    str or None
+        The reason the table can't be interpolated, or None if it can.
+    """
+    if isinstance(data, str):
+        return data
+
+    allowed = {'1D' : ('1D',), '2D' : ('1D', '2D')}.get(data_obj.interpolation_type, ())
+    if interp_type not in allowed or data['xy_array'] is None:
+        return "The table can't be interpolated with {} interpolation".format(interp_type)
+
+    return None
+
+def _bad_request(msg):
+    """Return a HttpResponseBadRequest with the JSON encoded error `msg`."""
+    return HttpResponseBadRequest(json.dumps({'error' : msg}),
+                                  content_type="application/json")
+
+def _get_beam_or_404(machine_slug, beam_slug):
+    """Return the Beam for the slugs, with its Machine, from the navigation tree"""
+    return get_navigation().get_beam(machine_slug, beam_slug)
+
+@span('db')
+def _get_data_or_404(machine_slug, beam_slug, data_slug):
+    """Return the Data for the slugs, with its Beam, Machine and DataTable, using a single query"""
+    data = Data.objects.select_related('beam__machine', 'table')
+    return get_object_or_404(data,
+                             slug=data_slug,
+                             beam__slug=beam_slug,
+                             beam__machine__slug=machine_slug)
+
 def _get_machines():
     """Return a list of Machine model objects, sorted by name"""
-    return Machine.objects.order_by('-name')[:].reverse()
+    return get_navigation().machines
 
 def _get_beams(machine):
     """Return a list of Beam model objects for Machine `machine`, sorted by modality and name"""
-    return Beam.objects.filter(machine=machine).order_by('modality', '-name')[:].reverse()
+    return get_navigation().beams_for(machine)
 
 def _get_data(beam):
     """Return a list of Data model objects for Beam `beam`, sorted by name"""
-    return Data.objects.filter(beam=beam).order_by('-name')[:].reverse()
+    return get_navigation().data_for(beam)
 
 def _parse_csv_row(row):
     """Parse the CSV row, returning variables and values.
@@ -315,14 +980,323 @@ def _skip_csv_comments(rows, commentchar='#'):
     list of str
         The CSV row contents without comments.
     """
-    pattern = re.compile(r'\s*{}.*$'.format(commentchar))
     for row in rows:
-        row = re.sub(pattern, '', row).strip()
+        row = row.partition(commentchar)[0].strip()
         if row:
             yield row
 
+def _data_file_key(data_obj):
+    """Return a key identifying the current revision of `data_obj`'s file.
+
+    Parameters
+    ----------
+    data_obj : pdbook.models.Data
+        The Data object with the uploaded data file.
+
+    Returns
+    -------
+    tuple
+        The (primary key, SHA-256 of the file contents) of the data file.
+
+    Raises
+    ------
+    ValueError
+        If the data file can't be parsed.
+    """
+    return (data_obj.pk, _data_file_hash(data_obj))
+
+def _data_file_hash(data_obj):
+    """Return the SHA-256 hex digest of `data_obj`'s file contents.
+
+    Files stored by ContentAddressedStorage are named by their SHA-256 so the
+    hash is taken from the name, otherwise it's taken from the stored table.
+
+    Raises
+    ------
+    ValueError
+        If the data file can't be parsed.
+    """
+    sha256 = content_hash(data_obj.data.name)
+    if sha256 is None:
+        sha256 = _get_table(data_obj).sha256
+
+    return sha256
+
+def _get_table(data_obj):
+    """Return the DataTable for `data_obj`, storing it first if required.
+
+    The DataTable is normally stored when the Data is saved, but Data saved
+    before the DataTable was added won't have one.
+
+    Parameters
+    ----------
+    data_obj : pdbook.models.Data
+
+    Returns
+    -------
+    pdbook.models.DataTable
+
+    Raises
+    ------
+    ValueError
+        If the data file can't be parsed.
+    """
+    try:
+        return data_obj.table
+    except DataTable.DoesNotExist:
+        return _store_table(data_obj)
+
+def _store_table(data_obj):
+    """Parse `data_obj`'s file and store the result as its DataTable.
+
+    Parameters
+    ----------
+    data_obj : pdbook.models.Data
+
+    Returns
+    -------
+    pdbook.models.DataTable
+
+    Raises
+    ------
+    ValueError
+        If the data file can't be parsed.
+    """
+    if not data_obj.data:
+        raise ValueError('No data file has been uploaded')
+
+    with open(data_obj.data.path, 'rb') as f:
+        content = f.read()
+
+    parsed = _parse_csv_content(content)
+    error = _check_table(parsed)
+    if error:
+        raise ValueError(error)
+
+    table_obj = DataTable(data=data_obj, sha256=hashlib.sha256(content).hexdigest())
+    table_obj.set_parsed(parsed)
+    table_obj.save()
+    data_obj.table = table_obj
+
+    return table_obj
+
+def _check_table(data, interpolation_type='NA'):
+    """Return the reason why the parsed data file `data` is invalid.
+
+    Parameters
+    ----------
+    data : dict or str
+        The parsed data file, as returned by `_parse_csv_file`.
+    interpolation_type : str, optional
+        The Data's interpolation type. If '1D' or '2D' then the table must
+        also be a rectangular NUMERIC table with increasing numeric Y values
+        for each row (and X values for each column if '2D').
+
+    Returns
+    -------
+    str or None
+        The reason the file is invalid, or None if it's valid.
+    """
+    if isinstance(data, str):
+        return data
+
+    table = _format_table(copy.deepcopy(data))
+    if isinstance(table, str):
+        return table
+
+    if interpolation_type not in ('1D', '2D'):
+        return None
+
+    xy_array = table['xy_array']
+    if xy_array is None:
+        return ('Interpolation requires a NUMERIC table with the same number '
+                'of values in each row')
+
+    axes = [('Y_VALUES', table['y_values'], xy_array.shape[0], 'rows')]
+    if interpolation_type == '2D':
+        axes.append(('X_VALUES', table['x_values'], xy_array.shape[1], 'columns'))
+
+    for keyword, values, size, name in axes:
+        try:
+            values = numpy.asarray([float(val) for val in values])
+        except (TypeError, ValueError):
+            return '{} must be numeric for interpolation'.format(keyword)
+
+        if len(values) != size or size < 2:
+            return ('{} must have a value for each of the table {} (at least '
+                    'two) for interpolation'.format(keyword, name))
+
+        if numpy.any(numpy.diff(values) <= 0):
+            return '{} must be increasing for interpolation'.format(keyword)
+
+    return None
+
+@span('read')
 def _read_data_file(data_obj):
-    """Parse the uploaded data file for the contents
+    """Return the table data for `data_obj`, using the table cache if possible.
+
+    The table is taken from the Data's DataTable rather than the data file
+    and is cached by the SHA-256 of the file (and the Data's `show_y_values`
+    flag), so Data sharing the same file also share the cached table.
+    The returned dict is shared between requests and shouldn't be modified.
+
+    Parameters
+    ----------
+    data_obj : pdbook.models.Data
+
+    Returns
+    -------
+    dict or str
+        A dict containing the table data, or a str with the reason why the
+        file couldn't be parsed.
+    """
+    try:
+        table_obj = _get_table(data_obj)
+    except ValueError as exc:
+        return str(exc)
+
+    key = (table_obj.sha256, data_obj.show_y_values)
+
+    cache = table_cache()
+    table = cache.get(key)
+    metrics_registry().count_table_cache(table is not None)
+    if table is None:
+        table = _format_table(table_obj.get_parsed(), data_obj.show_y_values)
+        cache.set(key, table, size=table_obj.get_size())
+
+    if isinstance(table, str):
+        return table
+
+    # Overrides from the Data model aren't cached
+    table = dict(table)
+    if data_obj.description:
+        table['description'] = data_obj.description
+    if data_obj.data_source:
+        table['source'] = data_obj.data_source
+
+    return table
+
+def _table_window():
+    """Return the number of rows in each window of a large table and the
+    most rows that may be requested from `get_rows` at once.
+
+    The window is clamped to the limit so the blocks fetched as the table is
+    scrolled are never refused.
+
+    Returns
+    -------
+    window : int or None
+        PDBOOK_TABLE_WINDOW_ROWS (default 100) clamped to the limit, None if
+        the whole table is always shown.
+    limit : int
+        PDBOOK_TABLE_WINDOW_LIMIT (default 1000).
+    """
+    limit = getattr(settings, 'PDBOOK_TABLE_WINDOW_LIMIT', 1000)
+    window = getattr(settings, 'PDBOOK_TABLE_WINDOW_ROWS', 100)
+    if window is not None:
+        window = min(window, limit)
+    return window, limit
+
+def _render_table(data_obj, table, n_rows=None):
+    """Return the HTML for the table in `table`, using the table cache if possible.
+
+    Rendering the table cell by cell is the slowest part of displaying the
+    data so the rendered fragment is cached by the SHA-256 of the data file
+    and the Data's `show_y_values` flag, the same as the parsed table.
+
+    Parameters
+    ----------
+    data_obj : pdbook.models.Data
+    table : dict
+        The table data for `data_obj`, as from `_read_data_file`.
+    n_rows : int, optional
+        Only include the first `n_rows` rows of the table, default all.
+
+    Returns
+    -------
+    django.utils.safestring.SafeText
+        The rendered <table> element.
+    """
+    key = ('html', _data_file_hash(data_obj), data_obj.show_y_values, n_rows)
+
+    cache = table_cache()
+    html = cache.get(key)
+    if html is None:
+        rows = table['table_data']
+        if n_rows is not None:
+            rows = rows[:n_rows]
+
+        context = {'column_labels' : table['column_labels'],
+                   'table_data' : rows}
+        html = render_to_string('pdbook/table.html', context)
+        cache.set(key, html, size=len(html))
+
+    return mark_safe(html)
+
+def _interpolation_payload(data_obj, table):
+    """Return the JSON for interpolating the table in the browser.
+
+    The payload is embedded in the data page so the interpolation widget can
+    interpolate without a request to the `interpolate` view, giving the same
+    results. Like the rendered table it's cached by the SHA-256 of the data
+    file and the Data's interpolation type and method.
+
+    Parameters
+    ----------
+    data_obj : pdbook.models.Data
+    table : dict
+        The table data for `data_obj`, as from `_read_data_file`.
+
+    Returns
+    -------
+    django.utils.safestring.SafeText or None
+        The JSON encoded payload, escaped for use in a <script> element, with
+        keys 'table_type', 'method', 'y', 'values', 'x_format', 'y_format' and
+        'xy_format', plus 'x' for 2D tables and 'slopes' (the derivatives at
+        the table values) for the cubic methods. None if the Data isn't
+        interpolated.
+    """
+    interp_type = data_obj.interpolation_type
+    if interp_type not in INTERPOLATORS or table['xy_array'] is None:
+        return None
+
+    method = data_obj.interpolation_method
+    revision = _data_file_key(data_obj)
+    key = ('payload', revision[1], data_obj.show_y_values, interp_type, method)
+
+    cache = table_cache()
+    payload = cache.get(key)
+    if payload is None:
+        interp_func = interpolator_registry().get(
+            data_obj.pk, interp_type, revision, table, method
+        )
+        result = {'table_type' : interp_type,
+                  'method' : method,
+                  'y' : interp_func.y.tolist(),
+                  'values' : interp_func.values.tolist(),
+                  'x_format' : table['x_format'],
+                  'y_format' : table['y_format'],
+                  'xy_format' : table['xy_format']}
+        if interp_type == '2D':
+            result['x'] = interp_func.x.tolist()
+
+        if method != 'LINEAR':
+            if interp_type == '2D':
+                result['slopes'] = [val.tolist() for val in interp_func.slopes]
+            else:
+                result['slopes'] = interp_func.slopes.tolist()
+
+        # Escape the characters that could end the <script> element early
+        payload = json.dumps(result)
+        for char in '<>&':
+            payload = payload.replace(char, '\\u{:04x}'.format(ord(char)))
+
+        cache.set(key, payload, size=len(payload))
+
+    return mark_safe(payload)
+
+def _parse_csv_file(path):
+    """Parse the CSV data file at `path` for its keywords and table values.
 
     Special Characters
     ------------------
@@ -331,35 +1305,299 @@ def _read_data_file(data_obj):
 
     Parameters
     ----------
-    data : django_rt_pdb.models.Data
+    path : str
+        The path to the CSV data file.
 
     Returns
     -------
-    dict
-        A dict containing the table data
+    dict or str
+        A dict containing the keyword values and the table values as
+        'XY_VALUES', or a str with the reason why the file couldn't be parsed.
+        Rectangular NUMERIC tables are returned as a 2D float array, other
+        tables as a list of rows.
     """
+    with open(path, 'rb') as csvfile:
+        return _parse_csv_content(csvfile.read())
+
+def _parse_csv_content(content):
+    """Parse the contents of a CSV data file for its keywords and table values.
 
-    data = {'X_TITLE' : '', 'X_HEADERS' : '', 'X_FORMAT' : '{}', 'X_VALUES' : [],
-            'Y_TITLE' : '', 'Y_HEADERS' : '', 'Y_FORMAT' : '{}', 'Y_VALUES' : [],
-            'XY_FORMAT' : '{}', 'XY_VALUES' : [], 'XY_TYPE' : ['NUMERIC'],
+    Parameters
+    ----------
+    content : bytes
+        The UTF-8 encoded contents of the CSV data file.
+
+    Returns
+    -------
+    dict or str
+        The parsed data file, as for `_parse_csv_file`.
+    """
+    data = {'X_TITLE' : '', 'X_HEADERS' : '', 'X_FORMAT' : ['{}'], 'X_VALUES' : [],
+            'Y_TITLE' : '', 'Y_HEADERS' : '', 'Y_FORMAT' : ['{}'], 'Y_VALUES' : [],
+            'XY_FORMAT' : ['{}'], 'XY_VALUES' : [], 'XY_TYPE' : ['NUMERIC'],
             'DESCRIPTION' : '', 'SOURCE' : ''}
 
-    with open(data_obj.data.path, 'r') as csvfile:
-        reader = csv.reader(_skip_csv_comments(csvfile), quotechar='|', escapechar='^')
-        for row in reader:
-            try:
-                var_name, var_values = _parse_csv_row(row)
-            except ValueError:
-                msg = 'Unable to parse the data file'
-                return msg
-
-            if (var_name, var_values) == (None, None):
-                if data['XY_TYPE'][0].upper() == 'NUMERIC':
-                    row[:] = [float(val) for val in row]
-                data['XY_VALUES'].append(row)
+    # Only lines containing '=' can be keywords, the rest are table rows
+    table_lines = []
+    lines = content.decode('utf-8-sig').splitlines()
+    for line in _skip_csv_comments(lines):
+        if '=' not in line:
+            table_lines.append(line)
+            continue
+
+        row = next(csv.reader([line], quotechar='|', escapechar='^'))
+        try:
+            var_name, var_values = _parse_csv_row(row)
+        except ValueError:
+            msg = 'Unable to parse the data file'
+            return msg
+
+        if (var_name, var_values) == (None, None):
+            table_lines.append(line)
+        else:
+            data[var_name] = var_values
+
+    if table_lines:
+        if data['XY_TYPE'][0].upper() == 'NUMERIC':
+            data['XY_VALUES'] = _parse_numeric_table(table_lines)
+        else:
+            data['XY_VALUES'] = _read_csv_rows(table_lines)
+
+    return data
+
+def _read_csv_rows(lines):
+    """Return the CSV table rows in `lines` as a list of list of str."""
+    return list(csv.reader(lines, quotechar='|', escapechar='^'))
+
+def _parse_numeric_table(lines):
+    """Return the numeric CSV table rows in `lines`.
+
+    Parameters
+    ----------
+    lines : list of str
+        The table rows from the CSV data file, without comments.
+
+    Returns
+    -------
+    numpy.ndarray or list of list of float
+        The table values as a 2D float array, or as a list of rows if the
+        rows don't all have the same number of values.
+
+    Raises
+    ------
+    ValueError
+        If any of the table values are non-numeric.
+    """
+    try:
+        return numpy.loadtxt(lines, dtype=numpy.float64, delimiter=',',
+                             comments=None, ndmin=2)
+    except ValueError:
+        # Ragged tables (or non-numeric values, which will raise again)
+        return [[float(val) for val in row] for row in _read_csv_rows(lines)]
+
+def _format_array(fmt, values):
+    """Return the 2D array `values` formatted as a list of rows of str.
+
+    Parameters
+    ----------
+    fmt : str
+        A python new style formatting string, such as '{:.2f}'.
+    values : numpy.ndarray
+        The 2D float array to format.
+
+    Returns
+    -------
+    list of list of str
+    """
+    n_rows, n_cols = values.shape
+    cells = _format_values(fmt, values.ravel().tolist())
+
+    return [cells[ii:ii + n_cols] for ii in range(0, n_rows * n_cols, n_cols)]
+
+def _format_values(fmt, values):
+    """Return each of the float `values` formatted using `fmt`.
+
+    Formats that have an equivalent printf-style format (such as '{:.3f}')
+    are applied to all the values in a single operation, otherwise each
+    value is formatted using ``fmt.format(value)``.
+
+    Parameters
+    ----------
+    fmt : str
+        A python new style formatting string, such as '{:.2f}'.
+    values : list of float
+        The values to format.
+
+    Returns
+    -------
+    list of str
+    """
+    match = _PRINTF_FORMAT.match(fmt)
+    if not match or not values:
+        return [fmt.format(val) for val in values]
+
+    prefix, spec, suffix = match.groups()
+    cell = prefix.replace('%', '%%') + '%' + spec + suffix.replace('%', '%%')
+
+    # The separator can't appear in the formatted values
+    return ('\n'.join([cell] * len(values)) % tuple(values)).split('\n')
+
+class _TableRows(object):
+    """The displayed rows of a table, formatted as they're used.
+
+    Formatting the table values is the slowest part of reading a table, so
+    rather than formatting every row up front a block of rows (and
+    optionally only some of the columns) is formatted when required. This
+    allows a window of a large table to be shown without formatting the
+    rest of it. Supports len(), indexing, slicing and iteration like the
+    list of formatted rows it replaces.
+
+    Parameters
+    ----------
+    xy_values : numpy.ndarray or list of list
+        The table values, as 'XY_VALUES' from `_parse_csv_file`.
+    row_labels : list of str, optional
+        The label shown in the first column of each row of a NUMERIC table.
+    xy_format : str, optional
+        The format of the table values for NUMERIC tables. If not used then
+        the rows are shown as entered (i.e. VERBATIM tables).
+    y_values : list of str, optional
+        The Y values shown in the second column of a NUMERIC table, if any.
+    """
+    # The number of rows formatted at once when iterating
+    BLOCK = 256
+
+    def __init__(self, xy_values, row_labels=None, xy_format=None, y_values=None):
+        self.xy_values = xy_values
+        self.row_labels = row_labels
+        self.xy_format = xy_format
+        self.y_values = y_values
+
+        if xy_format is None:
+            self._length = len(xy_values)
+        else:
+            self._length = min(len(xy_values), len(row_labels))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[ii] for ii in range(start, stop, step)]
+
+            return self.window(start, stop)
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError('table row index out of range')
+
+        return self.window(index, index + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), self.BLOCK):
+            for row in self.window(start, start + self.BLOCK):
+                yield row
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    @property
+    def n_columns(self):
+        """Return the number of columns in the longest row."""
+        if isinstance(self.xy_values, numpy.ndarray):
+            n_values = self.xy_values.shape[1]
+        else:
+            n_values = max([len(row) for row in self.xy_values] or [0])
+
+        if self.xy_format is None:
+            return n_values
+
+        return n_values + (1 if self.y_values is None else 2)
+
+    def window(self, start, stop, columns=None):
+        """Return the formatted rows from `start` up to `stop`.
+
+        Parameters
+        ----------
+        start : int
+            The index of the first row.
+        stop : int
+            The index after the last row, the rows are clipped to the table.
+        columns : list of int, optional
+            The increasing indices of the columns to include, default all.
+
+        Returns
+        -------
+        list of list of str
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        block = self.xy_values[start:stop]
+        if self.xy_format is None:
+            if columns is None:
+                return [list(row) for row in block]
+
+            return [[row[ii] for ii in columns if ii < len(row)] for row in block]
+
+        # The first column is the row label followed by the Y value if shown
+        offset = 1 if self.y_values is None else 2
+        if columns is None:
+            columns = range(self.n_columns)
+
+        xy_columns = [ii - offset for ii in columns if ii >= offset]
+        if isinstance(block, numpy.ndarray):
+            xy_columns = [ii for ii in xy_columns if ii < block.shape[1]]
+            if xy_columns and len(block):
+                formatted = _format_array(self.xy_format, block[:, xy_columns])
             else:
-                data[var_name] = var_values
+                formatted = [[] for row in block]
+        else:
+            formatted = [[self.xy_format.format(row[ii]) for ii in xy_columns if ii < len(row)]
+                         for row in block]
+
+        rows = []
+        for index, xy_row in enumerate(formatted, start):
+            cells = iter(xy_row)
+            row = []
+            for ii in columns:
+                if ii == 0:
+                    row.append(self.row_labels[index])
+                elif ii < offset:
+                    if index < len(self.y_values):
+                        row.append(self.y_values[index])
+                else:
+                    # Short rows of uneven tables have no further values
+                    value = next(cells, None)
+                    if value is None:
+                        break
+                    row.append(value)
+
+            rows.append(row)
+
+        return rows
+
+def _format_table(data, show_y_values=False):
+    """Return the table data for display from the parsed data file `data`.
 
+    Parameters
+    ----------
+    data : dict
+        The parsed data file, as returned by `_parse_csv_file`.
+    show_y_values : bool, optional
+        If True then include the Y_VALUES as the second table column.
+
+    Returns
+    -------
+    dict or str
+        A dict containing the table data, or a str with the reason why the
+        table couldn't be produced.
+    """
     data['DESCRIPTION'] = ', '.join(data['DESCRIPTION'])
     data['DESCRIPTION'] = data['DESCRIPTION'].encode('utf-8')
     data['DESCRIPTION'] = data['DESCRIPTION'].decode('unicode-escape')
@@ -367,12 +1605,6 @@ def _read_data_file(data_obj):
     data['SOURCE'] = data['SOURCE'].encode('utf-8')
     data['SOURCE'] = data['SOURCE'].decode('unicode-escape')
 
-
-    if data_obj.description:
-        data['DESCRIPTION'] = data_obj.description
-    if data_obj.data_source:
-        data['SOURCE'] = data_obj.data_source
-
     if data['X_TITLE']:
         x_title = ', '.join(data['X_TITLE'])
     else:
@@ -389,7 +1621,8 @@ def _read_data_file(data_obj):
         column_labels[:] = [val.encode('utf-8') for val in column_labels]
         column_labels[:] = [val.decode('unicode-escape') for val in column_labels]
     elif data['X_VALUES'] != []:
-        column_labels = [data['X_FORMAT'][0].format(float(val)) for val in data['X_VALUES']]
+        x_values = [float(val) for val in data['X_VALUES']]
+        column_labels = _format_values(data['X_FORMAT'][0], x_values)
     else:
         msg = 'The file must have either non-blank X_HEADERS or X_VALUES values'
         return msg
@@ -400,30 +1633,36 @@ def _read_data_file(data_obj):
         row_labels[:] = [val.encode('utf-8') for val in row_labels]
         row_labels[:] = [val.decode('unicode-escape') for val in row_labels]
     elif data['Y_VALUES'] != ['']:
-        row_labels = [data['Y_FORMAT'][0].format(float(val)) for val in data['Y_VALUES']]
+        y_values = [float(val) for val in data['Y_VALUES']]
+        row_labels = _format_values(data['Y_FORMAT'][0], y_values)
     else:
         msg = 'The file must have either non-blank Y_HEADERS or Y_VALUES values'
         return msg
 
-    if data['XY_VALUES'] != [] and data['XY_TYPE'][0].upper() == 'NUMERIC':
-        # Apply the XY format to the table data
-        values_out = []
-        for xy_row, y_val in zip(data['XY_VALUES'], row_labels):
-            new_row = [data['XY_FORMAT'][0].format(xy) for xy in xy_row]
-            new_row.insert(0, y_val)
-            values_out.append(new_row)
+    xy_array = None
+    xy_values = data['XY_VALUES']
+    if len(xy_values) and data['XY_TYPE'][0].upper() == 'NUMERIC':
+        # The XY format is applied to the table data as the rows are used,
+        #   keeping the unformatted values of rectangular tables for
+        #   interpolation
+        if isinstance(xy_values, numpy.ndarray):
+            xy_array = xy_values
 
         # Force show the Y VALUES if available and user chooses option
-        if data_obj.show_y_values and data['Y_VALUES'] != ['']:
-            for xy_row, y_val in zip(values_out, data['Y_VALUES']):
-                xy_row.insert(1, y_val)
-    elif data['XY_VALUES'] != []:
-        values_out = data['XY_VALUES']
+        y_values = None
+        if show_y_values and data['Y_VALUES'] != ['']:
+            y_values = data['Y_VALUES']
+
+        values_out = _TableRows(xy_values, list(row_labels), data['XY_FORMAT'][0],
+                                y_values)
+    elif len(xy_values):
+        values_out = _TableRows(xy_values)
     else:
         msg = 'The file has no tabular data'
         return msg
 
     return {'column_labels' : column_labels,
+             'row_labels' : list(row_labels),
              'table_data' : values_out,
              'x_title' : x_title,
              'x_values' : data['X_VALUES'],
@@ -434,9 +1673,10 @@ def _read_data_file(data_obj):
              'x_format' : data['X_FORMAT'][0],
              'y_format' : data['Y_FORMAT'][0],
              'xy_format' : data['XY_FORMAT'][0],
+             'xy_array' : xy_array,
              }
 
-def _do_interpolate_1d(y, data):
+def _do_interpolate_1d(y, data, interp_func=None):
     """Return a HttpResponse containing the results from interpolating `data` at `y`.
 
     The results will be formatted in accordance with the formats specified
@@ -448,27 +1688,28 @@ def _do_interpolate_1d(y, data):
         The Y value to perform the interpolation with
     data :
         The data to interpolate
+    interp_func : pdbook.interpolation.Interpolator1D, optional
+        A previously built interpolator for `data`. If not used then one will
+        be built.
 
     Returns
     -------
     HttpResponse
     """
+    if interp_func is None:
+        interp_func = Interpolator1D.from_table(data)
+
     y_value_ok = False
-    y_arr = numpy.asarray(data['y_values'], dtype=numpy.float)
+    y_arr = interp_func.y
     if y and (min(y_arr) <= y <= max(y_arr)):
         y_value_ok = True
-        y_neighbours = nsmallest(2, y_arr, key=lambda k: abs(k - y))
-        y_neighbours.sort()
-
-    out = [val[-1] for val in data['table_data']]
-    out = numpy.asarray(out, dtype=numpy.float)
-    interp_func = interp1d(y_arr, out, kind='linear')
+        y_neighbours = neighbours(y_arr, y)
 
     y_vals = []
     if y_value_ok:
         y_vals = [y_neighbours[0], y, y_neighbours[1]]
 
-    result = [data['xy_format'].format(interp_func(val).tolist()) for val in y_vals]
+    result = [data['xy_format'].format(val) for val in interp_func(y_vals).tolist()]
 
     y_vals[:] = [data['y_format'].format(val) for val in y_vals]
     
@@ -479,7 +1720,7 @@ def _do_interpolate_1d(y, data):
 
     return HttpResponse(json.dumps(result), content_type="application/json")
 
-def _do_interpolate_2d(x, y, data):
+def _do_interpolate_2d(x, y, data, interp_func=None):
     """Return a HttpResponse containing the results from interpolating `data` at (`x`, `y`).
 
     The results will be formatted in accordance with the formats specified
@@ -493,16 +1734,22 @@ def _do_interpolate_2d(x, y, data):
         The Y value to perform the interpolation with
     data :
         The data to interpolate
+    interp_func : pdbook.interpolation.Interpolator2D, optional
+        A previously built interpolator for `data`. If not used then one will
+        be built.
 
     Returns
     -------
     HttpResponse
     """
+    if interp_func is None:
+        interp_func = Interpolator2D.from_table(data)
+
     x_value_ok = False
     y_value_ok = False
 
-    x_arr = numpy.asarray(data['x_values'], dtype=numpy.float)
-    y_arr = numpy.asarray(data['y_values'], dtype=numpy.float)
+    x_arr = interp_func.x
+    y_arr = interp_func.y
 
     if x and (min(x_arr) <= x <= max(x_arr)):
         x_value_ok = True
@@ -510,24 +1757,16 @@ def _do_interpolate_2d(x, y, data):
     if y and (min(y_arr) <= y <= max(y_arr)):
         y_value_ok = True
 
-    x_neighbours = nsmallest(2, x_arr, key=lambda k: abs(k - x))
-    x_neighbours.sort()
-    y_neighbours = nsmallest(2, y_arr, key=lambda k: abs(k - y))
-    y_neighbours.sort()
-
-    out = []
-    for row in data['table_data']:
-        out.append(row[1:])
-
-    out = numpy.asarray(out, dtype=numpy.float)
-    interp_func = interp2d(x_arr, y_arr, out, kind='linear')
+    x_neighbours = neighbours(x_arr, x)
+    y_neighbours = neighbours(y_arr, y)
 
     x_vals = [x_neighbours[0], x, x_neighbours[1]]
     y_vals = [y_neighbours[0], y, y_neighbours[1]]
 
+    # Evaluate the 3 x 3 grid of neighbours in one go
     result = []
-    for jj in y_vals:
-        result.append([data['xy_format'].format(interp_func(ii, jj)[0]) for ii in x_vals])
+    for row in interp_func.grid(x_vals, y_vals).tolist():
+        result.append([data['xy_format'].format(val) for val in row])
 
     x_vals[:] = [data['x_format'].format(val) for val in x_vals]
     y_vals[:] = [data['y_format'].format(val) for val in y_vals]